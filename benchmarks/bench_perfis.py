@@ -0,0 +1,160 @@
+"""
+Benchmark dos perfis de desempenho do SQLite (db.PERFIS_DESEMPENHO).
+
+Para cada perfil, mede em um banco temporário:
+  1. Inserção de pedidos (uma transação por pedido, como o FormPedido faz);
+  2. Leitura do relatório de pedidos (mesma query de fetch_relatorio_pedidos);
+  3. Leituras concorrentes com um escritor gravando pedidos ao mesmo tempo.
+
+Ao final, mede o mesmo roteiro em um banco em memória (db.MEMORIA) como
+referência de custo sem disco.
+
+Execute a partir da raiz do projeto:
+    python benchmarks/bench_perfis.py [num_pedidos]
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+SQL_RELATORIO = """
+SELECT p.id, p.data, c.nome,
+       p.total_itens,
+       p.total
+FROM pedidos p
+JOIN clientes c ON p.cliente_id = c.id
+WHERE p.data >= ? AND p.data <= ?
+ORDER BY p.data DESC;
+"""
+
+
+def _popular_cadastros(pool: db.PoolConexoes):
+    """Cria clientes e produtos básicos para os pedidos do benchmark."""
+    with pool.conexao() as conn:
+        db.aplicar_migracoes(conn)
+        conn.executemany("INSERT INTO clientes (nome, email) VALUES (?, ?)",
+                         [(f"Cliente {i}", f"cliente{i}@email.com") for i in range(1, 51)])
+        conn.executemany("INSERT INTO produtos (nome, preco) VALUES (?, ?)",
+                         [(f"Produto {i}", 1000 + i * 100) for i in range(1, 21)])  # centavos
+        conn.commit()
+
+
+def _gravar_pedido(pool: db.PoolConexoes, n: int):
+    """Grava um pedido com 3 itens em uma transação própria."""
+    with pool.conexao() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE;")
+        data = f"2025-{(n % 12) + 1:02d}-{(n % 28) + 1:02d}"
+        cursor.execute("INSERT INTO pedidos (cliente_id, data, total) VALUES (?, ?, ?)",
+                       ((n % 50) + 1, data, 19980))  # centavos: 3330 x (1 + 2 + 3)
+        pedido_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unit) VALUES (?, ?, ?, ?)",
+            [(pedido_id, ((n + k) % 20) + 1, 1 + k, 3330) for k in range(3)])
+        conn.commit()
+
+
+def _ler_relatorio(pool: db.PoolConexoes) -> int:
+    with pool.conexao() as conn:
+        return len(conn.execute(SQL_RELATORIO, ("2025-01-01", "2025-12-31")).fetchall())
+
+
+def medir_perfil(perfil: str, num_pedidos: int, num_relatorios: int = 20, duracao_concorrente: float = 2.0) -> dict:
+    """Executa as três medições para um perfil em um arquivo temporário."""
+    pasta = tempfile.mkdtemp(prefix="bench_perfil_")
+    armazenamento = db.Armazenamento(os.path.join(pasta, "bench.db"), tamanho=4, perfil=perfil)
+    try:
+        return _medir(armazenamento, perfil, num_pedidos, num_relatorios, duracao_concorrente)
+    finally:
+        armazenamento.fechar()
+        for nome in os.listdir(pasta):
+            os.remove(os.path.join(pasta, nome))
+        os.rmdir(pasta)
+
+
+def medir_memoria(num_pedidos: int, num_relatorios: int = 20, duracao_concorrente: float = 2.0) -> dict:
+    """Executa as três medições em um banco em memória."""
+    armazenamento = db.Armazenamento(db.MEMORIA, tamanho=4)
+    try:
+        return _medir(armazenamento, "memoria", num_pedidos, num_relatorios, duracao_concorrente)
+    finally:
+        armazenamento.fechar()
+
+
+def _medir(armazenamento: db.Armazenamento, rotulo: str, num_pedidos: int, num_relatorios: int,
+           duracao_concorrente: float) -> dict:
+    """Executa as três medições no armazenamento e retorna os resultados."""
+    pool = armazenamento.pool
+    _popular_cadastros(pool)
+
+    # 1. Inserções
+    inicio = time.perf_counter()
+    for n in range(num_pedidos):
+        _gravar_pedido(pool, n)
+    tempo_insercao = time.perf_counter() - inicio
+
+    # 2. Relatórios
+    inicio = time.perf_counter()
+    for _ in range(num_relatorios):
+        _ler_relatorio(pool)
+    tempo_relatorio = time.perf_counter() - inicio
+
+    # 3. Leitores x escritor
+    parar = threading.Event()
+    contadores = {"leituras": 0, "escritas": 0, "erros_lock": 0}
+
+    def escritor():
+        n = num_pedidos
+        while not parar.is_set():
+            try:
+                _gravar_pedido(pool, n)
+                contadores["escritas"] += 1
+                n += 1
+            except sqlite3.OperationalError:
+                contadores["erros_lock"] += 1
+
+    def leitor():
+        while not parar.is_set():
+            try:
+                _ler_relatorio(pool)
+                contadores["leituras"] += 1
+            except sqlite3.OperationalError:
+                contadores["erros_lock"] += 1
+
+    threads = [threading.Thread(target=escritor), threading.Thread(target=leitor)]
+    for t in threads:
+        t.start()
+    time.sleep(duracao_concorrente)
+    parar.set()
+    for t in threads:
+        t.join()
+
+    return {
+        "perfil": rotulo,
+        "insercoes_s": num_pedidos / tempo_insercao,
+        "relatorios_s": num_relatorios / tempo_relatorio,
+        "leituras_concorrentes_s": contadores["leituras"] / duracao_concorrente,
+        "escritas_concorrentes_s": contadores["escritas"] / duracao_concorrente,
+        "erros_lock": contadores["erros_lock"],
+    }
+
+
+def _imprimir(r: dict):
+    print(f"{r['perfil']:<12} {r['insercoes_s']:>12.1f} {r['relatorios_s']:>13.1f} "
+          f"{r['leituras_concorrentes_s']:>14.1f} {r['escritas_concorrentes_s']:>14.1f} {r['erros_lock']:>11}")
+
+
+if __name__ == "__main__":
+    num_pedidos = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f"Benchmark de perfis SQLite ({num_pedidos} pedidos)\n")
+    print(f"{'Perfil':<12} {'Inserções/s':>12} {'Relatórios/s':>13} {'Leit. conc./s':>14} "
+          f"{'Escr. conc./s':>14} {'Erros lock':>11}")
+    for nome_perfil in db.PERFIS_DESEMPENHO:
+        _imprimir(medir_perfil(nome_perfil, num_pedidos))
+    _imprimir(medir_memoria(num_pedidos))
@@ -0,0 +1,113 @@
+"""
+Comandos de linha de comando para manutenção do banco de dados.
+
+Uso:
+    python cli.py reconstruir-resumo
+    python cli.py backup [--pasta backups] [--manter 5]
+    python cli.py arquivar --antes-de 2024-01-01
+    python cli.py manutencao [--analisar]
+    python cli.py verificar-contadores [--corrigir]
+"""
+import argparse
+import sys
+
+import db
+import utils
+from core import arquivo, backup, manutencao
+
+
+def _cmd_reconstruir_resumo(args):
+    db.reconstruir_resumo_mensal()
+    utils.log_info("Resumo mensal de vendas reconstruído com sucesso.")
+
+
+def _cmd_backup(args):
+    resultado = backup.fazer_backup(pasta=args.pasta, manter=args.manter)
+    print(f"Backup gravado em {resultado['arquivo']} "
+          f"({resultado['paginas']} páginas, {resultado['segundos']:.2f}s).")
+    for caminho in resultado["removidos"]:
+        print(f"Backup antigo removido: {caminho}")
+
+
+
+def _cmd_arquivar(args):
+    resultado = arquivo.arquivar_pedidos(args.antes_de, pasta=args.pasta)
+    for ano, movidos in resultado["anos"].items():
+        print(f"{ano}: {movidos} pedido(s) movido(s) para {arquivo.caminho_arquivo(ano, args.pasta)}")
+    print(f"Total arquivado antes de {resultado['corte']}: {resultado['pedidos']} pedido(s).")
+
+
+def _cmd_manutencao(args):
+    resultado = manutencao.executar_manutencao(analisar=args.analisar)
+    antes, depois = resultado["antes"], resultado["depois"]
+    print(f"Páginas: {antes['paginas']} -> {depois['paginas']} "
+          f"(livres: {antes['livres']} -> {depois['livres']}).")
+    for etapa, segundos in resultado["etapas"].items():
+        print(f"  {etapa}: {segundos * 1000:.0f} ms")
+
+
+def _cmd_verificar_contadores(args):
+    divergentes = db.verificar_contadores_pedidos(corrigir=args.corrigir)
+    for pedido_id, itens, contados, quantidade, somada in divergentes:
+        print(f"Pedido {pedido_id}: total_itens {itens} (itens: {contados}), "
+              f"quantidade_total {quantidade} (itens: {somada})")
+    if not divergentes:
+        print("Contadores de itens dos pedidos consistentes.")
+    elif args.corrigir:
+        utils.log_info(f"Contadores de {len(divergentes)} pedido(s) recalculados.")
+    else:
+        print(f"{len(divergentes)} pedido(s) divergente(s). Use --corrigir para recalcular.")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção do banco de dados da aplicação.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    sub = subparsers.add_parser("reconstruir-resumo",
+                                help="Recalcula a tabela resumo_mensal a partir dos pedidos.")
+    sub.set_defaults(func=_cmd_reconstruir_resumo)
+
+    sub = subparsers.add_parser("backup",
+                                help="Gera um backup verificado do banco (pode rodar com o app aberto).")
+    sub.add_argument("--pasta", default=backup.PASTA_BACKUPS,
+                     help=f"Pasta de destino (padrão: {backup.PASTA_BACKUPS}).")
+    sub.add_argument("--manter", type=int, default=backup.BACKUPS_MANTIDOS,
+                     help=f"Quantidade de backups mantidos (padrão: {backup.BACKUPS_MANTIDOS}).")
+    sub.set_defaults(func=_cmd_backup)
+
+    sub = subparsers.add_parser("arquivar",
+                                help="Move pedidos antigos para arquivos anuais (pedidos_AAAA.db).")
+    sub.add_argument("--antes-de", required=True, metavar="AAAA-MM-DD",
+                     help="Data de corte; é alinhada ao primeiro dia do mês.")
+    sub.add_argument("--pasta", default=None,
+                     help="Pasta dos arquivos anuais (padrão: 'arquivo' ao lado do banco).")
+    sub.set_defaults(func=_cmd_arquivar)
+
+    sub = subparsers.add_parser("manutencao",
+                                help="Atualiza as estatísticas do planejador e devolve o espaço livre do arquivo.")
+    sub.add_argument("--analisar", action="store_true",
+                     help="Força o ANALYZE completo (padrão: PRAGMA optimize).")
+    sub.set_defaults(func=_cmd_manutencao)
+
+    sub = subparsers.add_parser("verificar-contadores",
+                                help="Confere total_itens/quantidade_total dos pedidos com os itens.")
+    sub.add_argument("--corrigir", action="store_true",
+                     help="Recalcula os contadores divergentes.")
+    sub.set_defaults(func=_cmd_verificar_contadores)
+
+    args = parser.parse_args(argv)
+    try:
+        db.inicializar_banco()
+        codigo = args.func(args)
+    except Exception as e:
+        utils.log_erro(f"Falha ao executar o comando '{args.comando}'.", e)
+        return 1
+    finally:
+        db.fechar_conexoes()
+    return codigo or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
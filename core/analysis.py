@@ -1,10 +1,13 @@
-import threading
+import asyncio
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 from utils import log_info, log_erro
 from . import database 
 
+GEMINI_API_KEY = None
+GEMINI_MODEL = None
+
 try:
     # Carrega as variáveis do arquivo .env
     load_dotenv()
@@ -62,52 +65,45 @@ def _formatar_dados_para_ia(pedidos: list) -> str:
         return "Nenhum pedido encontrado para análise."
 
     for p in pedidos:
-        texto_formatado += f"Pedido ID: {p['id_pedido']} (Cliente: {p['cliente']}, Data: {p['data']}, Total: R$ {p['total']:.2f})\n"
-        if not p['itens']:
+        texto_formatado += f"Pedido ID: {p.id} (Cliente: {p.nome_cliente}, Data: {p.data}, Total: {p.total})\n"
+        if not p.itens:
             texto_formatado += "  - (Pedido sem itens registrados)\n"
-        for item in p['itens']:
-            texto_formatado += f"  - Item: {item['produto']}, Qtd: {item['quantidade']}, Preço Unit: R$ {item['preco_unit']:.2f}\n"
+        for item in p.itens:
+            texto_formatado += f"  - Item: {item.produto}, Qtd: {item.quantidade}, Preço Unit: {item.preco_unit}\n"
         texto_formatado += "---\n"
     return texto_formatado
 
 
-def analisar_pedidos_com_ia(callback_sucesso, callback_erro):
+async def analisar_pedidos_com_ia(banco):
     """
-    Função principal que busca dados, formata, chama a API GEMINI em uma thread
-    e usa callbacks para retornar a resposta ao AppController.
+    Corrotina principal: busca os dados na thread do banco (BancoAssincrono),
+    formata, chama a API GEMINI sem bloquear o event loop e retorna o texto
+    da análise. Em caso de falha, lança Exception com mensagem amigável.
     """
-    
-    def worker():
-        """Função que roda na thread separada."""
-        try:
-            log_info("Iniciando análise de IA com Gemini (worker thread)...")
-
-            if not GEMINI_API_KEY:
-                callback_erro("Erro de Configuração: A chave GOOGLE_API_KEY não foi encontrada.\n\nVerifique seu arquivo .env e reinicie o aplicativo.")
-                return
-
-            pedidos_data = database.fetch_ultimos_pedidos_para_analise(limite=5)
-            dados_formatados = _formatar_dados_para_ia(pedidos_data)
-            prompt_template = _get_prompt_analise()
-            prompt_final = prompt_template.format(dados_formatados=dados_formatados)
-            
-            log_info(f"Enviando para API Gemini (modelo: {GEMINI_MODEL})...")
-
-            model = genai.GenerativeModel(GEMINI_MODEL)
-            response = model.generate_content(prompt_final)
-            
-            resultado_ia = response.text
-            
-            log_info("Análise de IA (Gemini) recebida com sucesso.")
-            callback_sucesso(resultado_ia.strip())
-
-        except Exception as e:
-            log_erro("Erro inesperado na análise com Gemini.", e)
-            if "API_KEY_INVALID" in str(e):
-                callback_erro(f"Erro de Autenticação: Sua chave de API do Google é inválida. Verifique o arquivo .env.")
-            else:
-                callback_erro(f"Ocorreu um erro ao chamar a API do Gemini:\n{e}")
-
-    log_info("Disparando thread de análise Gemini.")
-    thread = threading.Thread(target=worker, daemon=True)
-    thread.start()
+    log_info("Iniciando análise de IA com Gemini...")
+
+    if not GEMINI_API_KEY:
+        raise Exception("Erro de Configuração: A chave GOOGLE_API_KEY não foi encontrada.\n\nVerifique seu arquivo .env e reinicie o aplicativo.")
+
+    try:
+        pedidos_data = await banco.chamar(database.fetch_ultimos_pedidos_para_analise, limite=5)
+        dados_formatados = _formatar_dados_para_ia(pedidos_data)
+        prompt_template = _get_prompt_analise()
+        prompt_final = prompt_template.format(dados_formatados=dados_formatados)
+
+        log_info(f"Enviando para API Gemini (modelo: {GEMINI_MODEL})...")
+
+        model = genai.GenerativeModel(GEMINI_MODEL)
+        # A chamada HTTP é bloqueante: roda em uma thread de I/O
+        response = await asyncio.to_thread(model.generate_content, prompt_final)
+
+        resultado_ia = response.text
+
+        log_info("Análise de IA (Gemini) recebida com sucesso.")
+        return resultado_ia.strip()
+
+    except Exception as e:
+        log_erro("Erro inesperado na análise com Gemini.", e)
+        if "API_KEY_INVALID" in str(e):
+            raise Exception(f"Erro de Autenticação: Sua chave de API do Google é inválida. Verifique o arquivo .env.") from e
+        raise Exception(f"Ocorreu um erro ao chamar a API do Gemini:\n{e}") from e
@@ -0,0 +1,278 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.request import pathname2url
+
+import db
+from utils import log_info, log_erro
+
+# =================================================================
+# --- ARQUIVO ANUAL DE PEDIDOS ANTIGOS ---
+# =================================================================
+#
+# Pedidos anteriores a uma data de corte saem da base principal e vão
+# para um arquivo SQLite por ano (pedidos_AAAA.db). A tabela
+# arquivo_pedidos (migração 6) é o catálogo dos anos arquivados.
+#
+# Listas, paginação e dashboard leem só a base principal. Relatórios
+# cujo intervalo alcança anos arquivados usam conexao_historico(), que
+# anexa (ATTACH) apenas os arquivos necessários e expõe as views
+# temporárias pedidos_historico e itens_pedido_historico (UNION ALL).
+
+# Pasta dos arquivos anuais (padrão: subpasta "arquivo" ao lado do banco)
+PASTA_ARQUIVO = os.getenv("DB_PASTA_ARQUIVO")
+
+TABELAS_ARQUIVADAS = ("pedidos", "itens_pedido")
+
+
+def pasta_arquivo() -> str:
+    return PASTA_ARQUIVO or os.path.join(db.obter_armazenamento().pasta, "arquivo")
+
+
+def caminho_arquivo(ano: int, pasta: str = None) -> str:
+    return os.path.abspath(os.path.join(pasta or pasta_arquivo(), f"pedidos_{ano}.db"))
+
+
+def _alinhar_mes(data_corte: str) -> str:
+    """Valida 'AAAA-MM-DD' (ou 'AAAA-MM') e retorna o primeiro dia do mês."""
+    try:
+        data = datetime.strptime(data_corte[:7], "%Y-%m")
+    except (TypeError, ValueError):
+        raise ValueError(f"Data de corte inválida: '{data_corte}'. Use AAAA-MM-DD.")
+    return data.strftime("%Y-%m-01")
+
+
+def _colunas(conn: sqlite3.Connection, tabela: str, esquema: str = "main") -> list:
+    """Retorna PRAGMA table_info: (cid, nome, tipo, notnull, default, pk)."""
+    return conn.execute(f"PRAGMA {esquema}.table_info({tabela});").fetchall()
+
+
+def _preparar_arquivo(conn: sqlite3.Connection, esquema: str):
+    """
+    Cria (ou completa) as tabelas do arquivo anexado com as colunas atuais
+    da base principal. Sem FOREIGN KEY: clientes e produtos ficam na base
+    principal.
+    """
+    contadores_novos = False
+    for tabela in TABELAS_ARQUIVADAS:
+        colunas = _colunas(conn, tabela)
+        definicoes = ", ".join(f"{c[1]} {c[2]}" + (" PRIMARY KEY" if c[5] else "") for c in colunas)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {esquema}.{tabela} ({definicoes});")
+        # Arquivos gravados antes da migração 8 guardam reais: passam a centavos
+        if db.converter_para_centavos(conn, tabela, esquema):
+            log_info(f"Valores de {esquema}.{tabela} convertidos para centavos.")
+        # Colunas criadas por migrações posteriores ao primeiro arquivamento
+        existentes = {c[1] for c in _colunas(conn, tabela, esquema)}
+        for c in colunas:
+            if c[1] not in existentes:
+                conn.execute(f"ALTER TABLE {esquema}.{tabela} ADD COLUMN {c[1]} {c[2]};")
+                if c[1] in db.CONTADORES_PEDIDOS:
+                    contadores_novos = True
+    # Arquivo anterior à migração 9: o arquivo não tem triggers, preenche uma vez
+    if contadores_novos:
+        corrigidos = db.recalcular_contadores_pedidos(conn, esquema)
+        log_info(f"Contadores de itens de {esquema}.pedidos preenchidos ({corrigidos} pedido(s)).")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_pedidos_data ON pedidos (data, id);")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_itens_pedido_pedido_id ON itens_pedido (pedido_id);")
+
+
+def _arquivar_ano(conn: sqlite3.Connection, ano: int, corte: str, pasta: str) -> int:
+    """
+    Move os pedidos de `ano` anteriores a `corte` para pedidos_AAAA.db.
+    Retorna a quantidade de pedidos movidos.
+
+    São duas transações: a cópia (grava só no arquivo) e a remoção da base
+    principal (grava só nela). Assim cada commit é atômico no seu arquivo;
+    se o processo cair entre as duas, os pedidos ficam nos dois lugares e
+    a próxima execução conclui a remoção (a cópia usa INSERT OR IGNORE).
+    """
+    inicio = f"{ano:04d}-01-01"
+    fim = min(corte, f"{ano + 1:04d}-01-01")
+    intervalo = (inicio, fim)
+    caminho = caminho_arquivo(ano, pasta)
+    colunas_pedidos = ", ".join(c[1] for c in _colunas(conn, "pedidos"))
+    colunas_itens = ", ".join(c[1] for c in _colunas(conn, "itens_pedido"))
+    sql_ids = "SELECT id FROM main.pedidos WHERE data >= ? AND data < ?"
+
+    conn.execute("ATTACH DATABASE ? AS arq;", (caminho,))
+    try:
+        # 1. Cópia para o arquivo do ano
+        with db.transacao():
+            _preparar_arquivo(conn, "arq")
+            conn.execute(f"""
+                INSERT OR IGNORE INTO arq.pedidos ({colunas_pedidos})
+                SELECT {colunas_pedidos} FROM main.pedidos WHERE data >= ? AND data < ?;
+            """, intervalo)
+            conn.execute(f"""
+                INSERT OR IGNORE INTO arq.itens_pedido ({colunas_itens})
+                SELECT {colunas_itens} FROM main.itens_pedido WHERE pedido_id IN ({sql_ids});
+            """, intervalo)
+
+        # 2. Conferência: nada é removido sem estar no arquivo
+        faltando = conn.execute(f"""
+            SELECT (SELECT COUNT(*) FROM main.pedidos p
+                    WHERE p.data >= ? AND p.data < ?
+                      AND NOT EXISTS (SELECT 1 FROM arq.pedidos a WHERE a.id = p.id))
+                 + (SELECT COUNT(*) FROM main.itens_pedido i
+                    WHERE i.pedido_id IN ({sql_ids})
+                      AND NOT EXISTS (SELECT 1 FROM arq.itens_pedido a WHERE a.id = i.id));
+        """, intervalo + intervalo).fetchone()[0]
+        if faltando:
+            raise Exception(f"{faltando} registro(s) de {ano} não foram copiados para {caminho}.")
+
+        # 3. Remoção da base principal
+        mes_inicio, mes_fim = inicio[:7], fim[:7]
+        with db.transacao():
+            # Os triggers do resumo mensal descontam os pedidos removidos;
+            # o histórico de vendas desses meses é restaurado em seguida.
+            resumo = conn.execute("""
+                SELECT mes, pedidos, receita, quantidade_itens, clientes_distintos
+                FROM resumo_mensal WHERE mes >= ? AND mes < ?;
+            """, (mes_inicio, mes_fim)).fetchall()
+            resumo_clientes = conn.execute("""
+                SELECT mes, cliente_id, pedidos
+                FROM resumo_mensal_clientes WHERE mes >= ? AND mes < ?;
+            """, (mes_inicio, mes_fim)).fetchall()
+
+            movidos = conn.execute(f"SELECT COUNT(*) FROM ({sql_ids});", intervalo).fetchone()[0]
+            conn.execute(f"DELETE FROM main.itens_pedido WHERE pedido_id IN ({sql_ids});", intervalo)
+            conn.execute("DELETE FROM main.pedidos WHERE data >= ? AND data < ?;", intervalo)
+
+            conn.executemany("""
+                INSERT OR REPLACE INTO resumo_mensal (mes, pedidos, receita, quantidade_itens, clientes_distintos)
+                VALUES (?, ?, ?, ?, ?);
+            """, resumo)
+            conn.executemany("""
+                INSERT OR REPLACE INTO resumo_mensal_clientes (mes, cliente_id, pedidos)
+                VALUES (?, ?, ?);
+            """, resumo_clientes)
+            conn.execute("""
+                INSERT INTO arquivo_pedidos (ano, arquivo, ate, pedidos) VALUES (?, ?, ?, ?)
+                ON CONFLICT (ano) DO UPDATE SET
+                    arquivo = excluded.arquivo,
+                    ate = MAX(ate, excluded.ate),
+                    pedidos = pedidos + excluded.pedidos;
+            """, (ano, caminho, fim, movidos))
+        return movidos
+    finally:
+        conn.execute("DETACH DATABASE arq;")
+
+
+def arquivar_pedidos(data_corte: str, pasta: str = None) -> dict:
+    """
+    Move para os arquivos anuais todos os pedidos (e seus itens) com data
+    anterior a `data_corte`. A data é alinhada ao primeiro dia do mês, para
+    que cada mês fique inteiro na base principal ou no arquivo.
+
+    Returns:
+        dict com "corte", "anos" ({ano: pedidos movidos}) e "pedidos".
+    """
+    corte = _alinhar_mes(data_corte)
+    pasta = pasta or pasta_arquivo()
+    os.makedirs(pasta, exist_ok=True)
+    movidos = {}
+    log_info(f"Arquivando pedidos anteriores a {corte} em: {pasta}")
+    try:
+        with db.conexao() as conn:
+            if conn.in_transaction:
+                raise Exception("O arquivamento não pode rodar dentro de outra transação.")
+            anos = [r[0] for r in conn.execute("""
+                SELECT DISTINCT CAST(substr(data, 1, 4) AS INTEGER)
+                FROM pedidos WHERE data < ? ORDER BY 1;
+            """, (corte,))]
+            for ano in anos:
+                movidos[ano] = _arquivar_ano(conn, ano, corte, pasta)
+                log_info(f"Arquivo {ano}: {movidos[ano]} pedido(s) movido(s).")
+    except Exception as e:
+        log_erro("Falha ao arquivar pedidos antigos.", e)
+        raise Exception(f"Erro ao arquivar pedidos: {e}") from e
+    return {"corte": corte, "anos": movidos, "pedidos": sum(movidos.values())}
+
+
+def arquivos_no_intervalo(data_inicio: str = None, data_fim: str = None) -> list:
+    """
+    Retorna [(ano, caminho)] dos arquivos anuais que podem conter pedidos
+    entre data_inicio e data_fim (inclusive). Lista vazia significa que a
+    base principal basta.
+    """
+    catalogo = db.consultar_leitura("SELECT ano, arquivo, ate FROM arquivo_pedidos ORDER BY ano;")
+    return [
+        (ano, caminho) for ano, caminho, ate in catalogo
+        if (not data_inicio or (data_inicio < ate and int(data_inicio[:4]) <= ano))
+        and (not data_fim or int(data_fim[:4]) >= ano)
+    ]
+
+
+def _sql_union(conn: sqlite3.Connection, tabela: str, esquemas: list) -> str:
+    """
+    SELECT da base principal UNION ALL os arquivos, com as colunas atuais
+    (valores monetários sempre em centavos).
+    Arquivos anteriores à migração 9 não têm os contadores de pedidos:
+    eles são contados dentro do próprio arquivo (uma subquery sobre a
+    view inteira não usaria índice).
+    """
+    colunas = [c[1] for c in _colunas(conn, tabela)]
+    partes = [f"SELECT {', '.join(colunas)} FROM main.{tabela} t"]
+    for esquema in esquemas:
+        existentes = {c[1] for c in _colunas(conn, tabela, esquema)}
+        # Arquivo anterior à migração 8 (reais): converte na leitura
+        em_reais = set(db.colunas_em_reais(conn, tabela, esquema))
+
+        def selecionar(c: str) -> str:
+            if c in em_reais:
+                return f"{db.SQL_REAIS_PARA_CENTAVOS.format(coluna=c)} AS {c}"
+            if c in existentes:
+                return c
+            if tabela == "pedidos" and c in db.CONTADORES_PEDIDOS:
+                return f"{db.CONTADORES_PEDIDOS[c].format(esquema=esquema, ref='t')} AS {c}"
+            return f"NULL AS {c}"
+
+        partes.append(f"SELECT {', '.join(selecionar(c) for c in colunas)} FROM {esquema}.{tabela} t")
+    return "\nUNION ALL\n".join(partes)
+
+
+@contextmanager
+def conexao_historico(arquivos: list):
+    """
+    Context manager que empresta uma conexão somente leitura com os
+    arquivos informados anexados (mode=ro) e as views temporárias
+    pedidos_historico e itens_pedido_historico. O bloco roda em um único
+    db.snapshot(). Ao sair, as views são removidas e os arquivos desanexados.
+
+    Uso:
+        with arquivo.conexao_historico(arquivos_no_intervalo(ini, fim)) as conn:
+            conn.execute("SELECT ... FROM pedidos_historico WHERE data >= ?", (ini,))
+    """
+    with db.conexao_leitura() as conn:
+        if conn.in_transaction:
+            raise Exception("A consulta ao arquivo não pode ser aninhada em outro snapshot.")
+        limite = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        if len(arquivos) > limite:
+            raise Exception(f"O período pede {len(arquivos)} arquivos anuais, mas o SQLite anexa "
+                            f"no máximo {limite}. Reduza o intervalo do relatório.")
+        esquemas = []
+        try:
+            for ano, caminho in arquivos:
+                if not os.path.exists(caminho):
+                    raise Exception(f"Arquivo de pedidos de {ano} não encontrado: {caminho}")
+                esquema = f"arq_{ano}"
+                conn.execute(f"ATTACH DATABASE ? AS {esquema};",
+                             (f"file:{pathname2url(caminho)}?mode=ro",))
+                esquemas.append(esquema)
+            # query_only também bloqueia o esquema temp; os arquivos seguem mode=ro
+            conn.execute("PRAGMA query_only = OFF;")
+            try:
+                for tabela in TABELAS_ARQUIVADAS:
+                    conn.execute(f"CREATE TEMP VIEW {tabela}_historico AS {_sql_union(conn, tabela, esquemas)};")
+            finally:
+                conn.execute("PRAGMA query_only = ON;")
+            with db.snapshot():
+                yield conn
+        finally:
+            conn.execute("PRAGMA query_only = OFF;")
+            for tabela in TABELAS_ARQUIVADAS:
+                conn.execute(f"DROP VIEW IF EXISTS temp.{tabela}_historico;")
+            conn.execute("PRAGMA query_only = ON;")
+            for esquema in esquemas:
+                conn.execute(f"DETACH DATABASE {esquema};")
@@ -0,0 +1,161 @@
+import asyncio
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+from utils import log_info, log_erro
+
+# =================================================================
+# --- FACHADA ASSÍNCRONA DO BANCO DE DADOS ---
+# =================================================================
+
+
+class BancoAssincrono:
+    """
+    Fachada assíncrona sobre o db.py.
+
+    Todo o trabalho de banco roda em uma única thread dedicada, que mantém
+    uma conexão do pool emprestada durante toda a vida do objeto. Como o
+    pool é reentrante por thread, qualquer função de db.py ou
+    core/database.py chamada nessa thread reutiliza a mesma conexão.
+    A thread usa sempre o armazenamento informado (padrão: o atual).
+
+    Uso (dentro de uma corrotina):
+        linhas = await banco.consultar("SELECT ...", (param,))
+        await banco.executar("UPDATE ...", (param,))
+        dados = await banco.chamar(database.fetch_relatorio_pedidos, inicio, fim)
+    """
+
+    def __init__(self, armazenamento: db.Armazenamento = None):
+        self.armazenamento = armazenamento or db.obter_armazenamento()
+        self._ctx_armazenamento = None
+        self._ctx_conexao = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="db-async",
+            initializer=self._abrir_conexao
+        )
+
+    def _abrir_conexao(self):
+        """Roda na thread do banco: fixa o armazenamento e empresta a conexão que ela vai usar."""
+        self._ctx_armazenamento = db.usar_armazenamento(self.armazenamento)
+        self._ctx_armazenamento.__enter__()
+        self._ctx_conexao = db.conexao()
+        self._ctx_conexao.__enter__()
+
+    def _fechar_conexao(self):
+        """Roda na thread do banco: devolve a conexão ao pool."""
+        if self._ctx_conexao is not None:
+            self._ctx_conexao.__exit__(None, None, None)
+            self._ctx_conexao = None
+        if self._ctx_armazenamento is not None:
+            self._ctx_armazenamento.__exit__(None, None, None)
+            self._ctx_armazenamento = None
+
+    async def chamar(self, func, *args, **kwargs):
+        """Executa qualquer função síncrona de acesso a dados na thread do banco."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def consultar(self, sql: str, parametros: tuple = ()) -> list:
+        """Executa um SELECT e retorna a lista de tuplas."""
+        return await self.chamar(db.executar_comando, sql, parametros)
+
+    async def executar(self, sql: str, parametros: tuple = ()):
+        """Executa um INSERT/UPDATE/DELETE com commit."""
+        return await self.chamar(db.executar_comando, sql, parametros)
+
+    def fechar(self):
+        """Devolve a conexão ao pool e encerra a thread do banco."""
+        try:
+            self._executor.submit(self._fechar_conexao).result(timeout=5)
+        except Exception as e:
+            log_erro("Falha ao fechar a conexão da thread assíncrona do banco.", e)
+        self._executor.shutdown(wait=True)
+
+
+# =================================================================
+# --- PONTE ASYNCIO <-> TKINTER ---
+# =================================================================
+
+
+class PonteTk:
+    """
+    Permite que callbacks do Tkinter disparem corrotinas sem travar a janela.
+
+    Um event loop asyncio roda em uma thread própria. Os resultados das
+    corrotinas são enfileirados e entregues na thread do Tk via root.after,
+    que é o único lugar seguro para atualizar widgets.
+    """
+
+    # Intervalo (ms) entre verificações de tarefas concluídas
+    INTERVALO_MS = 50
+
+    def __init__(self, root):
+        self.root = root
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="asyncio-tk", daemon=True)
+        self._thread.start()
+        self._concluidas = queue.Queue()
+        self._pendentes = 0
+        self._agendamento = None
+
+    def submeter(self, corrotina, ao_sucesso, ao_erro=None):
+        """
+        Agenda a corrotina no event loop.
+
+        Args:
+            corrotina: O objeto corrotina a executar.
+            ao_sucesso: Callback (recebe o resultado), chamado na thread do Tk.
+            ao_erro: Callback opcional (recebe a exceção), chamado na thread do Tk.
+
+        Returns:
+            concurrent.futures.Future da tarefa (permite cancelar).
+        """
+        future = asyncio.run_coroutine_threadsafe(corrotina, self.loop)
+        self._pendentes += 1
+        future.add_done_callback(lambda f: self._concluidas.put((f, ao_sucesso, ao_erro)))
+        self._agendar()
+        return future
+
+    def _agendar(self):
+        if self._agendamento is None:
+            self._agendamento = self.root.after(self.INTERVALO_MS, self._processar_concluidas)
+
+    def _processar_concluidas(self):
+        """Roda na thread do Tk: entrega os resultados aos callbacks."""
+        self._agendamento = None
+        while True:
+            try:
+                future, ao_sucesso, ao_erro = self._concluidas.get_nowait()
+            except queue.Empty:
+                break
+            self._pendentes -= 1
+            if future.cancelled():
+                continue
+            excecao = future.exception()
+            if excecao is None:
+                ao_sucesso(future.result())
+            elif ao_erro:
+                ao_erro(excecao)
+            else:
+                log_erro("Tarefa assíncrona falhou sem callback de erro.", excecao)
+
+        if self._pendentes > 0:
+            self._agendar()
+
+    def fechar(self):
+        """Para o event loop e cancela a verificação agendada."""
+        if self._agendamento is not None:
+            try:
+                self.root.after_cancel(self._agendamento)
+            except Exception:
+                pass
+            self._agendamento = None
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=2)
+        if not self._thread.is_alive():
+            self.loop.close()
+        log_info("Event loop assíncrono encerrado.")
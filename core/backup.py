@@ -0,0 +1,139 @@
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+import db
+from utils import log_info, log_erro
+
+# =================================================================
+# --- BACKUP ONLINE DO BANCO (API DE BACKUP DO SQLITE) ---
+# =================================================================
+
+# Pasta onde os backups são gravados
+PASTA_BACKUPS = os.getenv("DB_PASTA_BACKUPS", "backups")
+
+# Quantidade de backups mantidos na pasta (os mais antigos são apagados)
+BACKUPS_MANTIDOS = int(os.getenv("DB_BACKUPS_MANTIDOS", "5"))
+
+# Páginas copiadas por passo e pausa (s) entre passos: valores pequenos
+# deixam o banco livre para a gravação de pedidos durante o backup
+PAGINAS_POR_PASSO = 256
+PAUSA_ENTRE_PASSOS = 0.005
+
+_RE_ARQUIVO_BACKUP = re.compile(r"^backup_\d{8}_\d{6}(?:_\d+)?\.db$")
+
+
+def listar_backups(pasta: str = None) -> list:
+    """Retorna os caminhos dos backups da pasta, do mais antigo ao mais recente."""
+    pasta = pasta or PASTA_BACKUPS
+    if not os.path.isdir(pasta):
+        return []
+    nomes = sorted(n for n in os.listdir(pasta) if _RE_ARQUIVO_BACKUP.match(n))
+    return [os.path.join(pasta, n) for n in nomes]
+
+
+def verificar_backup(caminho: str) -> bool:
+    """Executa PRAGMA integrity_check no arquivo; True se o resultado for 'ok'."""
+    conn = sqlite3.connect(caminho)
+    try:
+        resultado = conn.execute("PRAGMA integrity_check;").fetchall()
+        return resultado == [("ok",)]
+    finally:
+        conn.close()
+
+
+def _rotacionar(pasta: str, manter: int) -> list:
+    """Apaga os backups mais antigos, mantendo apenas os `manter` mais recentes."""
+    removidos = []
+    backups = listar_backups(pasta)
+    for caminho in backups[:max(len(backups) - manter, 0)]:
+        os.remove(caminho)
+        removidos.append(caminho)
+    return removidos
+
+
+def _novo_caminho(pasta: str) -> str:
+    """Gera um nome de arquivo único com data e hora (backup_AAAAMMDD_HHMMSS.db)."""
+    base = f"backup_{datetime.now():%Y%m%d_%H%M%S}"
+    caminho = os.path.join(pasta, f"{base}.db")
+    n = 1
+    while os.path.exists(caminho):
+        caminho = os.path.join(pasta, f"{base}_{n}.db")
+        n += 1
+    return caminho
+
+
+def fazer_backup(pasta: str = None, manter: int = None, paginas_por_passo: int = PAGINAS_POR_PASSO,
+                 pausa: float = PAUSA_ENTRE_PASSOS, ao_progresso=None) -> dict:
+    """
+    Copia o banco em uso para um novo arquivo da pasta de backups, sem
+    fechar a aplicação.
+
+    A cópia usa sqlite3.Connection.backup em passos de `paginas_por_passo`
+    páginas, com uma pausa entre eles. A origem é uma conexão somente
+    leitura mantida em um único db.snapshot(): a cópia corresponde a um
+    instante consistente do banco e, em modo WAL, não impede nem é
+    reiniciada pelas gravações feitas em paralelo.
+
+    O arquivo é gravado como .tmp, verificado com PRAGMA integrity_check e
+    só então renomeado; depois os backups mais antigos que excedem
+    `manter` são apagados.
+
+    Args:
+        pasta: Pasta de destino (padrão: PASTA_BACKUPS).
+        manter: Quantos backups manter (padrão: BACKUPS_MANTIDOS).
+        paginas_por_passo: Páginas copiadas por passo.
+        pausa: Segundos de espera entre os passos.
+        ao_progresso: Callback opcional (recebe páginas copiadas e total).
+
+    Returns:
+        dict com "arquivo", "paginas", "segundos" e "removidos".
+    """
+    pasta = pasta or PASTA_BACKUPS
+    manter = BACKUPS_MANTIDOS if manter is None else manter
+    if manter < 1:
+        raise ValueError("É preciso manter pelo menos 1 backup.")
+    os.makedirs(pasta, exist_ok=True)
+
+    caminho = _novo_caminho(pasta)
+    temporario = caminho + ".tmp"
+    paginas = {"total": 0}
+
+    def progresso(status, restantes, total):
+        paginas["total"] = total
+        if ao_progresso:
+            ao_progresso(total - restantes, total)
+        if restantes and pausa > 0:
+            time.sleep(pausa)
+
+    log_info(f"Iniciando backup do banco para: {caminho}")
+    inicio = time.perf_counter()
+    destino = sqlite3.connect(temporario)
+    try:
+        with db.snapshot() as origem:
+            origem.backup(destino, pages=paginas_por_passo, progress=progresso)
+        # O cabeçalho copiado marca o arquivo como WAL; o backup fica em um arquivo só
+        destino.execute("PRAGMA journal_mode = DELETE;").fetchone()
+        destino.close()
+
+        if not verificar_backup(temporario):
+            raise Exception(f"O backup gerado falhou no integrity_check: {temporario}")
+        os.replace(temporario, caminho)
+    except Exception as e:
+        destino.close()
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        log_erro("Falha ao gerar backup do banco.", e)
+        raise Exception(f"Erro ao gerar backup do banco: {e}") from e
+
+    segundos = time.perf_counter() - inicio
+    removidos = _rotacionar(pasta, manter)
+    log_info(f"Backup concluído em {segundos:.2f}s ({paginas['total']} páginas): {caminho}")
+    return {
+        "arquivo": caminho,
+        "paginas": paginas["total"],
+        "segundos": segundos,
+        "removidos": removidos,
+    }
@@ -1,14 +1,40 @@
+import json
+import re
+import sqlite3
 import db
+import models
 import utils
-from datetime import datetime
+from . import arquivo
+from datetime import datetime, date
+from functools import lru_cache
+
+# Valores monetários (preco, total, receita, ticket médio, preco_unit) são
+# retornados em centavos (int), como estão no banco; as telas e exportações
+# formatam com models.Dinheiro / models.formatar_centavos.
+
+
+def intervalo_mes(referencia: date) -> tuple:
+    """
+    Retorna o intervalo semiaberto [primeiro dia do mês, primeiro dia do mês
+    seguinte) como strings YYYY-MM-DD, para filtros do tipo
+    "data >= ? AND data < ?", que usam o índice idx_pedidos_relatorio_data.
+    """
+    inicio = referencia.replace(day=1)
+    if inicio.month == 12:
+        fim = inicio.replace(year=inicio.year + 1, month=1)
+    else:
+        fim = inicio.replace(month=inicio.month + 1)
+    return inicio.isoformat(), fim.isoformat()
+
 
 def fetch_dados_dashboard():
     """
     Busca os dados agregados (KPIs) do banco de dados para o Dashboard.
-    Retorna: (total_clientes, total_pedidos_mes, ticket_medio_mes)
+    Retorna: (total_clientes, total_pedidos_mes, ticket_medio_mes), com o
+    ticket médio em centavos.
     """
 
-    # Define o mês atual no formato YYYY-MM para o SQLite
+    # Mês atual no formato YYYY-MM (chave da tabela resumo_mensal)
     mes_atual_param = datetime.now().strftime('%Y-%m')
 
     # Query 1: Total de Clientes (Agregação COUNT)
@@ -16,21 +42,236 @@ def fetch_dados_dashboard():
     sql_clientes = "SELECT COUNT(id) FROM clientes;"
     total_clientes = db.executar_comando(sql_clientes)[0][0]
 
-    # Query 2: Total de Pedidos no Mês (COUNT + WHERE)
-    sql_pedidos = "SELECT COUNT(id) FROM pedidos WHERE strftime('%Y-%m', data) = ?;"
-    total_pedidos_mes = db.executar_comando(sql_pedidos, (mes_atual_param,))[0][0]
-
-    # Query 3: Ticket Médio do Mês (AVG + WHERE)
-    sql_ticket = "SELECT AVG(total) FROM pedidos WHERE strftime('%Y-%m', data) = ?;"
-    ticket_medio_mes = db.executar_comando(sql_ticket, (mes_atual_param,))[0][0]
+    # Query 2: Pedidos e Receita do Mês, lidos do resumo mantido por triggers
+    # (uma busca pela chave primária, independente do tamanho de pedidos)
+    sql_resumo = "SELECT pedidos, receita FROM resumo_mensal WHERE mes = ?;"
+    resumo = db.executar_comando(sql_resumo, (mes_atual_param,))
 
-    # Se não houver pedidos no mês, AVG retorna None. Tratamos isso.
-    if ticket_medio_mes is None:
-        ticket_medio_mes = 0.0
+    # Se não houver pedidos no mês, não há linha no resumo. Tratamos isso.
+    total_pedidos_mes, receita_mes = resumo[0] if resumo else (0, 0)
+    # Divisão inteira arredondada ao centavo mais próximo
+    ticket_medio_mes = (receita_mes + total_pedidos_mes // 2) // total_pedidos_mes if total_pedidos_mes else 0
 
     return total_clientes, total_pedidos_mes, ticket_medio_mes
 
 
+def fetch_resumo_periodo(mes_inicio: str = None, mes_fim: str = None):
+    """
+    Busca o resumo de vendas por mês (tabela resumo_mensal) no período
+    [mes_inicio, mes_fim], ambos no formato YYYY-MM e opcionais.
+    Retorna tuplas (mes, pedidos, receita, ticket_medio, quantidade_itens, clientes_distintos),
+    com receita e ticket médio em centavos.
+    """
+    params = []
+    where_clauses = []
+    if mes_inicio:
+        where_clauses.append("mes >= ?")
+        params.append(mes_inicio)
+    if mes_fim:
+        where_clauses.append("mes <= ?")
+        params.append(mes_fim)
+
+    where_sql = ""
+    if where_clauses:
+        where_sql = "WHERE " + " AND ".join(where_clauses)
+
+    sql = f"""
+    SELECT mes, pedidos, receita,
+           CASE WHEN pedidos > 0 THEN (receita + pedidos / 2) / pedidos ELSE 0 END AS ticket_medio,
+           quantidade_itens, clientes_distintos
+    FROM resumo_mensal
+    {where_sql}
+    ORDER BY mes;
+    """
+    try:
+        return db.executar_comando(sql, tuple(params))
+    except Exception as e:
+        raise Exception(f"Erro ao buscar resumo do período: {e}")
+
+
+# --- BUSCA DE CLIENTES E PRODUTOS (FTS5) ---
+
+# Cache de quais tabelas *_fts existem (o SQLite pode ter sido compilado sem FTS5),
+# por armazenamento
+_fts_disponivel = {}
+
+
+def _fts_ativo(tabela: str) -> bool:
+    chave = (db.obter_armazenamento().nome, tabela)
+    if chave not in _fts_disponivel:
+        _fts_disponivel[chave] = db.tabela_existe(f"{tabela}_fts")
+    return _fts_disponivel[chave]
+
+
+def _montar_consulta_fts(termo: str):
+    """
+    Converte o texto digitado em uma consulta FTS5 de prefixos:
+    "ana sil" -> '"ana"* "sil"*' (todas as palavras, cada uma como prefixo).
+    Retorna None se o termo não tiver nenhuma palavra pesquisável.
+    """
+    palavras = re.findall(r"\w+", termo)
+    if not palavras:
+        return None
+    return " ".join(f'"{p}"*' for p in palavras)
+
+
+def buscar_clientes(termo: str = None):
+    """
+    Busca clientes por nome/e-mail, ordenados por relevância (bm25).
+    Sem termo, retorna todos por nome. Retorna objetos models.Cliente,
+    montados direto do cursor.
+    """
+    consulta = _montar_consulta_fts(termo) if termo else None
+    if consulta is None:
+        sql = "SELECT id, nome, email, telefone FROM clientes ORDER BY nome"
+        params = ()
+    elif _fts_ativo("clientes"):
+        sql = """
+        SELECT c.id, c.nome, c.email, c.telefone
+        FROM clientes_fts f
+        JOIN clientes c ON c.id = f.rowid
+        WHERE clientes_fts MATCH ?
+        ORDER BY bm25(clientes_fts, 10.0, 1.0), c.nome  -- acerto no nome pesa mais que no e-mail
+        """
+        params = (consulta,)
+    else:
+        sql = "SELECT id, nome, email, telefone FROM clientes WHERE nome LIKE ? OR email LIKE ? ORDER BY nome"
+        params = (f"%{termo}%", f"%{termo}%")
+    return db.executar_comando(sql, params, fabrica=models.Cliente.from_row)
+
+
+def buscar_produtos(termo: str = None):
+    """
+    Busca produtos por nome, ordenados por relevância (bm25).
+    Sem termo, retorna todos por nome. Retorna tuplas (id, nome, preco).
+    """
+    consulta = _montar_consulta_fts(termo) if termo else None
+    if consulta is None:
+        sql = "SELECT id, nome, preco FROM produtos ORDER BY nome"
+        params = ()
+    elif _fts_ativo("produtos"):
+        sql = """
+        SELECT p.id, p.nome, p.preco
+        FROM produtos_fts f
+        JOIN produtos p ON p.id = f.rowid
+        WHERE produtos_fts MATCH ?
+        ORDER BY f.rank, p.nome
+        """
+        params = (consulta,)
+    else:
+        sql = "SELECT id, nome, preco FROM produtos WHERE nome LIKE ? ORDER BY nome"
+        params = (f"%{termo}%",)
+    return db.executar_comando(sql, params)
+
+
+# --- LISTAGENS PAGINADAS (KEYSET) ---
+# Cada página começa logo após a chave da última linha da página anterior
+# ("apos"), então o custo é o de uma busca no índice + N linhas, sem OFFSET.
+
+PAGINA_TAMANHO = 200
+
+
+def fetch_pagina_pedidos(apos: tuple = None, tamanho: int = PAGINA_TAMANHO):
+    """
+    Busca uma página de pedidos (id, data, cliente, itens, total), do mais
+    recente ao mais antigo. `apos` é a chave (data, id) do último pedido já
+    exibido.
+    """
+    where_sql = ""
+    params = []
+    if apos:
+        where_sql = "WHERE (p.data, p.id) < (?, ?)"
+        params.extend(apos)
+    sql = f"""
+    SELECT p.id, p.data, c.nome, p.total_itens, p.total
+    FROM pedidos p
+    JOIN clientes c ON p.cliente_id = c.id
+    {where_sql}
+    ORDER BY p.data DESC, p.id DESC
+    LIMIT ?
+    """
+    params.append(tamanho)
+    return db.executar_comando(sql, tuple(params))
+
+
+def fetch_pagina_clientes(apos: tuple = None, tamanho: int = PAGINA_TAMANHO):
+    """
+    Busca uma página de clientes (models.Cliente) em ordem de nome.
+    `apos` é a chave (nome, id) do último cliente já exibido.
+    """
+    where_sql = ""
+    params = []
+    if apos:
+        where_sql = "WHERE (nome, id) > (?, ?)"
+        params.extend(apos)
+    sql = f"""
+    SELECT id, nome, email, telefone
+    FROM clientes
+    {where_sql}
+    ORDER BY nome, id
+    LIMIT ?
+    """
+    params.append(tamanho)
+    return db.executar_comando(sql, tuple(params), fabrica=models.Cliente.from_row)
+
+
+def fetch_pagina_produtos(apos: tuple = None, tamanho: int = PAGINA_TAMANHO):
+    """
+    Busca uma página de produtos (id, nome, preco) em ordem de nome.
+    `apos` é a chave (nome, id) do último produto já exibido.
+    """
+    where_sql = ""
+    params = []
+    if apos:
+        where_sql = "WHERE (nome, id) > (?, ?)"
+        params.extend(apos)
+    sql = f"""
+    SELECT id, nome, preco
+    FROM produtos
+    {where_sql}
+    ORDER BY nome, id
+    LIMIT ?
+    """
+    params.append(tamanho)
+    return db.executar_comando(sql, tuple(params))
+
+
+class CarregadorPaginado:
+    """
+    Guarda o estado de uma listagem paginada por chave (keyset).
+
+    Args:
+        buscar_pagina: Função (apos, tamanho) -> lista de linhas.
+        chave_da_linha: Função que extrai a chave de ordenação de uma linha.
+        tamanho: Linhas por página.
+    """
+
+    def __init__(self, buscar_pagina, chave_da_linha, tamanho: int = PAGINA_TAMANHO):
+        self.buscar_pagina = buscar_pagina
+        self.chave_da_linha = chave_da_linha
+        self.tamanho = tamanho
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Volta para o início da listagem."""
+        self._apos = None
+        self.tem_mais = True
+        self.total_carregado = 0
+
+    def proxima_pagina(self) -> list:
+        """Busca a próxima página (lista vazia se já chegou ao fim)."""
+        if not self.tem_mais:
+            return []
+        # Busca uma linha extra só para saber se existe página seguinte
+        linhas = self.buscar_pagina(self._apos, self.tamanho + 1)
+        self.tem_mais = len(linhas) > self.tamanho
+        linhas = linhas[:self.tamanho]
+        if linhas:
+            self._apos = self.chave_da_linha(linhas[-1])
+        self.total_carregado += len(linhas)
+        return linhas
+
+
 # --- NOVAS FUNÇÕES DE RELATÓRIO ---
 
 def fetch_clientes_para_combobox():
@@ -44,106 +285,237 @@ def fetch_clientes_para_combobox():
         raise Exception(f"Erro ao buscar lista de clientes: {e}")
 
 
-def fetch_relatorio_pedidos(data_inicio=None, data_fim=None, cliente_id=None):
+# --- RELATÓRIO DE PEDIDOS (CONSTRUTOR DE CONSULTA) ---
+# O texto SQL só depende de *quais* filtros estão preenchidos (a "forma"
+# da consulta), não dos valores: ele é montado uma vez por forma
+# (lru_cache) e, como o texto se repete, a conexão reaproveita o
+# statement já preparado. Cada filtro e ordenação é atendido por um dos
+# índices de cobertura de db.INDICES_RELATORIO (migração 10), com uma
+# exceção: o filtro de produto parte de idx_itens_pedido_produto (o IN
+# vira uma lista de ids buscados pela chave primária de pedidos), e a
+# ordenação desses pedidos usa uma B-tree temporária. O custo cresce com
+# o número de pedidos do produto, mesmo com LIMIT.
+
+# Filtro -> condição, na ordem em que os parâmetros entram na consulta
+FILTROS_RELATORIO = {
+    "data_inicio": "p.data >= ?",
+    "data_fim": "p.data <= ?",
+    "cliente_id": "p.cliente_id = ?",
+    "total_min": "p.total >= ?",          # centavos (int ou models.Dinheiro)
+    "total_max": "p.total <= ?",
+    "itens_min": "p.total_itens >= ?",
+    "itens_max": "p.total_itens <= ?",
+    "produto_id": "p.id IN (SELECT i.pedido_id FROM {itens} i WHERE i.produto_id = ?)",
+}
+
+# Ordenação -> colunas; o id desempata e deixa a ordem estável
+ORDENACOES_RELATORIO = {
+    "data": ("p.data", "p.id"),
+    "total": ("p.total", "p.id"),
+    "itens": ("p.total_itens", "p.id"),
+}
+
+
+@lru_cache(maxsize=128)
+def _sql_relatorio(filtros: tuple, ordenar_por: str, decrescente: bool, com_limite: bool,
+                   historico: bool) -> str:
+    """Monta o SELECT do relatório para uma forma de consulta (ver montar_consulta_relatorio)."""
+    tabela_pedidos = "pedidos_historico" if historico else "pedidos"
+    tabela_itens = "itens_pedido_historico" if historico else "itens_pedido"
+    where_sql = ""
+    if filtros:
+        where_sql = "WHERE " + " AND ".join(FILTROS_RELATORIO[f].format(itens=tabela_itens) for f in filtros)
+    direcao = "DESC" if decrescente else "ASC"
+    order_sql = ", ".join(f"{coluna} {direcao}" for coluna in ORDENACOES_RELATORIO[ordenar_por])
+    # A contagem de itens vem do contador mantido pelos triggers de itens_pedido (migração 9)
+    return f"""
+    SELECT p.id, p.data, c.nome, p.total_itens, p.total
+    FROM {tabela_pedidos} p
+    JOIN clientes c ON p.cliente_id = c.id
+    {where_sql}
+    ORDER BY {order_sql}{" LIMIT ?" if com_limite else ""};
     """
-    Busca pedidos filtrados para o relatório, incluindo contagem de itens.
+
+
+def montar_consulta_relatorio(historico: bool = False, ordenar_por: str = "data", decrescente: bool = True,
+                              limite: int = None, **filtros) -> tuple:
     """
+    Monta a query do relatório de pedidos. Retorna (sql, params).
 
-    # Parâmetros e cláusulas WHERE dinâmicas
-    params = []
-    where_clauses = []
+    Args:
+        historico: Lê as views de arquivo.conexao_historico (base
+                   principal + arquivos anuais).
+        ordenar_por: Uma chave de ORDENACOES_RELATORIO ("data", "total", "itens").
+        decrescente: Direção da ordenação.
+        limite: Máximo de linhas (None = todas).
+        **filtros: Chaves de FILTROS_RELATORIO; None ou "" não filtra.
+    """
+    desconhecidos = set(filtros) - set(FILTROS_RELATORIO)
+    if desconhecidos:
+        raise ValueError(f"Filtro(s) de relatório desconhecido(s): {', '.join(sorted(desconhecidos))}")
+    if ordenar_por not in ORDENACOES_RELATORIO:
+        raise ValueError(f"Ordenação de relatório inválida: '{ordenar_por}'")
+    if limite is not None and int(limite) <= 0:
+        raise ValueError("O limite do relatório deve ser maior que zero.")
 
-    # --- Montagem dinâmica da Query ---
-    if data_inicio:
-        where_clauses.append("p.data >= ?")
-        params.append(data_inicio)
+    ativos = tuple(nome for nome in FILTROS_RELATORIO if filtros.get(nome) not in (None, ""))
+    sql = _sql_relatorio(ativos, ordenar_por, bool(decrescente), limite is not None, historico)
+    params = [filtros[nome] for nome in ativos]
+    if limite is not None:
+        params.append(int(limite))
+    return sql, tuple(params)
 
-    if data_fim:
-        where_clauses.append("p.data <= ?")
-        params.append(data_fim)
 
-    if cliente_id:
-        where_clauses.append("p.cliente_id = ?")
-        params.append(cliente_id)
+def fetch_relatorio_pedidos(data_inicio=None, data_fim=None, cliente_id=None, cancelamento=None, **opcoes):
+    """
+    Busca pedidos filtrados para o relatório: tuplas (id, data, cliente,
+    itens, total). Lê de uma conexão somente leitura (db.snapshot); os
+    arquivos anuais só são anexados se o período alcançar pedidos
+    arquivados.
 
-    # Constrói a string WHERE
-    where_sql = ""
-    if where_clauses:
-        where_sql = "WHERE " + " AND ".join(where_clauses)
+    `opcoes` são os demais filtros (total_min, total_max, itens_min,
+    itens_max, produto_id), ordenar_por, decrescente e limite; ver
+    montar_consulta_relatorio.
 
-    # Query principal com JOIN e Subquery para contagem de itens
-    sql = f"""
-    SELECT 
-        p.id,
-        p.data,
-        c.nome,
-        (SELECT COUNT(ip.id) 
-        FROM itens_pedido ip 
-        WHERE ip.pedido_id = p.id) as total_itens,
-        p.total
-    FROM pedidos p
-    JOIN clientes c ON p.cliente_id = c.id
-    {where_sql}
-    ORDER BY p.data DESC;
+    Com `cancelamento` (db.Cancelamento), a consulta pode ser interrompida
+    pela UI ou pelo tempo máximo; o erro resultante satisfaz
+    db.consulta_interrompida e é repassado sem ser reembrulhado.
     """
+    try:
+        arquivos = arquivo.arquivos_no_intervalo(data_inicio, data_fim)
+        sql, params = montar_consulta_relatorio(historico=bool(arquivos), data_inicio=data_inicio,
+                                                data_fim=data_fim, cliente_id=cliente_id, **opcoes)
+        if not arquivos:
+            return db.consultar_leitura(sql, params, cancelamento=cancelamento)
+        with arquivo.conexao_historico(arquivos) as conn, db.consulta_cancelavel(conn, cancelamento):
+            return conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError as e:
+        if db.consulta_interrompida(e):
+            raise
+        raise Exception(f"Erro ao gerar relatório de pedidos: {e}")
+    except Exception as e:
+        raise Exception(f"Erro ao gerar relatório de pedidos: {e}")
+
 
+def iterar_relatorio_pedidos(data_inicio=None, data_fim=None, cliente_id=None, cancelamento=None, **opcoes):
+    """
+    Versão em streaming de fetch_relatorio_pedidos: gera as linhas
+    (id, data, cliente, itens, total) sem materializar o resultado inteiro.
+    Usada pelas exportações CSV/PDF: a exportação inteira lê um único
+    snapshot somente leitura e não bloqueia a gravação de pedidos.
+    `cancelamento` e `opcoes` como em fetch_relatorio_pedidos.
+    """
     try:
-        # Converte a lista de params para tupla
-        resultados = db.executar_comando(sql, tuple(params))
-        return resultados
+        arquivos = arquivo.arquivos_no_intervalo(data_inicio, data_fim)
+        sql, params = montar_consulta_relatorio(historico=bool(arquivos), data_inicio=data_inicio,
+                                                data_fim=data_fim, cliente_id=cliente_id, **opcoes)
+        if not arquivos:
+            yield from db.iterar_consulta(sql, params, somente_leitura=True, cancelamento=cancelamento)
+            return
+        with arquivo.conexao_historico(arquivos) as conn, db.consulta_cancelavel(conn, cancelamento):
+            cursor = conn.cursor()
+            cursor.arraysize = db.STREAM_TAMANHO_PADRAO
+            cursor.execute(sql, params)
+            while True:
+                linhas = cursor.fetchmany()
+                if not linhas:
+                    break
+                yield from linhas
+    except sqlite3.OperationalError as e:
+        if db.consulta_interrompida(e):
+            raise
+        raise Exception(f"Erro ao gerar relatório de pedidos: {e}")
     except Exception as e:
         raise Exception(f"Erro ao gerar relatório de pedidos: {e}")
-    
+
+
+# --- PEDIDOS COMPLETOS (PEDIDO + ITENS EM LOTE) ---
+# Os pedidos são lidos em uma consulta e os itens de todos eles em outra
+# (pedido_id IN json_each(?), pelo índice idx_itens_pedido_pedido_id),
+# em vez de uma consulta de itens por pedido. O custo cresce com o número
+# de linhas, não com o número de consultas.
+
+SQL_PEDIDOS_COMPLETOS = """
+SELECT p.id, p.cliente_id, p.data, p.total, p.total_itens, p.quantidade_total, c.nome
+FROM pedidos p
+JOIN clientes c ON p.cliente_id = c.id
+"""
+
+SQL_ITENS_DOS_PEDIDOS = """
+SELECT ip.id, ip.pedido_id, pr.nome, ip.quantidade, ip.preco_unit
+FROM itens_pedido ip
+JOIN produtos pr ON ip.produto_id = pr.id
+WHERE ip.pedido_id IN (SELECT value FROM json_each(?))
+"""
+
+
+def _pedido_com_cliente(cursor, linha):
+    """row_factory: models.Pedido com o nome do cliente (7ª coluna)."""
+    pedido = models.Pedido.from_row(cursor, linha)
+    pedido.nome_cliente = linha[6]
+    return pedido
+
+
+def _anexar_itens(pedidos: list, cancelamento: db.Cancelamento = None) -> list:
+    """Preenche `itens` de todos os pedidos com uma única consulta."""
+    if not pedidos:
+        return pedidos
+    por_id = {pedido.id: pedido for pedido in pedidos}
+    itens = db.consultar_leitura(SQL_ITENS_DOS_PEDIDOS, (json.dumps(list(por_id)),), cancelamento,
+                                 fabrica=models.ItemPedido.from_row)
+    for item in itens:
+        por_id[item.pedido_id].itens.append(item)
+    return pedidos
+
+
+def carregar_pedidos(pedido_ids, cancelamento: db.Cancelamento = None) -> list:
+    """
+    Carrega os pedidos informados como models.Pedido, com nome do cliente e
+    itens preenchidos, em duas consultas (qualquer quantidade de ids).
+    Mantém a ordem de `pedido_ids`; ids inexistentes são ignorados.
+    Para telas de detalhe e exportações que precisam dos itens.
+    """
+    pedido_ids = list(pedido_ids)
+    if not pedido_ids:
+        return []
+    sql = SQL_PEDIDOS_COMPLETOS + "WHERE p.id IN (SELECT value FROM json_each(?))"
+    try:
+        # Pedidos e itens lidos do mesmo snapshot somente leitura
+        with db.snapshot():
+            pedidos = db.consultar_leitura(sql, (json.dumps(pedido_ids),), cancelamento,
+                                           fabrica=_pedido_com_cliente)
+            _anexar_itens(pedidos, cancelamento)
+    except sqlite3.Error as e:
+        if db.consulta_interrompida(e):
+            raise
+        raise Exception(f"Erro ao carregar pedidos: {e}")
+    por_id = {pedido.id: pedido for pedido in pedidos}
+    return [por_id[pedido_id] for pedido_id in pedido_ids if pedido_id in por_id]
+
+
+def fetch_ultimos_pedidos(limite: int = 5, cancelamento: db.Cancelamento = None) -> list:
+    """
+    Busca os últimos N pedidos (mais recentes primeiro) como models.Pedido
+    com itens, em duas consultas independentemente de N.
+    """
+    sql = SQL_PEDIDOS_COMPLETOS + "ORDER BY p.data DESC, p.id DESC LIMIT ?"
+    try:
+        with db.snapshot():
+            pedidos = db.consultar_leitura(sql, (limite,), cancelamento, fabrica=_pedido_com_cliente)
+            return _anexar_itens(pedidos, cancelamento)
+    except sqlite3.Error as e:
+        if db.consulta_interrompida(e):
+            raise
+        raise Exception(f"Erro ao buscar últimos pedidos: {e}")
+
 
 def fetch_ultimos_pedidos_para_analise(limite: int = 5):
     """
     Busca os últimos N pedidos e seus respectivos itens para análise de IA.
-    Retorna uma lista de dicionários, cada um representando um pedido.
+    Retorna uma lista de models.Pedido (ver fetch_ultimos_pedidos).
     """
     utils.log_info(f"Buscando {limite} últimos pedidos para análise.")
-    
-    # 1. Buscar os últimos 5 pedidos
-    sql_pedidos = """
-    SELECT p.id, p.data, p.total, c.nome
-    FROM pedidos p
-    JOIN clientes c ON p.cliente_id = c.id
-    ORDER BY p.data DESC, p.id DESC
-    LIMIT ?;
-    """
     try:
-        ultimos_pedidos = db.executar_comando(sql_pedidos, (limite,))
-        
-        pedidos_formatados = []
-        
-        # 2. Para cada pedido, buscar seus itens
-        for p in ultimos_pedidos:
-            pedido_id, data, total, cliente_nome = p
-            
-            sql_itens = """
-            SELECT pr.nome, ip.quantidade, ip.preco_unit
-            FROM itens_pedido ip
-            JOIN produtos pr ON ip.produto_id = pr.id
-            WHERE ip.pedido_id = ?;
-            """
-            itens_tuplas = db.executar_comando(sql_itens, (pedido_id,))
-            
-            itens_list = []
-            for item in itens_tuplas:
-                itens_list.append({
-                    "produto": item[0],
-                    "quantidade": item[1],
-                    "preco_unit": item[2]
-                })
-            
-            pedidos_formatados.append({
-                "id_pedido": pedido_id,
-                "data": data,
-                "total": total,
-                "cliente": cliente_nome,
-                "itens": itens_list
-            })
-            
-        return pedidos_formatados
-
+        return fetch_ultimos_pedidos(limite)
     except Exception as e:
         raise Exception(f"Erro ao buscar dados detalhados dos pedidos: {e}")
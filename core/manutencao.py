@@ -0,0 +1,158 @@
+import os
+import time
+
+import db
+from utils import log_info, log_erro
+
+# =================================================================
+# --- MANUTENÇÃO DO BANCO (ANALYZE, OPTIMIZE, VACUUM INCREMENTAL) ---
+# =================================================================
+#
+# - ANALYZE / PRAGMA optimize: mantêm as estatísticas (sqlite_stat1) que
+#   o planejador usa para escolher índices. Sem elas, o plano é montado
+#   às cegas e não acompanha o crescimento das tabelas.
+# - PRAGMA incremental_vacuum: devolve ao sistema de arquivos as páginas
+#   liberadas por exclusões (exige auto_vacuum=INCREMENTAL, migração 7).
+#
+# O AppController roda a manutenção quando o usuário fica ocioso (ver
+# AgendadorManutencao) e uma versão rápida ao fechar a aplicação.
+
+# Intervalo mínimo (s) entre duas manutenções agendadas
+INTERVALO_MANUTENCAO = float(os.getenv("DB_INTERVALO_MANUTENCAO", "3600"))
+
+# Tempo (s) sem teclas/cliques para a aplicação ser considerada ociosa
+OCIOSIDADE_MANUTENCAO = 60
+
+# Linhas amostradas por índice no ANALYZE (0 = tabela inteira); limita a
+# duração do ANALYZE em tabelas grandes sem perder a qualidade do plano
+LIMITE_ANALISE = 1000
+
+# Páginas liberadas por execução; None libera todas
+PAGINAS_VACUO_POR_EXECUCAO = None
+# Na manutenção rápida (fechamento), para não atrasar a saída
+PAGINAS_VACUO_RAPIDA = 2000
+
+
+def estado_paginas(conn) -> dict:
+    """Retorna page_size, paginas (page_count), livres (freelist_count) e bytes."""
+    tamanho = conn.execute("PRAGMA page_size;").fetchone()[0]
+    paginas = conn.execute("PRAGMA page_count;").fetchone()[0]
+    livres = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+    return {"page_size": tamanho, "paginas": paginas, "livres": livres, "bytes": tamanho * paginas}
+
+
+def _tem_estatisticas(conn) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1';").fetchone() is not None
+
+
+def _cronometrar(etapas: dict, nome: str, operacao):
+    inicio = time.perf_counter()
+    operacao()
+    etapas[nome] = time.perf_counter() - inicio
+
+
+def executar_manutencao(rapida: bool = False, analisar: bool = False) -> dict:
+    """
+    Executa a manutenção do banco em uso e registra no log as páginas antes
+    e depois e a duração de cada etapa.
+
+    - ANALYZE completo (com analysis_limit) se o banco ainda não tem
+      estatísticas ou se `analisar=True`; caso contrário PRAGMA optimize,
+      que só reanalisa as tabelas cujas estatísticas ficaram defasadas.
+    - PRAGMA incremental_vacuum, se houver páginas livres.
+    - Checkpoint do WAL (PASSIVE), para o arquivo principal refletir a
+      redução sem esperar o checkpoint automático.
+
+    Args:
+        rapida: Versão para o fechamento da aplicação: só PRAGMA optimize
+                e no máximo PAGINAS_VACUO_RAPIDA páginas liberadas.
+        analisar: Força o ANALYZE completo.
+
+    Returns:
+        dict com "antes", "depois" (ver estado_paginas) e "etapas"
+        (segundos por etapa).
+    """
+    etapas = {}
+    with db.conexao() as conn:
+        antes = estado_paginas(conn)
+        log_info(f"Manutenção do banco iniciada{' (rápida)' if rapida else ''}: "
+                 f"{antes['paginas']} páginas, {antes['livres']} livres.")
+        try:
+            conn.execute(f"PRAGMA analysis_limit = {int(LIMITE_ANALISE)};")
+            if not rapida and (analisar or not _tem_estatisticas(conn)):
+                _cronometrar(etapas, "analyze",
+                             lambda: db.com_novas_tentativas(lambda: conn.execute("ANALYZE;")))
+            else:
+                _cronometrar(etapas, "optimize",
+                             lambda: db.com_novas_tentativas(lambda: conn.execute("PRAGMA optimize;").fetchall()))
+
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum;").fetchone()[0]
+            if auto_vacuum == 2 and antes["livres"]:
+                limite = PAGINAS_VACUO_RAPIDA if rapida else PAGINAS_VACUO_POR_EXECUCAO
+                argumento = "" if limite is None else f"({int(limite)})"
+                # executescript percorre o comando até o fim; com execute() o
+                # módulo sqlite3 libera só uma página por chamada
+                _cronometrar(etapas, "incremental_vacuum", lambda: db.com_novas_tentativas(
+                    lambda: conn.executescript(f"PRAGMA incremental_vacuum{argumento};")))
+
+            if conn.execute("PRAGMA journal_mode;").fetchone()[0] == "wal":
+                _cronometrar(etapas, "checkpoint",
+                             lambda: conn.execute("PRAGMA wal_checkpoint(PASSIVE);").fetchall())
+        except Exception as e:
+            log_erro("Falha na manutenção do banco.", e)
+            raise Exception(f"Erro na manutenção do banco: {e}") from e
+        depois = estado_paginas(conn)
+
+    resumo_etapas = ", ".join(f"{nome} {segundos * 1000:.0f} ms" for nome, segundos in etapas.items())
+    log_info(f"Manutenção do banco concluída: {antes['paginas']} -> {depois['paginas']} páginas "
+             f"({antes['livres']} -> {depois['livres']} livres, "
+             f"{(antes['bytes'] - depois['bytes']) / 1024:.0f} KiB devolvidos). Etapas: {resumo_etapas or 'nenhuma'}.")
+    return {"antes": antes, "depois": depois, "etapas": etapas}
+
+
+class AgendadorManutencao:
+    """
+    Decide quando a manutenção deve rodar: depois de INTERVALO_MANUTENCAO
+    desde a última execução (ou logo, se solicitar() foi chamado, ex.:
+    após exclusões), e só quando não há atividade do usuário há
+    OCIOSIDADE_MANUTENCAO segundos. Não tem timer próprio: quem o usa
+    chama registrar_atividade() nos eventos de entrada e pronto() de
+    tempos em tempos (no Tkinter, via root.after).
+    """
+
+    def __init__(self, intervalo: float = INTERVALO_MANUTENCAO, ociosidade: float = OCIOSIDADE_MANUTENCAO,
+                 relogio=time.monotonic):
+        self.intervalo = intervalo
+        self.ociosidade = ociosidade
+        self._relogio = relogio
+        agora = relogio()
+        self._ultima_atividade = agora
+        # A primeira manutenção espera só a ociosidade, não o intervalo inteiro
+        self._ultima_execucao = agora - intervalo
+        self._solicitada = False
+        self.em_execucao = False
+
+    def registrar_atividade(self):
+        self._ultima_atividade = self._relogio()
+
+    def solicitar(self):
+        """Antecipa a próxima manutenção para o próximo período ocioso."""
+        self._solicitada = True
+
+    def pronto(self) -> bool:
+        """True se a manutenção deve começar agora."""
+        if self.em_execucao:
+            return False
+        agora = self._relogio()
+        if agora - self._ultima_atividade < self.ociosidade:
+            return False
+        return self._solicitada or agora - self._ultima_execucao >= self.intervalo
+
+    def iniciar(self):
+        self.em_execucao = True
+        self._solicitada = False
+
+    def concluir(self):
+        self.em_execucao = False
+        self._ultima_execucao = self._relogio()
@@ -0,0 +1,155 @@
+from contextlib import contextmanager
+from itertools import islice
+
+import db
+import models
+from . import database, manutencao, sessao
+
+# =================================================================
+# --- REPOSITÓRIO (ACESSO A DADOS POR ARMAZENAMENTO) ---
+# =================================================================
+
+
+class Repositorio:
+    """
+    Interface de acesso a dados usada pelo AppController.
+
+    Cada método executa a função correspondente de core/database.py (ou
+    db.py) dentro de db.usar_armazenamento(self.armazenamento). Assim a
+    aplicação, os testes e os benchmarks escolhem o banco (arquivo ou
+    memória) na criação do repositório, e vários repositórios podem ficar
+    abertos lado a lado:
+
+        loja = Repositorio(db.Armazenamento(db.MEMORIA))
+        loja.inicializar()
+        loja.executar_comando("INSERT INTO clientes (nome) VALUES (?)", ("Ana",))
+        loja.buscar_clientes("ana")
+    """
+
+    def __init__(self, armazenamento: db.Armazenamento = None):
+        self.armazenamento = armazenamento or db.obter_armazenamento()
+        self.mapa = sessao.MapaIdentidade(self.armazenamento)
+
+    def _executar(self, func, *args, **kwargs):
+        with db.usar_armazenamento(self.armazenamento):
+            return func(*args, **kwargs)
+
+    def _iterar(self, func, *args, **kwargs):
+        # O armazenamento só fica ativo enquanto cada lote é buscado, nunca
+        # durante o yield: o ContextVar do chamador não é alterado e o
+        # gerador pode ser fechado de outro contexto.
+        gerador = func(*args, **kwargs)
+        try:
+            while True:
+                with db.usar_armazenamento(self.armazenamento):
+                    lote = list(islice(gerador, db.STREAM_TAMANHO_PADRAO))
+                if not lote:
+                    return
+                yield from lote
+        finally:
+            with db.usar_armazenamento(self.armazenamento):
+                gerador.close()
+
+    # --- Banco e conexões ---
+
+    def inicializar(self):
+        """Aplica as migrações pendentes (db.inicializar_banco)."""
+        self._executar(db.inicializar_banco)
+
+    def fechar(self):
+        """Fecha as conexões do armazenamento."""
+        self.armazenamento.fechar()
+
+    def conexao(self):
+        """Empresta uma conexão de escrita, para transações com vários comandos."""
+        return self.armazenamento.conexao()
+
+    @contextmanager
+    def transacao(self):
+        """Unidade de trabalho de escrita (db.transacao) neste armazenamento."""
+        with db.usar_armazenamento(self.armazenamento), db.transacao() as conn:
+            yield conn
+
+    def executar_comando(self, sql: str, parametros: tuple = (), fabrica=None):
+        return self._executar(db.executar_comando, sql, parametros, fabrica)
+
+    def executar_manutencao(self, rapida: bool = False, analisar: bool = False):
+        """ANALYZE/optimize e vacuum incremental (core/manutencao.py)."""
+        return self._executar(manutencao.executar_manutencao, rapida, analisar)
+
+    # --- Detecção de mudanças ---
+
+    def mudou(self, chave: str, *tabelas) -> bool:
+        """True se alguma das tabelas mudou desde a última chamada com a mesma chave."""
+        return self.armazenamento.mudou(chave, *tabelas)
+
+    def esquecer(self, chave: str = None):
+        """Força a próxima chamada de mudou(chave) a retornar True."""
+        self.armazenamento.rastreador.esquecer(chave)
+
+    # --- Mapa de identidade e unidade de trabalho (core/sessao.py) ---
+
+    def obter_cliente(self, cliente_id: int):
+        return self.mapa.obter(models.Cliente, cliente_id)
+
+    def obter_produto(self, produto_id: int):
+        return self.mapa.obter(models.Produto, produto_id)
+
+    def listar_clientes(self):
+        return self.mapa.todos(models.Cliente)
+
+    def listar_produtos(self):
+        return self.mapa.todos(models.Produto)
+
+    def unidade_de_trabalho(self) -> sessao.UnidadeDeTrabalho:
+        """Grava clientes/produtos novos, alterados e removidos em um só commit."""
+        return sessao.UnidadeDeTrabalho(self.mapa)
+
+    # --- Dashboard ---
+
+    def fetch_dados_dashboard(self):
+        return self._executar(database.fetch_dados_dashboard)
+
+    def fetch_resumo_periodo(self, mes_inicio: str = None, mes_fim: str = None):
+        return self._executar(database.fetch_resumo_periodo, mes_inicio, mes_fim)
+
+    # --- Clientes e Produtos ---
+
+    def buscar_clientes(self, termo: str = None):
+        return self._executar(database.buscar_clientes, termo)
+
+    def buscar_produtos(self, termo: str = None):
+        return self._executar(database.buscar_produtos, termo)
+
+    def fetch_pagina_clientes(self, apos: tuple = None, tamanho: int = database.PAGINA_TAMANHO):
+        return self._executar(database.fetch_pagina_clientes, apos, tamanho)
+
+    def fetch_pagina_produtos(self, apos: tuple = None, tamanho: int = database.PAGINA_TAMANHO):
+        return self._executar(database.fetch_pagina_produtos, apos, tamanho)
+
+    def fetch_clientes_para_combobox(self):
+        return self._executar(database.fetch_clientes_para_combobox)
+
+    # --- Pedidos e Relatórios ---
+
+    def fetch_pagina_pedidos(self, apos: tuple = None, tamanho: int = database.PAGINA_TAMANHO):
+        return self._executar(database.fetch_pagina_pedidos, apos, tamanho)
+
+    def fetch_relatorio_pedidos(self, data_inicio=None, data_fim=None, cliente_id=None, cancelamento=None,
+                                **opcoes):
+        return self._executar(database.fetch_relatorio_pedidos, data_inicio, data_fim, cliente_id, cancelamento,
+                              **opcoes)
+
+    def iterar_relatorio_pedidos(self, data_inicio=None, data_fim=None, cliente_id=None, cancelamento=None,
+                                 **opcoes):
+        return self._iterar(database.iterar_relatorio_pedidos, data_inicio, data_fim, cliente_id, cancelamento,
+                            **opcoes)
+
+    def fetch_ultimos_pedidos_para_analise(self, limite: int = 5):
+        return self._executar(database.fetch_ultimos_pedidos_para_analise, limite)
+
+    def fetch_ultimos_pedidos(self, limite: int = 5, cancelamento=None):
+        return self._executar(database.fetch_ultimos_pedidos, limite, cancelamento)
+
+    def carregar_pedidos(self, pedido_ids, cancelamento=None):
+        return self._executar(database.carregar_pedidos, pedido_ids, cancelamento)
@@ -0,0 +1,224 @@
+import threading
+
+import db
+import models
+
+# =================================================================
+# --- MAPA DE IDENTIDADE E UNIDADE DE TRABALHO (CLIENTES E PRODUTOS) ---
+# =================================================================
+#
+# - MapaIdentidade: no máximo um objeto models.Cliente / models.Produto
+#   por id em cada Repositorio. Editar, excluir e abrir o formulário de
+#   pedido reaproveitam o objeto já carregado em vez de consultar o banco
+#   de novo. O mapa de uma tabela é descartado quando a versão dela no
+#   RastreadorMudancas muda, inclusive por gravações de outro terminal
+#   (PRAGMA data_version).
+# - UnidadeDeTrabalho: acumula objetos novos, alterados e removidos e
+#   grava todos em uma única transação ao fim do bloco. Se nenhuma outra
+#   escrita aconteceu na tabela, o mapa continua válido após o commit.
+
+# Tabela e colunas (além do id) de cada modelo gerenciado
+ENTIDADES = {
+    models.Cliente: ("clientes", ("nome", "email", "telefone")),
+    models.Produto: ("produtos", ("nome", "preco")),
+}
+
+
+class MapaIdentidade:
+    """
+    Garante um único objeto em memória por id, por armazenamento. Uso:
+
+        mapa = MapaIdentidade(armazenamento)
+        cliente = mapa.obter(models.Cliente, 7)   # consulta o banco
+        mapa.obter(models.Cliente, 7) is cliente  # True, sem consulta
+
+    Os objetos valem enquanto a versão da tabela não mudar; depois disso
+    a próxima chamada os descarta e volta ao banco.
+    """
+
+    def __init__(self, armazenamento: db.Armazenamento):
+        self.armazenamento = armazenamento
+        self._lock = threading.RLock()
+        self._objetos = {modelo: {} for modelo in ENTIDADES}
+        self._todos = {}    # modelo -> lista completa em ordem de nome
+        self._versoes = {}  # modelo -> versão da tabela quando o mapa foi montado
+        self.acertos = 0
+        self.consultas = 0
+
+    def _versao(self, modelo) -> tuple:
+        return self.armazenamento.rastreador.versao(ENTIDADES[modelo][0])
+
+    def _validar(self, modelo) -> dict:
+        """Descarta os objetos do modelo se a tabela mudou (chamar com o lock)."""
+        versao = self._versao(modelo)
+        if self._versoes.get(modelo) != versao:
+            self._objetos[modelo].clear()
+            self._todos.pop(modelo, None)
+            self._versoes[modelo] = versao
+        return self._objetos[modelo]
+
+    def _consultar(self, modelo, sql: str, parametros: tuple = ()) -> list:
+        objetos = self._objetos[modelo]
+        criar = modelo.from_row
+
+        def objeto_da_linha(cursor, linha):
+            # row_factory: reaproveita o objeto já mapeado para o id
+            objeto = objetos.get(linha[0])
+            if objeto is None:
+                objeto = objetos[linha[0]] = criar(cursor, linha)
+            return objeto
+
+        self.consultas += 1
+        with db.usar_armazenamento(self.armazenamento):
+            return db.executar_comando(sql, parametros, fabrica=objeto_da_linha)
+
+    def _select(self, modelo) -> str:
+        tabela, colunas = ENTIDADES[modelo]
+        return f"SELECT id, {', '.join(colunas)} FROM {tabela}"
+
+    def obter(self, modelo, objeto_id: int):
+        """Retorna o objeto do id (None se não existir), consultando só na primeira vez."""
+        with self._lock:
+            objeto = self._validar(modelo).get(objeto_id)
+            if objeto is not None:
+                self.acertos += 1
+                return objeto
+            linhas = self._consultar(modelo, self._select(modelo) + " WHERE id = ?", (objeto_id,))
+            return linhas[0] if linhas else None
+
+    def todos(self, modelo) -> list:
+        """Todos os objetos da tabela em ordem de nome (lista em cache até a tabela mudar)."""
+        with self._lock:
+            self._validar(modelo)
+            lista = self._todos.get(modelo)
+            if lista is None:
+                lista = self._todos[modelo] = self._consultar(modelo, self._select(modelo) + " ORDER BY nome")
+            else:
+                self.acertos += 1
+            return list(lista)
+
+    def invalidar(self, modelo=None):
+        """Descarta os objetos de um modelo (de todos, se None)."""
+        with self._lock:
+            for m in ([modelo] if modelo else list(ENTIDADES)):
+                self._objetos[m].clear()
+                self._todos.pop(m, None)
+                self._versoes.pop(m, None)
+
+    def estatisticas(self) -> dict:
+        """Objetos mapeados por tabela, acertos (sem consulta) e consultas feitas."""
+        with self._lock:
+            mapeados = {ENTIDADES[m][0]: len(objetos) for m, objetos in self._objetos.items()}
+            return {"mapeados": mapeados, "acertos": self.acertos, "consultas": self.consultas}
+
+
+class UnidadeDeTrabalho:
+    """
+    Acumula as mudanças de clientes/produtos e as grava em uma transação.
+    Uso (confirma ao fim do bloco; se o bloco lançar exceção, nada é gravado):
+
+        with repo.unidade_de_trabalho() as uow:
+            cliente = repo.obter_cliente(7)
+            cliente.telefone = "11999990000"
+            uow.registrar_alterado(cliente)
+            uow.registrar_novo(models.Cliente(None, "Bia", None, None))
+
+    Após o commit, os novos objetos recebem o id gerado e passam a fazer
+    parte do mapa de identidade.
+    """
+
+    def __init__(self, mapa: MapaIdentidade):
+        self.mapa = mapa
+        self.novos = []
+        self.alterados = []
+        self.removidos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, erro, rastro):
+        if tipo is None:
+            self.confirmar()
+            return False
+        # Nada é gravado, mas objetos do mapa podem ter sido alterados em memória
+        for modelo in self._modelos():
+            self.mapa.invalidar(modelo)
+        self.novos, self.alterados, self.removidos = [], [], []
+        return False
+
+    @staticmethod
+    def _registrar(lista: list, objeto):
+        if type(objeto) not in ENTIDADES:
+            raise Exception(f"Objeto não gerenciado pela unidade de trabalho: {objeto!r}")
+        if not any(o is objeto for o in lista):
+            lista.append(objeto)
+
+    def registrar_novo(self, objeto):
+        self._registrar(self.novos, objeto)
+
+    def registrar_alterado(self, objeto):
+        if objeto.id is None:
+            raise Exception("Objeto sem id não pode ser marcado como alterado; use registrar_novo.")
+        self._registrar(self.alterados, objeto)
+
+    def registrar_removido(self, objeto):
+        if objeto.id is None:
+            raise Exception("Objeto sem id não pode ser removido.")
+        self._registrar(self.removidos, objeto)
+
+    def _modelos(self) -> set:
+        return {type(o) for o in self.novos + self.alterados + self.removidos}
+
+    def confirmar(self):
+        """Grava inserções, atualizações e exclusões pendentes em uma única transação."""
+        modelos = self._modelos()
+        if not modelos:
+            return
+        mapa = self.mapa
+        with mapa._lock:
+            for modelo in modelos:
+                mapa._validar(modelo)
+            antes = {modelo: mapa._versoes[modelo] for modelo in modelos}
+            ids_novos = []
+            try:
+                with db.usar_armazenamento(mapa.armazenamento), db.transacao() as conn:
+                    for objeto in self.novos:
+                        tabela, colunas = ENTIDADES[type(objeto)]
+                        marcadores = ", ".join("?" for _ in colunas)
+                        cursor = conn.execute(f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({marcadores})",
+                                              tuple(getattr(objeto, c) for c in colunas))
+                        ids_novos.append(cursor.lastrowid)
+                    for objeto in self.alterados:
+                        tabela, colunas = ENTIDADES[type(objeto)]
+                        atribuicoes = ", ".join(f"{c} = ?" for c in colunas)
+                        cursor = conn.execute(f"UPDATE {tabela} SET {atribuicoes} WHERE id = ?",
+                                              tuple(getattr(objeto, c) for c in colunas) + (objeto.id,))
+                        if cursor.rowcount == 0:
+                            raise Exception(f"Registro {objeto.id} de {tabela} não existe mais (excluído em outro terminal?).")
+                    for objeto in self.removidos:
+                        conn.execute(f"DELETE FROM {ENTIDADES[type(objeto)][0]} WHERE id = ?", (objeto.id,))
+            except BaseException:
+                # Objetos do mapa podem ter sido alterados em memória: descarta
+                for modelo in modelos:
+                    mapa.invalidar(modelo)
+                raise
+
+            for objeto, novo_id in zip(self.novos, ids_novos):
+                objeto.id = novo_id
+            for modelo in modelos:
+                geral, versao_tabela = antes[modelo]
+                depois = mapa._versao(modelo)
+                if depois != (geral, versao_tabela + 1):
+                    # Outra escrita (deste ou de outro processo) no meio: recomeça do banco
+                    mapa.invalidar(modelo)
+                    continue
+                mapa._versoes[modelo] = depois
+                mapa._todos.pop(modelo, None)
+                objetos = mapa._objetos[modelo]
+                for objeto in self.novos + self.alterados:
+                    if type(objeto) is modelo:
+                        objetos[objeto.id] = objeto
+                for objeto in self.removidos:
+                    if type(objeto) is modelo:
+                        objetos.pop(objeto.id, None)
+        self.novos, self.alterados, self.removidos = [], [], []
@@ -1,151 +1,2055 @@
-import sqlite3
-import os
-
-# Define o nome do arquivo do banco de dados
-DB_FILE = 'app_database.db'
-
-
-def inicializar_banco():
-    """
-    Cria as tabelas no banco de dados SQLite se elas ainda não existirem.
-    """
-    conn = None
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-
-        # SQL para criar a tabela de produtos
-        sql_criar_tabela_produtos = """
-        CREATE TABLE IF NOT EXISTS produtos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT NOT NULL UNIQUE,
-            preco REAL NOT NULL CHECK(preco >= 0)
-        );
-        """
-
-        # SQL para criar a tabela de clientes
-        sql_criar_tabela_clientes = """
-        CREATE TABLE IF NOT EXISTS clientes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT NOT NULL,
-            email TEXT,
-            telefone TEXT
-        );
-        """
-
-        # SQL para criar a tabela de pedidos
-        sql_criar_tabela_pedidos = """
-        CREATE TABLE IF NOT EXISTS pedidos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            cliente_id INTEGER,
-            data TEXT NOT NULL,
-            total REAL,
-            FOREIGN KEY (cliente_id) REFERENCES clientes (id)
-        );
-        """
-
-        # SQL para criar a tabela de itens do pedido (MODIFICADA)
-        sql_criar_tabela_itens_pedido = """
-        CREATE TABLE IF NOT EXISTS itens_pedido (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pedido_id INTEGER,
-            produto_id INTEGER,
-            quantidade INTEGER NOT NULL,
-            preco_unit REAL NOT NULL,
-            FOREIGN KEY (pedido_id) REFERENCES pedidos (id),
-            FOREIGN KEY (produto_id) REFERENCES produtos (id)
-        );
-        """
-
-        # Executa a criação das tabelas
-        cursor.execute(sql_criar_tabela_produtos)
-        cursor.execute(sql_criar_tabela_clientes)
-        cursor.execute(sql_criar_tabela_pedidos)
-        cursor.execute(sql_criar_tabela_itens_pedido)
-
-        conn.commit()
-        print(f"Banco de dados '{DB_FILE}' inicializado com sucesso.")
-
-    except sqlite3.Error as e:
-        print(f"Ocorreu um erro ao inicializar o banco de dados: {e}")
-    finally:
-        if conn:
-            conn.close()
-
-
-def executar_comando(sql: str, parametros: tuple = ()):
-    """
-    Executa um comando SQL parametrizado (INSERT, UPDATE, DELETE, SELECT).
-    """
-    conn = None
-    resultados = None
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
-        cursor.execute(sql, parametros)
-
-        if sql.strip().upper().startswith("SELECT"):
-            resultados = cursor.fetchall()
-        else:
-            conn.commit()
-            resultados = True
-
-    except sqlite3.Error as e:
-        print(f"Erro ao executar comando SQL: {e}")
-        if conn:
-            conn.rollback()
-        # Lança a exceção para que a camada de controle possa tratá-la
-        raise e
-
-    finally:
-        if conn:
-            conn.close()
-    return resultados
-
-
-# --- Bloco de Teste ---
-if __name__ == "__main__":
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE)
-        print(f"Banco de dados antigo '{DB_FILE}' removido para teste.")
-
-    inicializar_banco()
-    print("\n--- Testando Funções ---")
-
-    try:
-        # Inserindo Produtos
-        print("Inserindo produtos...")
-        executar_comando("INSERT INTO produtos (nome, preco) VALUES (?, ?)", ("Teclado Mecânico RGB", 299.90))
-        executar_comando("INSERT INTO produtos (nome, preco) VALUES (?, ?)", ("Mouse Gamer Sem Fio", 180.50))
-
-        # Inserindo Clientes
-        print("Inserindo clientes...")
-        executar_comando("INSERT INTO clientes (nome, email) VALUES (?, ?)", ("Carlos Pereira", "carlos@email.com"))
-
-        # Inserindo Pedido
-        print("Inserindo pedido para cliente 1...")
-        executar_comando("INSERT INTO pedidos (cliente_id, data, total) VALUES (?, ?, ?)", (1, "2025-10-25", 779.90))
-
-        # Inserindo Itens no Pedido (usando produto_id)
-        print("Inserindo itens para o pedido 1...")
-        sql_insert_item = "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unit) VALUES (?, ?, ?, ?)"
-        executar_comando(sql_insert_item, (1, 1, 2, 299.90)) # 2 teclados
-        executar_comando(sql_insert_item, (1, 2, 1, 180.50)) # 1 mouse
-
-        # Teste de SELECT com JOIN triplo
-        print("\nBuscando detalhes do pedido...")
-        sql_join = """
-            SELECT c.nome, pr.nome, ip.quantidade, ip.preco_unit
-            FROM pedidos p
-            JOIN clientes c ON p.cliente_id = c.id
-            JOIN itens_pedido ip ON ip.pedido_id = p.id
-            JOIN produtos pr ON ip.produto_id = pr.id
-            WHERE p.id = 1
-        """
-        detalhes = executar_comando(sql_join)
-        for detalhe in detalhes:
-            print(detalhe)
-
-    except Exception as e:
+import sqlite3
+import os
+import re
+import queue
+import random
+import threading
+import time
+import tempfile
+from contextvars import ContextVar
+from datetime import date
+from itertools import count, islice
+from collections import deque, defaultdict
+from functools import lru_cache
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+import utils
+
+# Define o nome do arquivo do banco de dados (":memory:" = banco em memória)
+DB_FILE = os.getenv("DB_FILE", "app_database.db")
+
+# --- Configuração do Pool de Conexões ---
+# Quantidade máxima de conexões abertas simultaneamente (ex.: UI + thread da IA)
+POOL_TAMANHO = int(os.getenv("DB_POOL_TAMANHO", "4"))
+# Tempo máximo (segundos) aguardando uma conexão livre antes de falhar
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+# --- Transações de Escrita ---
+# Tentativas de obter o lock de escrita (cada uma espera até o busy_timeout
+# do perfil) antes de desistir com "database is locked"
+TRANSACAO_TENTATIVAS = int(os.getenv("DB_TRANSACAO_TENTATIVAS", "3"))
+# Pausa entre tentativas (s): sorteada entre 0 e base * 2^n, limitada ao máximo
+TRANSACAO_ESPERA_BASE = 0.05
+TRANSACAO_ESPERA_MAXIMA = 1.0
+
+# --- Perfis de Desempenho ---
+# Cada perfil é um conjunto de PRAGMAs aplicado a toda conexão nova.
+# Todos os perfis definem todas as chaves, pois journal_mode é persistente
+# no arquivo e precisa ser revertido explicitamente ao trocar de perfil.
+PERFIS_DESEMPENHO = {
+    # Comportamento original do SQLite: leitores e escritor se bloqueiam.
+    "padrao": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "temp_store": "DEFAULT",
+        "cache_size": -2000,           # KiB (valor negativo) -> ~2 MB
+        "mmap_size": 0,
+        "busy_timeout": 5000,          # ms
+    },
+    # WAL: relatórios leem enquanto um pedido é gravado.
+    # synchronous=NORMAL é seguro em WAL (pode perder só o último commit numa queda de energia).
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "cache_size": -16000,          # ~16 MB
+        "mmap_size": 64 * 1024 * 1024,
+        "busy_timeout": 5000,
+    },
+    # WAL com fsync a cada commit, para terminais sem nobreak.
+    "wal_seguro": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "temp_store": "MEMORY",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "busy_timeout": 5000,
+    },
+}
+
+# Perfil usado pelo pool global (pode ser trocado via variável de ambiente)
+DB_PERFIL = os.getenv("DB_PERFIL", "wal")
+
+# --- Consultas Canceláveis ---
+# Tempo máximo (s) de uma consulta de relatório/exportação antes de ser
+# interrompida (0 = sem limite)
+TEMPO_MAXIMO_CONSULTA = float(os.getenv("DB_TEMPO_MAXIMO_CONSULTA", "60"))
+# Instruções da máquina virtual do SQLite entre duas chamadas do progress
+# handler (~1 ms cada 10.000 em uma máquina comum)
+PASSOS_PROGRESSO = 10000
+
+# --- Instrumentação de Consultas ---
+# Comandos mais lentos que este limite (ms) vão para logs/consultas_lentas.log
+LIMITE_CONSULTA_LENTA_MS = float(os.getenv("DB_LIMITE_LENTA_MS", "100"))
+# Quantas durações recentes guardar por consulta para calcular o p95
+AMOSTRAS_POR_CONSULTA = 1000
+
+
+# =================================================================
+# --- INSTRUMENTAÇÃO DE CONSULTAS ---
+# =================================================================
+# Todas as conexões do pool usam ConexaoInstrumentada, então qualquer
+# comando (executar_comando, lotes, streaming, FormPedido, migrações)
+# é cronometrado e agregado por "impressão digital" (o SQL normalizado,
+# sem literais). Um SELECT é contabilizado quando suas linhas terminam
+# de ser lidas, incluindo o tempo gasto nos fetch*.
+
+_estatisticas = {}
+_estatisticas_lock = threading.Lock()
+_instrumentacao = {"ativa": True, "limite_lenta_ms": LIMITE_CONSULTA_LENTA_MS}
+
+_RE_ESPACOS = re.compile(r"\s+")
+_RE_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA_IN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+# Comandos que recebem EXPLAIN QUERY PLAN no log de consultas lentas
+_RE_EXPLICAVEL = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def impressao_digital(sql: str) -> str:
+    """Normaliza um SQL (espaços, literais, listas IN) para agrupar estatísticas."""
+    texto = _RE_ESPACOS.sub(" ", sql).strip().rstrip(";").strip()
+    texto = _RE_STRINGS.sub("?", texto)
+    texto = _RE_NUMEROS.sub("?", texto)
+    return _RE_LISTA_IN.sub("(...)", texto)
+
+
+def _registrar_execucao(conn, sql: str, parametros, segundos: float, linhas: int):
+    """Agrega a execução nas estatísticas e grava no log se for lenta."""
+    chave = impressao_digital(sql)
+    with _estatisticas_lock:
+        est = _estatisticas.get(chave)
+        if est is None:
+            est = _estatisticas[chave] = {
+                "chamadas": 0,
+                "tempo_total": 0.0,
+                "tempo_max": 0.0,
+                "linhas": 0,
+                "duracoes": deque(maxlen=AMOSTRAS_POR_CONSULTA),
+            }
+        est["chamadas"] += 1
+        est["tempo_total"] += segundos
+        est["tempo_max"] = max(est["tempo_max"], segundos)
+        est["linhas"] += max(linhas, 0)
+        est["duracoes"].append(segundos)
+
+    if segundos * 1000 >= _instrumentacao["limite_lenta_ms"]:
+        _registrar_consulta_lenta(conn, sql, parametros, segundos, linhas)
+
+
+def _registrar_consulta_lenta(conn, sql: str, parametros, segundos: float, linhas: int):
+    """Escreve o comando lento e seu EXPLAIN QUERY PLAN no log de consultas lentas."""
+    plano = "(sem plano)"
+    if conn is not None and isinstance(parametros, (tuple, list, dict)) and _RE_EXPLICAVEL.match(sql):
+        try:
+            # Cursor base (não instrumentado) para não medir o próprio EXPLAIN
+            cursor = sqlite3.Cursor(conn)
+            linhas_plano = cursor.execute("EXPLAIN QUERY PLAN " + sql, parametros).fetchall()
+            cursor.close()
+            plano = "\n".join(f"    {linha[-1]}" for linha in linhas_plano)
+        except sqlite3.Error as e:
+            plano = f"(falha ao obter plano: {e})"
+    utils.log_consulta_lenta(
+        f"{segundos * 1000:.1f} ms, {linhas} linha(s): {impressao_digital(sql)}\n"
+        f"  Parâmetros: {parametros!r}\n"
+        f"  Plano:\n{plano}"
+    )
+
+
+def _percentil(valores, p: float) -> float:
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def estatisticas_consultas() -> list:
+    """
+    Retorna as estatísticas por comando, do maior tempo total ao menor.
+    Cada item é um dict com: sql, chamadas, tempo_total_ms, tempo_medio_ms,
+    p95_ms, tempo_max_ms e linhas.
+    """
+    with _estatisticas_lock:
+        copia = [(chave, dict(est, duracoes=list(est["duracoes"]))) for chave, est in _estatisticas.items()]
+
+    resultado = []
+    for chave, est in copia:
+        resultado.append({
+            "sql": chave,
+            "chamadas": est["chamadas"],
+            "tempo_total_ms": est["tempo_total"] * 1000,
+            "tempo_medio_ms": est["tempo_total"] * 1000 / est["chamadas"],
+            "p95_ms": _percentil(est["duracoes"], 95) * 1000,
+            "tempo_max_ms": est["tempo_max"] * 1000,
+            "linhas": est["linhas"],
+        })
+    resultado.sort(key=lambda e: e["tempo_total_ms"], reverse=True)
+    return resultado
+
+
+def zerar_estatisticas():
+    """Descarta todas as estatísticas acumuladas (consultas e transações)."""
+    with _estatisticas_lock:
+        _estatisticas.clear()
+        _zerar_metricas_transacoes()
+
+
+def limite_consulta_lenta_ms() -> float:
+    """Retorna o limite (ms) atual do log de consultas lentas."""
+    return _instrumentacao["limite_lenta_ms"]
+
+
+def configurar_instrumentacao(ativa: bool = None, limite_lenta_ms: float = None):
+    """Liga/desliga a instrumentação e/ou ajusta o limite de consulta lenta."""
+    if ativa is not None:
+        _instrumentacao["ativa"] = ativa
+    if limite_lenta_ms is not None:
+        _instrumentacao["limite_lenta_ms"] = limite_lenta_ms
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que cronometra execute/executemany e as leituras de linhas."""
+
+    _medicao = None  # [sql, parametros, segundos, linhas] do comando em andamento
+
+    def execute(self, sql, parametros=()):
+        self._finalizar_medicao()
+        _anotar_escrita(self.connection, sql)
+        if not _instrumentacao["ativa"]:
+            return super().execute(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            super().execute(sql, parametros)
+        except sqlite3.Error:
+            _registrar_execucao(None, sql, parametros, time.perf_counter() - inicio, 0)
+            raise
+        self._medicao = [sql, parametros, time.perf_counter() - inicio, 0]
+        if self.description is None:
+            # Comando sem linhas de resultado (INSERT/UPDATE/DDL...)
+            self._medicao[3] = self.rowcount
+            self._finalizar_medicao()
+        return self
+
+    def executemany(self, sql, lista_parametros):
+        self._finalizar_medicao()
+        _anotar_escrita(self.connection, sql)
+        if not _instrumentacao["ativa"]:
+            return super().executemany(sql, lista_parametros)
+        inicio = time.perf_counter()
+        try:
+            super().executemany(sql, lista_parametros)
+        finally:
+            _registrar_execucao(None, sql, None, time.perf_counter() - inicio, self.rowcount)
+        return self
+
+    def _medir_leitura(self, leitura, *args):
+        if self._medicao is None:
+            return leitura(*args), False
+        inicio = time.perf_counter()
+        resultado = leitura(*args)
+        self._medicao[2] += time.perf_counter() - inicio
+        return resultado, True
+
+    def fetchone(self):
+        linha, medindo = self._medir_leitura(super().fetchone)
+        if medindo:
+            if linha is not None:
+                self._medicao[3] += 1
+            self._finalizar_medicao()
+        return linha
+
+    def fetchmany(self, size=None):
+        tamanho = self.arraysize if size is None else size
+        linhas, medindo = self._medir_leitura(super().fetchmany, tamanho)
+        if medindo:
+            self._medicao[3] += len(linhas)
+            if len(linhas) < tamanho:
+                self._finalizar_medicao()
+        return linhas
+
+    def fetchall(self):
+        linhas, medindo = self._medir_leitura(super().fetchall)
+        if medindo:
+            self._medicao[3] += len(linhas)
+            self._finalizar_medicao()
+        return linhas
+
+    def close(self):
+        self._finalizar_medicao()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finalizar_medicao()
+        except Exception:
+            pass
+
+    def _finalizar_medicao(self):
+        medicao = self._medicao
+        if medicao is None:
+            return
+        self._medicao = None
+        sql, parametros, segundos, linhas = medicao
+        _registrar_execucao(self.connection, sql, parametros, segundos, linhas)
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """
+    Conexão cujos cursores (inclusive os de conn.execute) são instrumentados.
+    Se tiver um rastreador, as tabelas escritas na transação são repassadas
+    a ele no commit (ver RastreadorMudancas).
+    """
+
+    rastreador = None
+    tabelas_pendentes = None
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, lista_parametros):
+        return self.cursor().executemany(sql, lista_parametros)
+
+    def commit(self):
+        pendentes = self.tabelas_pendentes
+        if self.rastreador is None or not pendentes:
+            return super().commit()
+        with self.rastreador.confirmando(pendentes):
+            super().commit()
+        pendentes.clear()
+
+    def rollback(self):
+        if self.tabelas_pendentes:
+            self.tabelas_pendentes.clear()
+        super().rollback()
+
+
+# =================================================================
+# --- DETECÇÃO DE MUDANÇAS (VERSÕES POR TABELA) ---
+# =================================================================
+
+_RE_ESCRITA = re.compile(
+    r"^\s*(?:INSERT|REPLACE|UPDATE|DELETE)\b(?:\s+OR\s+\w+)?(?:\s+INTO|\s+FROM)?\s+"
+    r"(?:[\"`\[]?(\w+)[\"`\]]?\.)?[\"`\[]?(\w+)", re.IGNORECASE)
+_RE_DDL = re.compile(r"^\s*(?:CREATE|DROP|ALTER)\b", re.IGNORECASE)
+_RE_CTE_ESCRITA = re.compile(r"^\s*WITH\b.*\b(?:INSERT|REPLACE|UPDATE|DELETE)\b", re.IGNORECASE | re.DOTALL)
+
+# Marca de "qualquer tabela": DDL e escritas cuja tabela não se identifica
+TODAS_AS_TABELAS = "*"
+
+# Tabelas alteradas também pelos triggers de outra (ex.: itens_pedido
+# atualiza os contadores de pedidos, migração 9)
+_ESCRITAS_POR_GATILHO = {"itens_pedido": ("pedidos",)}
+
+
+@lru_cache(maxsize=512)
+def tabelas_escritas(sql: str) -> frozenset:
+    """Tabelas da base principal alteradas pelo comando (vazio se for leitura)."""
+    encontrado = _RE_ESCRITA.match(sql)
+    if encontrado:
+        esquema, tabela = encontrado.groups()
+        if esquema is None or esquema.lower() == "main":
+            tabela = tabela.lower()
+            return frozenset((tabela,) + _ESCRITAS_POR_GATILHO.get(tabela, ()))
+        return frozenset()
+    if _RE_DDL.match(sql) or _RE_CTE_ESCRITA.match(sql):
+        return frozenset((TODAS_AS_TABELAS,))
+    return frozenset()
+
+
+def _anotar_escrita(conn, sql: str):
+    if conn.rastreador is not None:
+        tabelas = tabelas_escritas(sql)
+        if tabelas:
+            conn.tabelas_pendentes.update(tabelas)
+
+
+class RastreadorMudancas:
+    """
+    Contadores de versão por tabela, para que as telas saibam se algo
+    mudou desde a última carga e pulem a consulta quando nada mudou.
+
+    - Escritas deste processo: as conexões do pool anotam as tabelas
+      alteradas (INSERT/UPDATE/DELETE) e, no commit, o contador de cada
+      uma é incrementado.
+    - Escritas de outros processos (outro terminal no mesmo arquivo): uma
+      conexão sentinela compara PRAGMA data_version. Como não dá para saber
+      quais tabelas mudaram, é incrementado o contador geral, que faz
+      parte de todas as versões.
+
+    O data_version é relido antes e depois de cada commit local, com o
+    lock de escrita do SQLite ainda em poder da transação; por isso uma
+    escrita externa nunca é confundida com a local. Sem `alvo` (banco em
+    memória, que nenhum outro processo enxerga) não há sentinela.
+    """
+
+    def __init__(self, alvo: str = None, uri: bool = False):
+        self._sentinela = None
+        if alvo is not None:
+            self._sentinela = sqlite3.connect(alvo, uri=uri, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._versoes = defaultdict(int)
+        self._geral = 0
+        self._data_version = self._ler_data_version()
+        self._vistas = {}
+
+    def _ler_data_version(self):
+        if self._sentinela is None:
+            return None
+        try:
+            return self._sentinela.execute("PRAGMA data_version;").fetchone()[0]
+        except sqlite3.OperationalError:
+            # Banco ocupado (ex.: lock exclusivo no journal DELETE): verifica na próxima vez
+            return self._data_version
+
+    def _absorver_externas(self):
+        """Incrementa o contador geral se outro processo gravou (chamar com o lock)."""
+        atual = self._ler_data_version()
+        if atual != self._data_version:
+            self._data_version = atual
+            self._geral += 1
+
+    @contextmanager
+    def confirmando(self, tabelas):
+        """Envolve o commit de uma transação local que alterou `tabelas`."""
+        with self._lock:
+            self._absorver_externas()
+            confirmou = False
+            try:
+                yield
+                confirmou = True
+            finally:
+                if confirmou:
+                    self._data_version = self._ler_data_version()
+                    for tabela in tabelas:
+                        if tabela == TODAS_AS_TABELAS:
+                            self._geral += 1
+                        else:
+                            self._versoes[tabela] += 1
+                else:
+                    self._absorver_externas()
+
+    def versao(self, *tabelas) -> tuple:
+        """Versão atual do conjunto de tabelas (muda a cada escrita em qualquer uma)."""
+        with self._lock:
+            self._absorver_externas()
+            return (self._geral,) + tuple(self._versoes[t] for t in tabelas)
+
+    def mudou(self, chave: str, *tabelas) -> bool:
+        """
+        True se alguma das tabelas mudou desde a última chamada com a mesma
+        chave (ou se é a primeira). Chame antes de consultar:
+
+            if rastreador.mudou("lista_pedidos", "pedidos", "clientes"):
+                recarregar()
+        """
+        versao = self.versao(*tabelas)
+        with self._lock:
+            anterior = self._vistas.get(chave)
+            self._vistas[chave] = versao
+        return versao != anterior
+
+    def esquecer(self, chave: str = None):
+        """Faz a próxima chamada de mudou(chave) retornar True (todas, se chave for None)."""
+        with self._lock:
+            if chave is None:
+                self._vistas.clear()
+            else:
+                self._vistas.pop(chave, None)
+
+    def fechar(self):
+        if self._sentinela is not None:
+            self._sentinela.close()
+
+
+class PoolConexoes:
+    """
+    Pool de conexões SQLite reutilizáveis.
+
+    Abrir uma conexão (e executar o PRAGMA foreign_keys) a cada comando é
+    caro; o pool mantém até `tamanho` conexões abertas e as entrega às
+    funções deste módulo. Antes de cada entrega a conexão passa por um
+    health check simples (SELECT 1) e é recriada se estiver inutilizável.
+
+    Dentro de uma mesma thread as chamadas são reentrantes: enquanto uma
+    conexão estiver em uso, chamadas aninhadas recebem a mesma conexão.
+
+    Com somente_leitura=True as conexões são abertas com a URI `mode=ro`
+    (e PRAGMA query_only): nunca pedem locks de escrita no arquivo.
+    Com uri=True, db_file já é uma URI SQLite completa (ex.: banco memdb).
+    Com um rastreador, os commits das conexões de escrita atualizam as
+    versões por tabela (RastreadorMudancas).
+    """
+
+    def __init__(self, db_file: str, tamanho: int = POOL_TAMANHO, timeout: float = POOL_TIMEOUT,
+                 perfil: str = DB_PERFIL, somente_leitura: bool = False, uri: bool = False,
+                 rastreador: RastreadorMudancas = None):
+        if tamanho < 1:
+            raise ValueError("O tamanho do pool deve ser de pelo menos 1 conexão.")
+        if perfil not in PERFIS_DESEMPENHO:
+            raise ValueError(f"Perfil de desempenho desconhecido: '{perfil}'. "
+                             f"Opções: {', '.join(PERFIS_DESEMPENHO)}")
+        self.db_file = db_file
+        self.perfil = perfil
+        self.somente_leitura = somente_leitura
+        self.uri = uri
+        self.rastreador = rastreador
+        self.tamanho = tamanho
+        self.timeout = timeout
+        self._livres = queue.LifoQueue(maxsize=tamanho)
+        self._criadas = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _nova_conexao(self) -> sqlite3.Connection:
+        """Abre e configura uma nova conexão física."""
+        alvo, uri = self.db_file, self.uri
+        if self.somente_leitura and not uri:
+            alvo, uri = f"file:{pathname2url(os.path.abspath(self.db_file))}?mode=ro", True
+        conn = sqlite3.connect(alvo, uri=uri, check_same_thread=False, factory=ConexaoInstrumentada)
+        if self.somente_leitura:
+            conn.execute("PRAGMA query_only = ON;")
+        else:
+            conn.execute("PRAGMA foreign_keys = ON;")
+            conn.rastreador = self.rastreador
+            conn.tabelas_pendentes = set()
+        aplicar_perfil(conn, self.perfil, somente_leitura=self.somente_leitura)
+        return conn
+
+    @staticmethod
+    def _conexao_saudavel(conn: sqlite3.Connection) -> bool:
+        """Health check: verifica se a conexão ainda responde."""
+        try:
+            # Cursor base: o health check não entra nas estatísticas de consultas
+            sqlite3.Cursor(conn).execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _descartar(self, conn: sqlite3.Connection):
+        """Fecha uma conexão e libera sua vaga no pool."""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._criadas -= 1
+
+    def adquirir(self) -> sqlite3.Connection:
+        """
+        Retira uma conexão do pool, criando uma nova se ainda houver vaga.
+        Lança sqlite3.OperationalError se nenhuma ficar livre a tempo.
+        """
+        try:
+            conn = self._livres.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                pode_criar = self._criadas < self.tamanho
+                if pode_criar:
+                    self._criadas += 1
+            if pode_criar:
+                try:
+                    return self._nova_conexao()
+                except sqlite3.Error:
+                    with self._lock:
+                        self._criadas -= 1
+                    raise
+            try:
+                conn = self._livres.get(timeout=self.timeout)
+            except queue.Empty:
+                raise sqlite3.OperationalError(
+                    f"Nenhuma conexão livre no pool após {self.timeout}s (tamanho={self.tamanho}).")
+
+        if not self._conexao_saudavel(conn):
+            self._descartar(conn)
+            with self._lock:
+                self._criadas += 1
+            try:
+                conn = self._nova_conexao()
+            except sqlite3.Error:
+                with self._lock:
+                    self._criadas -= 1
+                raise
+        return conn
+
+    def devolver(self, conn: sqlite3.Connection):
+        """Devolve a conexão ao pool, desfazendo transações esquecidas."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._descartar(conn)
+            return
+        try:
+            self._livres.put_nowait(conn)
+        except queue.Full:
+            self._descartar(conn)
+
+    @contextmanager
+    def conexao(self):
+        """
+        Context manager que empresta uma conexão do pool.
+        Chamadas aninhadas na mesma thread reutilizam a mesma conexão.
+        """
+        atual = getattr(self._local, "conn", None)
+        if atual is not None:
+            self._local.profundidade += 1
+            try:
+                yield atual
+            finally:
+                self._local.profundidade -= 1
+            return
+
+        conn = self.adquirir()
+        self._local.conn = conn
+        self._local.profundidade = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.profundidade = 0
+            self.devolver(conn)
+
+    def fechar_todas(self):
+        """Fecha todas as conexões ociosas do pool."""
+        while True:
+            try:
+                conn = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(conn)
+
+
+def aplicar_perfil(conn: sqlite3.Connection, perfil: str, somente_leitura: bool = False):
+    """
+    Aplica os PRAGMAs do perfil de desempenho informado à conexão.
+    Conexões somente leitura não alteram o journal_mode (ele é gravado no
+    arquivo pelas conexões de escrita).
+    """
+    config = PERFIS_DESEMPENHO[perfil]
+    # journal_mode primeiro: os demais PRAGMAs dependem do modo de journal
+    if not somente_leitura:
+        conn.execute(f"PRAGMA journal_mode = {config['journal_mode']};").fetchone()
+    for pragma in ("synchronous", "temp_store", "cache_size", "mmap_size", "busy_timeout"):
+        conn.execute(f"PRAGMA {pragma} = {config[pragma]};")
+
+
+# =================================================================
+# --- ARMAZENAMENTO (ARQUIVO OU MEMÓRIA) ---
+# =================================================================
+
+# Destino especial: banco em memória, compartilhado pelas conexões do pool
+MEMORIA = ":memory:"
+
+_sequencia_memoria = count(1)
+
+
+class Armazenamento:
+    """
+    Um banco de dados da aplicação: o destino (arquivo ou memória) e seus
+    pools de conexões de escrita e somente leitura, criados sob demanda.
+
+    Com destino ":memory:" o banco usa a VFS memdb do SQLite (URI
+    file:/nome?vfs=memdb): todas as conexões dos pools enxergam o mesmo
+    banco, com o locking normal do SQLite (busy_timeout vale; não há WAL).
+    Uma conexão âncora mantém o banco vivo até fechar() ser chamado.
+
+    Vários armazenamentos podem ficar abertos lado a lado; as funções
+    deste módulo e de core/database.py usam o armazenamento atual (ver
+    usar_armazenamento e core/repositorio.py).
+    """
+
+    def __init__(self, destino: str = None, tamanho: int = POOL_TAMANHO, timeout: float = POOL_TIMEOUT,
+                 perfil: str = DB_PERFIL):
+        self.destino = destino or DB_FILE
+        self.em_memoria = self.destino == MEMORIA
+        self.tamanho = tamanho
+        self.timeout = timeout
+        self.perfil = perfil
+        self._pool = None
+        self._pool_leitura = None
+        self._rastreador = None
+        self._pasta = None
+        self._lock = threading.Lock()
+        self._ancora = None
+        if self.em_memoria:
+            self.nome = f"/memoria_{os.getpid()}_{next(_sequencia_memoria)}"
+            self._uri = f"file:{self.nome}?vfs=memdb"
+            self._ancora = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        else:
+            self.nome = os.path.abspath(self.destino)
+
+    def __repr__(self):
+        return f"Armazenamento({self.destino!r})"
+
+    @property
+    def pasta(self) -> str:
+        """Pasta ao lado do banco (arquivos auxiliares). Em memória, uma pasta temporária própria."""
+        if self._pasta is None:
+            if self.em_memoria:
+                self._pasta = tempfile.mkdtemp(prefix="armazenamento_memoria_")
+            else:
+                self._pasta = os.path.dirname(self.nome)
+        return self._pasta
+
+    @property
+    def rastreador(self) -> RastreadorMudancas:
+        """Rastreador de mudanças (versões por tabela), criado na primeira chamada."""
+        if self._rastreador is None:
+            with self._lock:
+                if self._rastreador is None:
+                    if self.em_memoria:
+                        self._rastreador = RastreadorMudancas()
+                    else:
+                        self._rastreador = RastreadorMudancas(self.destino)
+        return self._rastreador
+
+    @property
+    def pool(self) -> PoolConexoes:
+        """Pool de conexões de escrita, criado na primeira chamada."""
+        if self._pool is None:
+            rastreador = self.rastreador
+            with self._lock:
+                if self._pool is None:
+                    if self.em_memoria:
+                        self._pool = PoolConexoes(self._uri, self.tamanho, self.timeout, self.perfil,
+                                                  uri=True, rastreador=rastreador)
+                    else:
+                        self._pool = PoolConexoes(self.destino, self.tamanho, self.timeout, self.perfil,
+                                                  rastreador=rastreador)
+        return self._pool
+
+    @property
+    def pool_leitura(self) -> PoolConexoes:
+        """Pool de conexões somente leitura (mode=ro), criado na primeira chamada."""
+        if self._pool_leitura is None:
+            with self._lock:
+                if self._pool_leitura is None:
+                    if self.em_memoria:
+                        self._pool_leitura = PoolConexoes(f"{self._uri}&mode=ro", self.tamanho, self.timeout,
+                                                          self.perfil, somente_leitura=True, uri=True)
+                    else:
+                        self._pool_leitura = PoolConexoes(self.destino, self.tamanho, self.timeout,
+                                                          self.perfil, somente_leitura=True)
+        return self._pool_leitura
+
+    def configurar_pool(self, tamanho: int = POOL_TAMANHO, timeout: float = POOL_TIMEOUT,
+                        perfil: str = None) -> PoolConexoes:
+        """
+        (Re)cria os pools com outro tamanho/timeout/perfil de desempenho.
+        As conexões ociosas dos pools anteriores são fechadas.
+        """
+        if perfil is not None and perfil not in PERFIS_DESEMPENHO:
+            raise ValueError(f"Perfil de desempenho desconhecido: '{perfil}'. "
+                             f"Opções: {', '.join(PERFIS_DESEMPENHO)}")
+        with self._lock:
+            self._fechar_pools()
+            self.tamanho = tamanho
+            self.timeout = timeout
+            if perfil is not None:
+                self.perfil = perfil
+        return self.pool
+
+    def _fechar_pools(self):
+        """Fecha as conexões ociosas dos pools (chamar com self._lock adquirido)."""
+        for pool in (self._pool, self._pool_leitura):
+            if pool is not None:
+                pool.fechar_todas()
+        self._pool = None
+        self._pool_leitura = None
+
+    def conexao(self):
+        """Empresta uma conexão de escrita (ver PoolConexoes.conexao)."""
+        return self.pool.conexao()
+
+    def conexao_leitura(self):
+        """Empresta uma conexão somente leitura."""
+        return self.pool_leitura.conexao()
+
+    def mudou(self, chave: str, *tabelas) -> bool:
+        """Atalho para rastreador.mudou (ver RastreadorMudancas)."""
+        return self.rastreador.mudou(chave, *tabelas)
+
+    def fechar(self):
+        """Fecha as conexões. Em memória, o conteúdo do banco é descartado."""
+        with self._lock:
+            self._fechar_pools()
+            if self._rastreador is not None:
+                self._rastreador.fechar()
+                self._rastreador = None
+            if self._ancora is not None:
+                self._ancora.close()
+                self._ancora = None
+
+
+_armazenamento_padrao = None
+_armazenamento_lock = threading.Lock()
+_armazenamento_atual = ContextVar("armazenamento_atual", default=None)
+
+
+def obter_armazenamento() -> Armazenamento:
+    """
+    Retorna o armazenamento em uso: o definido por usar_armazenamento() no
+    contexto atual ou, fora dele, o padrão (DB_FILE), criado na primeira chamada.
+    """
+    atual = _armazenamento_atual.get()
+    if atual is not None:
+        return atual
+    global _armazenamento_padrao
+    if _armazenamento_padrao is None:
+        with _armazenamento_lock:
+            if _armazenamento_padrao is None:
+                _armazenamento_padrao = Armazenamento(DB_FILE)
+    return _armazenamento_padrao
+
+
+@contextmanager
+def usar_armazenamento(armazenamento: Armazenamento):
+    """
+    Faz as funções deste módulo (e de core/database.py) usarem outro
+    armazenamento dentro do bloco. Uso:
+
+        memoria = db.Armazenamento(db.MEMORIA)
+        with db.usar_armazenamento(memoria):
+            db.inicializar_banco()
+            database.buscar_clientes("ana")
+    """
+    token = _armazenamento_atual.set(armazenamento)
+    try:
+        yield armazenamento
+    finally:
+        _armazenamento_atual.reset(token)
+
+
+def obter_pool() -> PoolConexoes:
+    """Retorna o pool de escrita do armazenamento em uso."""
+    return obter_armazenamento().pool
+
+
+def configurar_pool(tamanho: int = POOL_TAMANHO, timeout: float = POOL_TIMEOUT, perfil: str = None):
+    """
+    (Re)cria os pools do armazenamento em uso com outro tamanho/timeout/perfil.
+    As conexões ociosas dos pools anteriores são fechadas.
+    """
+    return obter_armazenamento().configurar_pool(tamanho, timeout, perfil)
+
+
+def conexao():
+    """
+    Empresta uma conexão do pool do armazenamento em uso. Uso:
+
+        with db.conexao() as conn:
+            conn.execute(...)
+    """
+    return obter_armazenamento().conexao()
+
+
+def fechar_conexoes():
+    """
+    Fecha as conexões do armazenamento em uso (chamado ao encerrar a
+    aplicação). O armazenamento padrão é recriado a partir de DB_FILE no
+    próximo uso.
+    """
+    global _armazenamento_padrao
+    atual = _armazenamento_atual.get()
+    if atual is not None:
+        atual.fechar()
+        return
+    with _armazenamento_lock:
+        if _armazenamento_padrao is not None:
+            _armazenamento_padrao.fechar()
+            _armazenamento_padrao = None
+
+
+def mudou(chave: str, *tabelas) -> bool:
+    """
+    True se alguma das tabelas do armazenamento em uso mudou desde a última
+    chamada com a mesma chave (ver RastreadorMudancas.mudou).
+    """
+    return obter_armazenamento().mudou(chave, *tabelas)
+
+
+# --- Conexões somente leitura (relatórios e exportações) ---
+
+def obter_pool_leitura() -> PoolConexoes:
+    """Retorna o pool somente leitura do armazenamento em uso."""
+    return obter_armazenamento().pool_leitura
+
+
+def conexao_leitura():
+    """
+    Empresta uma conexão somente leitura (URI mode=ro). Qualquer tentativa
+    de escrita nela falha com sqlite3.OperationalError.
+    """
+    return obter_armazenamento().conexao_leitura()
+
+
+@contextmanager
+def snapshot():
+    """
+    Context manager que abre uma transação de leitura em uma conexão
+    somente leitura e a mantém durante todo o bloco. Uso:
+
+        with db.snapshot() as conn:
+            pedidos = conn.execute(...).fetchall()
+            itens = conn.execute(...).fetchall()
+
+    Todas as consultas do bloco enxergam o mesmo estado do banco (o
+    snapshot do WAL no momento da entrada), mesmo que pedidos sejam
+    gravados em paralelo. Em modo WAL o leitor não bloqueia escritores
+    nem é bloqueado por eles; no perfil "padrao" (journal DELETE) e no
+    banco em memória a transação mantém um lock SHARED e as gravações
+    esperam o fim do bloco.
+
+    Blocos aninhados na mesma thread reutilizam o snapshot externo.
+    """
+    with conexao_leitura() as conn:
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN;")
+        try:
+            # O snapshot só é fixado na primeira leitura, não no BEGIN
+            sqlite3.Cursor(conn).execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            yield conn
+        finally:
+            conn.rollback()
+
+
+# --- Consultas canceláveis (progress handler + interrupt) ---
+
+class Cancelamento:
+    """
+    Permite interromper consultas longas de outra thread (botão Cancelar)
+    e impõe um tempo máximo a elas.
+
+    A thread do banco vincula a conexão com consulta_cancelavel(); a partir
+    daí o SQLite chama o progress handler a cada PASSOS_PROGRESSO
+    instruções, que atualiza `passos`/`decorrido` e aborta a consulta se
+    cancelar() foi chamado ou se o tempo passou de `limite_segundos`.
+    cancelar() também chama Connection.interrupt(), que é seguro entre
+    threads, para a consulta parar mesmo longe de um ponto de verificação.
+    A consulta abortada levanta sqlite3.OperationalError ("interrupted");
+    `motivo` diz se foi cancelamento ou tempo esgotado.
+
+    Uso:
+        cancelamento = db.Cancelamento(limite_segundos=30)
+        # thread do banco
+        linhas = db.consultar_leitura(sql, params, cancelamento=cancelamento)
+        # thread da UI
+        cancelamento.cancelar()
+    """
+
+    CANCELADA = "cancelada"
+    TEMPO_ESGOTADO = "tempo esgotado"
+
+    def __init__(self, limite_segundos: float = TEMPO_MAXIMO_CONSULTA, ao_progresso=None):
+        self.limite_segundos = limite_segundos
+        # Chamado na thread do banco com (passos, segundos decorridos); não
+        # deve tocar em widgets do Tk (a UI lê `passos`/`decorrido` via after)
+        self.ao_progresso = ao_progresso
+        self.motivo = None
+        self.passos = 0
+        self._cancelado = threading.Event()
+        self._inicio = None
+        self._conexoes = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._cancelado.is_set()
+
+    @property
+    def decorrido(self) -> float:
+        """Segundos desde o início da primeira consulta vinculada."""
+        return 0.0 if self._inicio is None else time.monotonic() - self._inicio
+
+    def cancelar(self):
+        """Pede a interrupção das consultas em andamento (qualquer thread)."""
+        with self._lock:
+            if self.motivo is None:
+                self.motivo = self.CANCELADA
+            self._cancelado.set()
+            for conn in self._conexoes:
+                conn.interrupt()
+
+    def _vincular(self, conn):
+        with self._lock:
+            if self._inicio is None:
+                self._inicio = time.monotonic()
+            self._conexoes.add(conn)
+
+    def _desvincular(self, conn):
+        with self._lock:
+            self._conexoes.discard(conn)
+
+    def _verificar(self) -> int:
+        """Progress handler: retorno diferente de zero aborta a consulta."""
+        self.passos += PASSOS_PROGRESSO
+        if self.ao_progresso is not None:
+            try:
+                self.ao_progresso(self.passos, self.decorrido)
+            except Exception as e:
+                utils.log_erro("Falha no callback de progresso da consulta.", e)
+        if self._cancelado.is_set():
+            return 1
+        if self.limite_segundos and self.decorrido > self.limite_segundos:
+            with self._lock:
+                if self.motivo is None:
+                    self.motivo = self.TEMPO_ESGOTADO
+            self._cancelado.set()
+            return 1
+        return 0
+
+
+def consulta_interrompida(erro: sqlite3.Error) -> bool:
+    """True se o erro é de uma consulta abortada por Cancelamento/interrupt()."""
+    return isinstance(erro, sqlite3.OperationalError) and "interrupted" in str(erro).lower()
+
+
+@contextmanager
+def consulta_cancelavel(conn: sqlite3.Connection, cancelamento: Cancelamento = None):
+    """
+    Instala o progress handler de `cancelamento` em `conn` durante o bloco
+    e o remove ao sair, antes de a conexão voltar ao pool. Sem
+    cancelamento, apenas repassa a conexão.
+    """
+    if cancelamento is None:
+        yield conn
+        return
+    cancelamento._vincular(conn)
+    conn.set_progress_handler(cancelamento._verificar, PASSOS_PROGRESSO)
+    try:
+        # Cancelado antes de começar: nem executa
+        if cancelamento.cancelado:
+            raise sqlite3.OperationalError("interrupted")
+        yield conn
+    finally:
+        conn.set_progress_handler(None, 0)
+        cancelamento._desvincular(conn)
+
+
+def consultar_leitura(sql: str, parametros: tuple = (), cancelamento: Cancelamento = None,
+                      fabrica=None) -> list:
+    """
+    Executa um SELECT em um snapshot somente leitura e retorna as tuplas.
+    Com `cancelamento`, a consulta pode ser interrompida (ver Cancelamento);
+    com `fabrica`, as linhas são montadas por ela (row_factory do cursor).
+    """
+    with snapshot() as conn, consulta_cancelavel(conn, cancelamento):
+        try:
+            cursor = conn.cursor()
+            if fabrica is not None:
+                cursor.row_factory = fabrica
+            return cursor.execute(sql, parametros).fetchall()
+        except sqlite3.Error as e:
+            print(f"Erro ao executar consulta SQL: {e}")
+            raise e
+
+
+def inicializar_banco():
+    """
+    Cria/atualiza o esquema do banco aplicando as migrações pendentes.
+    Em um banco já atualizado, apenas consulta a versão (caminho rápido).
+    Se uma migração falhar, registra o erro e o relança: o aplicativo e a
+    CLI não devem seguir com o esquema pela metade.
+    """
+    destino = obter_armazenamento().destino
+    try:
+        with conexao() as conn:
+            aplicadas = aplicar_migracoes(conn)
+        if aplicadas:
+            print(f"Banco de dados '{destino}' atualizado: {aplicadas} migração(ões) aplicada(s).")
+        else:
+            print(f"Banco de dados '{destino}' inicializado com sucesso.")
+
+    except sqlite3.Error as e:
+        utils.log_erro(f"Ocorreu um erro ao inicializar o banco de dados '{destino}'.", e)
+        raise e
+
+
+# =================================================================
+# --- MIGRAÇÕES DE ESQUEMA ---
+# =================================================================
+# Cada migração é uma função registrada com @migracao(versao, descricao).
+# Elas rodam em ordem crescente de versão, cada uma em sua própria
+# transação, e a versão aplicada é gravada na tabela schema_version.
+# Migrações com transacional=False (ex.: VACUUM) rodam fora da transação
+# e precisam ser idempotentes: outro terminal pode executá-las junto.
+# NUNCA altere uma migração já publicada: crie uma nova.
+
+MIGRACOES = []
+
+
+def migracao(versao: int, descricao: str, transacional: bool = True):
+    """Decorador que registra uma função de migração de esquema."""
+    def registrar(func):
+        MIGRACOES.append((versao, descricao, func, transacional))
+        MIGRACOES.sort(key=lambda m: m[0])
+        return func
+    return registrar
+
+
+def versao_esquema(conn: sqlite3.Connection) -> int:
+    """Retorna a versão de esquema gravada no banco (0 se nenhuma)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+    """)
+    versao = conn.execute("SELECT MAX(versao) FROM schema_version;").fetchone()[0]
+    return versao or 0
+
+
+def aplicar_migracoes(conn: sqlite3.Connection) -> int:
+    """
+    Aplica as migrações pendentes e retorna quantas foram aplicadas.
+    Bancos criados antes do controle de versão são atualizados no lugar,
+    pois a migração inicial usa CREATE TABLE IF NOT EXISTS.
+    """
+    ultima = MIGRACOES[-1][0] if MIGRACOES else 0
+    versao_atual = versao_esquema(conn)
+    if versao_atual >= ultima:
+        if versao_atual > ultima:
+            print(f"Aviso: o banco está na versão {versao_atual}, mais nova que a do aplicativo ({ultima}).")
+        return 0
+
+    aplicadas = 0
+    for versao, descricao, func, transacional in MIGRACOES:
+        if versao <= versao_atual:
+            continue
+        try:
+            if not transacional:
+                func(conn)
+            iniciar_transacao(conn)
+            # Outro terminal pode ter migrado enquanto aguardávamos o lock
+            if conn.execute("SELECT 1 FROM schema_version WHERE versao = ?;", (versao,)).fetchone():
+                conn.rollback()
+                continue
+            if transacional:
+                func(conn)
+            conn.execute("INSERT INTO schema_version (versao, descricao) VALUES (?, ?);", (versao, descricao))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Falha ao aplicar a migração {versao} ({descricao}): {e}")
+            raise
+        print(f"Migração {versao} aplicada: {descricao}")
+        aplicadas += 1
+    return aplicadas
+
+
+@migracao(1, "Esquema inicial: produtos, clientes, pedidos e itens_pedido")
+def _m001_esquema_inicial(conn: sqlite3.Connection):
+    _criar_tabelas(conn)
+
+
+@migracao(2, "Índices para joins, filtros e ordenações de pedidos e clientes")
+def _m002_indices(conn: sqlite3.Connection):
+    # JOIN pedidos -> clientes e filtro por cliente nos relatórios
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_cliente_id ON pedidos (cliente_id);")
+    # Filtros por período e ORDER BY p.data DESC, p.id DESC
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_data ON pedidos (data, id);")
+    # Itens de um pedido (contagem no relatório, análise de IA)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido_id ON itens_pedido (pedido_id);")
+    # JOIN itens_pedido -> produtos e verificação de FK ao excluir produtos
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_itens_pedido_produto_id ON itens_pedido (produto_id);")
+    # Listagem de clientes ORDER BY nome
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clientes_nome ON clientes (nome);")
+
+
+# Datas digitadas livremente antes da migração 3: "2025-10-5", "2025/10/05"
+# (ano primeiro) ou "05/10/2025", "5-10-2025" (dia/mês/ano), com hora opcional
+_RE_DATA_AMD = re.compile(r"^\s*(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?:[ T].*)?$")
+_RE_DATA_DMA = re.compile(r"^\s*(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})(?:[ T].*)?$")
+
+
+def _data_canonica(texto) -> str | None:
+    """Converte uma data de pedido antiga para AAAA-MM-DD (None se não reconhecer)."""
+    if not isinstance(texto, str):
+        return None
+    if m := _RE_DATA_AMD.match(texto):
+        ano, mes, dia = m.groups()
+    elif m := _RE_DATA_DMA.match(texto):
+        dia, mes, ano = m.groups()
+    else:
+        return None
+    try:
+        return date(int(ano), int(mes), int(dia)).isoformat()
+    except ValueError:
+        return None
+
+
+@migracao(3, "Datas de pedidos canônicas (YYYY-MM-DD) para filtros por intervalo")
+def _m003_datas_canonicas(conn: sqlite3.Connection):
+    # Filtros por período usam "data >= ? AND data < ?" sobre idx_pedidos_data.
+    # Isso só é correto se toda data estiver no formato ISO com zeros à
+    # esquerda, em que a ordem do texto é a ordem cronológica. date() não
+    # entende datas sem zeros nem dia/mês/ano, então a conversão é feita aqui;
+    # uma data irreconhecível aborta a migração em vez de ficar para trás.
+    corrigidas, invalidos = [], []
+    for pedido_id, data in conn.execute("SELECT id, data FROM pedidos WHERE date(data) IS NOT data ORDER BY id;").fetchall():
+        canonica = _data_canonica(data)
+        if canonica is None:
+            invalidos.append(f"{pedido_id} ({data!r})")
+        else:
+            corrigidas.append((canonica, pedido_id))
+    if invalidos:
+        raise sqlite3.IntegrityError(
+            f"{len(invalidos)} pedido(s) com data irreconhecível; corrija a data (AAAA-MM-DD) "
+            f"e abra o aplicativo (ou rode o comando) de novo. Pedidos: {', '.join(invalidos)}")
+    conn.executemany("UPDATE pedidos SET data = ? WHERE id = ?;", corrigidas)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_pedidos_data_insert
+        BEFORE INSERT ON pedidos
+        WHEN date(NEW.data) IS NOT NEW.data
+        BEGIN
+            SELECT RAISE(ABORT, 'Data do pedido deve estar no formato AAAA-MM-DD.');
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_pedidos_data_update
+        BEFORE UPDATE OF data ON pedidos
+        WHEN date(NEW.data) IS NOT NEW.data
+        BEGIN
+            SELECT RAISE(ABORT, 'Data do pedido deve estar no formato AAAA-MM-DD.');
+        END;
+    """)
+
+
+@migracao(4, "Resumo mensal de vendas (resumo_mensal) mantido por triggers")
+def _m004_resumo_mensal(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumo_mensal (
+            mes TEXT PRIMARY KEY,                 -- 'YYYY-MM'
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            receita REAL NOT NULL DEFAULT 0,
+            quantidade_itens INTEGER NOT NULL DEFAULT 0,
+            clientes_distintos INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    # Pedidos por (mês, cliente): permite manter clientes_distintos em O(1)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumo_mensal_clientes (
+            mes TEXT NOT NULL,
+            cliente_id INTEGER NOT NULL,
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (mes, cliente_id)
+        ) WITHOUT ROWID;
+    """)
+
+    # --- Soma/subtrai um pedido do resumo (usado em INSERT, DELETE e UPDATE) ---
+    def sql_adicionar_pedido(ref: str) -> str:
+        return f"""
+            INSERT OR IGNORE INTO resumo_mensal (mes) VALUES (substr({ref}.data, 1, 7));
+            UPDATE resumo_mensal SET clientes_distintos = clientes_distintos + 1
+             WHERE mes = substr({ref}.data, 1, 7)
+               AND {ref}.cliente_id IS NOT NULL
+               AND NOT EXISTS (SELECT 1 FROM resumo_mensal_clientes
+                                WHERE mes = substr({ref}.data, 1, 7) AND cliente_id = {ref}.cliente_id);
+            INSERT INTO resumo_mensal_clientes (mes, cliente_id, pedidos)
+            SELECT substr({ref}.data, 1, 7), {ref}.cliente_id, 1
+             WHERE {ref}.cliente_id IS NOT NULL
+            ON CONFLICT (mes, cliente_id) DO UPDATE SET pedidos = pedidos + 1;
+            UPDATE resumo_mensal
+               SET pedidos = pedidos + 1,
+                   receita = receita + COALESCE({ref}.total, 0),
+                   quantidade_itens = quantidade_itens +
+                       (SELECT COALESCE(SUM(quantidade), 0) FROM itens_pedido WHERE pedido_id = {ref}.id)
+             WHERE mes = substr({ref}.data, 1, 7);
+        """
+
+    def sql_remover_pedido(ref: str) -> str:
+        return f"""
+            UPDATE resumo_mensal
+               SET pedidos = pedidos - 1,
+                   receita = receita - COALESCE({ref}.total, 0),
+                   quantidade_itens = quantidade_itens -
+                       (SELECT COALESCE(SUM(quantidade), 0) FROM itens_pedido WHERE pedido_id = {ref}.id)
+             WHERE mes = substr({ref}.data, 1, 7);
+            UPDATE resumo_mensal_clientes SET pedidos = pedidos - 1
+             WHERE mes = substr({ref}.data, 1, 7) AND cliente_id = {ref}.cliente_id;
+            UPDATE resumo_mensal SET clientes_distintos = clientes_distintos - 1
+             WHERE mes = substr({ref}.data, 1, 7)
+               AND EXISTS (SELECT 1 FROM resumo_mensal_clientes
+                            WHERE mes = substr({ref}.data, 1, 7) AND cliente_id = {ref}.cliente_id
+                              AND pedidos <= 0);
+            DELETE FROM resumo_mensal_clientes
+             WHERE mes = substr({ref}.data, 1, 7) AND cliente_id = {ref}.cliente_id AND pedidos <= 0;
+            DELETE FROM resumo_mensal WHERE mes = substr({ref}.data, 1, 7) AND pedidos <= 0;
+        """
+
+    # Itens atualizam apenas a quantidade do mês do pedido a que pertencem
+    def sql_itens(ref: str, sinal: str) -> str:
+        return f"""
+            UPDATE resumo_mensal
+               SET quantidade_itens = quantidade_itens {sinal} {ref}.quantidade
+             WHERE mes = (SELECT substr(data, 1, 7) FROM pedidos WHERE id = {ref}.pedido_id);
+        """
+
+    gatilhos = {
+        "trg_resumo_pedidos_insert": f"AFTER INSERT ON pedidos BEGIN {sql_adicionar_pedido('NEW')} END",
+        "trg_resumo_pedidos_delete": f"AFTER DELETE ON pedidos BEGIN {sql_remover_pedido('OLD')} END",
+        "trg_resumo_pedidos_update": (
+            "AFTER UPDATE OF data, total, cliente_id ON pedidos BEGIN "
+            f"{sql_remover_pedido('OLD')} {sql_adicionar_pedido('NEW')} END"
+        ),
+        "trg_resumo_itens_insert": f"AFTER INSERT ON itens_pedido BEGIN {sql_itens('NEW', '+')} END",
+        "trg_resumo_itens_delete": f"AFTER DELETE ON itens_pedido BEGIN {sql_itens('OLD', '-')} END",
+        "trg_resumo_itens_update": (
+            "AFTER UPDATE OF quantidade, pedido_id ON itens_pedido BEGIN "
+            f"{sql_itens('OLD', '-')} {sql_itens('NEW', '+')} END"
+        ),
+    }
+    for nome, corpo in gatilhos.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {nome} {corpo};")
+
+    # Bancos existentes: preenche o resumo com o histórico atual
+    _reconstruir_resumo_mensal(conn)
+
+
+@migracao(5, "Busca textual FTS5 (sem acentos) para clientes e produtos")
+def _m005_busca_fts(conn: sqlite3.Connection):
+    # Tabelas FTS5 de "conteúdo externo": o texto fica só nas tabelas
+    # originais e o índice é mantido pelos triggers abaixo.
+    # remove_diacritics 2 faz "joao" encontrar "João".
+    tokenizador = "unicode61 remove_diacritics 2"
+    try:
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5(
+                nome, email, content='clientes', content_rowid='id', tokenize='{tokenizador}'
+            );
+        """)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5(
+                nome, content='produtos', content_rowid='id', tokenize='{tokenizador}'
+            );
+        """)
+    except sqlite3.OperationalError as e:
+        # SQLite compilado sem FTS5: a busca continua funcionando via LIKE
+        print(f"Aviso: FTS5 indisponível ({e}). A busca usará LIKE.")
+        return
+
+    colunas = {"clientes": ("nome", "email"), "produtos": ("nome",)}
+    for tabela, cols in colunas.items():
+        fts = f"{tabela}_fts"
+        lista = ", ".join(cols)
+        novos = ", ".join(f"NEW.{c}" for c in cols)
+        antigos = ", ".join(f"OLD.{c}" for c in cols)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {tabela} BEGIN
+                INSERT INTO {fts} (rowid, {lista}) VALUES (NEW.id, {novos});
+            END;
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {tabela} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', OLD.id, {antigos});
+            END;
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {lista} ON {tabela} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', OLD.id, {antigos});
+                INSERT INTO {fts} (rowid, {lista}) VALUES (NEW.id, {novos});
+            END;
+        """)
+        # Indexa os registros já existentes
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild');")
+
+
+@migracao(6, "Catálogo de arquivos anuais de pedidos antigos (core/arquivo.py)")
+def _m006_catalogo_arquivo(conn: sqlite3.Connection):
+    # Um registro por ano arquivado: `ate` é a data de corte (exclusiva)
+    # da última execução que moveu pedidos desse ano para o arquivo.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS arquivo_pedidos (
+            ano INTEGER PRIMARY KEY,
+            arquivo TEXT NOT NULL,
+            ate TEXT NOT NULL,
+            pedidos INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+
+
+@migracao(7, "auto_vacuum INCREMENTAL (espaço livre devolvido pela manutenção, core/manutencao.py)",
+          transacional=False)
+def _m007_auto_vacuum_incremental(conn: sqlite3.Connection):
+    if conn.execute("PRAGMA auto_vacuum;").fetchone()[0] == 2:
+        return
+    print("Reconstruindo o arquivo do banco (VACUUM) para ativar o auto_vacuum incremental...")
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+    # Em um banco já existente a mudança só vale depois de um VACUUM
+    com_novas_tentativas(lambda: conn.execute("VACUUM;"))
+
+
+# Colunas monetárias, gravadas em centavos (INTEGER) a partir da migração 8
+COLUNAS_DINHEIRO = {
+    "produtos": ("preco",),
+    "pedidos": ("total",),
+    "itens_pedido": ("preco_unit",),
+    "resumo_mensal": ("receita",),
+}
+
+# Converte um valor em reais (REAL) para centavos
+SQL_REAIS_PARA_CENTAVOS = "CAST(ROUND({coluna} * 100) AS INTEGER)"
+
+
+def colunas_em_reais(conn: sqlite3.Connection, tabela: str, esquema: str = "main") -> list:
+    """Colunas monetárias da tabela que ainda estão como REAL (formato anterior à migração 8)."""
+    tipos = {c[1]: c[2].upper() for c in conn.execute(f"PRAGMA {esquema}.table_info({tabela});")}
+    return [c for c in COLUNAS_DINHEIRO.get(tabela, ()) if tipos.get(c) == "REAL"]
+
+
+def _reconstruir_tabela(conn: sqlite3.Connection, tabela: str, novos_tipos: dict, expressoes: dict,
+                        esquema: str = "main"):
+    """
+    Recria a tabela com outros tipos de coluna (o SQLite não tem ALTER
+    COLUMN), copiando as linhas com `expressoes` e recriando índices,
+    triggers e a sequência do AUTOINCREMENT. Rodar dentro de uma transação,
+    com foreign_keys e legacy_alter_table ajustados por quem chama.
+    """
+    sql_tabela = conn.execute(f"SELECT sql FROM {esquema}.sqlite_master WHERE type = 'table' AND name = ?;",
+                              (tabela,)).fetchone()[0]
+    for coluna, tipo in novos_tipos.items():
+        sql_tabela, trocas = re.subn(rf"(\b{coluna}\s+)\w+", rf"\g<1>{tipo}", sql_tabela, count=1)
+        if not trocas:
+            raise sqlite3.OperationalError(f"Coluna {coluna} não encontrada em {tabela}.")
+    temporaria = f"{tabela}_reconstruida"
+    sql_tabela = re.sub(rf"^CREATE TABLE\s+[\"`\[]?{tabela}[\"`\]]?", f"CREATE TABLE {esquema}.{temporaria}",
+                        sql_tabela, flags=re.IGNORECASE)
+    dependentes = [r[0] for r in conn.execute(f"""
+        SELECT sql FROM {esquema}.sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL;
+    """, (tabela,))]
+    colunas = [c[1] for c in conn.execute(f"PRAGMA {esquema}.table_info({tabela});")]
+    sequencia = None
+    if conn.execute(f"SELECT 1 FROM {esquema}.sqlite_master WHERE name = 'sqlite_sequence';").fetchone():
+        sequencia = conn.execute(f"SELECT seq FROM {esquema}.sqlite_sequence WHERE name = ?;", (tabela,)).fetchone()
+
+    conn.execute(sql_tabela)
+    conn.execute(f"""
+        INSERT INTO {esquema}.{temporaria} ({", ".join(colunas)})
+        SELECT {", ".join(expressoes.get(c, c) for c in colunas)} FROM {esquema}.{tabela};
+    """)
+    conn.execute(f"DROP TABLE {esquema}.{tabela};")
+    conn.execute(f"ALTER TABLE {esquema}.{temporaria} RENAME TO {tabela};")
+    for sql in dependentes:
+        if esquema != "main":
+            sql = re.sub(r"^(CREATE\s+(?:UNIQUE\s+)?(?:INDEX|TRIGGER)\s+(?:IF\s+NOT\s+EXISTS\s+)?)",
+                         rf"\g<1>{esquema}.", sql, flags=re.IGNORECASE)
+        conn.execute(sql)
+    if sequencia:
+        conn.execute(f"UPDATE {esquema}.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?;",
+                     (sequencia[0], tabela))
+
+
+def converter_para_centavos(conn: sqlite3.Connection, tabela: str, esquema: str = "main") -> bool:
+    """
+    Converte as colunas monetárias REAL da tabela para centavos INTEGER.
+    Retorna False se a tabela já estava convertida. Ver _reconstruir_tabela.
+    """
+    colunas = colunas_em_reais(conn, tabela, esquema)
+    if not colunas:
+        return False
+    _reconstruir_tabela(conn, tabela,
+                        {c: "INTEGER" for c in colunas},
+                        {c: SQL_REAIS_PARA_CENTAVOS.format(coluna=c) for c in colunas},
+                        esquema)
+    return True
+
+
+@migracao(8, "Valores monetários em centavos (INTEGER): preço, total, preço unitário e receita",
+          transacional=False)
+def _m008_dinheiro_em_centavos(conn: sqlite3.Connection):
+    if not any(colunas_em_reais(conn, tabela) for tabela in COLUNAS_DINHEIRO):
+        return
+    # As tabelas são recriadas: foreign_keys precisa estar desligado (o que
+    # só é possível fora de uma transação) para o DROP TABLE não disparar
+    # as FKs, e legacy_alter_table evita que o RENAME reescreva os triggers.
+    conn.execute("PRAGMA foreign_keys = OFF;")
+    conn.execute("PRAGMA legacy_alter_table = ON;")
+    try:
+        iniciar_transacao(conn)
+        try:
+            # Outro terminal pode ter convertido enquanto aguardávamos o lock
+            for tabela in COLUNAS_DINHEIRO:
+                converter_para_centavos(conn, tabela)
+            violacoes = conn.execute("PRAGMA foreign_key_check;").fetchall()
+            if violacoes:
+                raise sqlite3.IntegrityError(f"{len(violacoes)} chave(s) estrangeira(s) inválida(s) após a conversão.")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF;")
+        conn.execute("PRAGMA foreign_keys = ON;")
+
+
+# Contagem de itens de um pedido, para preencher/conferir os contadores de
+# pedidos ({ref} é a tabela ou alias de pedidos na consulta externa)
+CONTADORES_PEDIDOS = {
+    "total_itens": "(SELECT COUNT(*) FROM {esquema}.itens_pedido i WHERE i.pedido_id = {ref}.id)",
+    "quantidade_total": "(SELECT COALESCE(SUM(i.quantidade), 0) FROM {esquema}.itens_pedido i "
+                        "WHERE i.pedido_id = {ref}.id)",
+}
+
+
+def recalcular_contadores_pedidos(conn: sqlite3.Connection, esquema: str = "main") -> int:
+    """
+    Recalcula total_itens e quantidade_total dos pedidos a partir de
+    itens_pedido, só nas linhas divergentes. Retorna quantas foram corrigidas.
+    """
+    contar = CONTADORES_PEDIDOS["total_itens"].format(esquema=esquema, ref="pedidos")
+    somar = CONTADORES_PEDIDOS["quantidade_total"].format(esquema=esquema, ref="pedidos")
+    cursor = conn.execute(f"""
+        UPDATE {esquema}.pedidos SET total_itens = {contar}, quantidade_total = {somar}
+        WHERE total_itens IS NOT {contar} OR quantidade_total IS NOT {somar};
+    """)
+    return cursor.rowcount
+
+
+@migracao(9, "Contadores total_itens e quantidade_total em pedidos, mantidos por triggers")
+def _m009_contadores_pedidos(conn: sqlite3.Connection):
+    # Relatórios e listas leem os contadores em vez de contar os itens de
+    # cada pedido com uma subquery correlacionada
+    existentes = {c[1] for c in conn.execute("PRAGMA table_info(pedidos);")}
+    for coluna in CONTADORES_PEDIDOS:
+        if coluna not in existentes:
+            conn.execute(f"ALTER TABLE pedidos ADD COLUMN {coluna} INTEGER NOT NULL DEFAULT 0;")
+
+    def sql_itens(ref: str, sinal: str) -> str:
+        return f"""
+            UPDATE pedidos
+               SET total_itens = total_itens {sinal} 1,
+                   quantidade_total = quantidade_total {sinal} {ref}.quantidade
+             WHERE id = {ref}.pedido_id;
+        """
+
+    gatilhos = {
+        "trg_contadores_itens_insert": f"AFTER INSERT ON itens_pedido BEGIN {sql_itens('NEW', '+')} END",
+        "trg_contadores_itens_delete": f"AFTER DELETE ON itens_pedido BEGIN {sql_itens('OLD', '-')} END",
+        "trg_contadores_itens_update": (
+            "AFTER UPDATE OF quantidade, pedido_id ON itens_pedido BEGIN "
+            f"{sql_itens('OLD', '-')} {sql_itens('NEW', '+')} END"
+        ),
+    }
+    for nome, corpo in gatilhos.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {nome} {corpo};")
+
+    # Bancos existentes: preenche os contadores com os itens atuais
+    recalcular_contadores_pedidos(conn)
+
+
+# Índices do relatório de pedidos (core/database.py, montar_consulta_relatorio).
+# Cada um começa pela coluna de um filtro/ordenação e carrega as demais
+# colunas que o relatório lê de pedidos (id é o rowid), então qualquer
+# índice escolhido pelo planejador resolve a consulta sem ler a tabela.
+INDICES_RELATORIO = {
+    # Período e ORDER BY data (também a listagem paginada por (data, id))
+    "idx_pedidos_relatorio_data": "pedidos (data, id, cliente_id, total, total_itens)",
+    # Cliente (+ período), na ordem de data
+    "idx_pedidos_relatorio_cliente": "pedidos (cliente_id, data, id, total, total_itens)",
+    # Faixa de valor e ORDER BY total
+    "idx_pedidos_relatorio_total": "pedidos (total, id, data, cliente_id, total_itens)",
+    # Quantidade de itens e ORDER BY total_itens
+    "idx_pedidos_relatorio_itens": "pedidos (total_itens, id, data, cliente_id, total)",
+    # Pedidos que contêm um produto (e verificação de FK ao excluir produtos)
+    "idx_itens_pedido_produto": "itens_pedido (produto_id, pedido_id)",
+}
+
+
+@migracao(10, "Índices de cobertura para os filtros e ordenações do relatório de pedidos")
+def _m010_indices_relatorio(conn: sqlite3.Connection):
+    for nome, definicao in INDICES_RELATORIO.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {definicao};")
+    # Substituídos pelos índices acima, que começam pelas mesmas colunas
+    for nome in ("idx_pedidos_data", "idx_pedidos_cliente_id", "idx_itens_pedido_produto_id"):
+        conn.execute(f"DROP INDEX IF EXISTS {nome};")
+
+
+def tabela_existe(nome: str) -> bool:
+    """Verifica se uma tabela (ou tabela virtual) existe no banco."""
+    resultado = executar_comando("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;", (nome,))
+    return bool(resultado)
+
+
+def _reconstruir_resumo_mensal(conn: sqlite3.Connection):
+    """
+    Recalcula resumo_mensal e resumo_mensal_clientes a partir de pedidos/itens_pedido.
+    Meses anteriores à data de corte do arquivo (arquivo_pedidos) não têm
+    mais pedidos na base principal e são preservados como estão.
+    """
+    corte = ""
+    # A migração 4 reconstrói o resumo antes de a migração 6 criar o catálogo
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'arquivo_pedidos';").fetchone():
+        corte = conn.execute("SELECT substr(MAX(ate), 1, 7) FROM arquivo_pedidos;").fetchone()[0] or ""
+    conn.execute("DELETE FROM resumo_mensal_clientes WHERE mes >= ?;", (corte,))
+    conn.execute("DELETE FROM resumo_mensal WHERE mes >= ?;", (corte,))
+    conn.execute("""
+        INSERT INTO resumo_mensal_clientes (mes, cliente_id, pedidos)
+        SELECT substr(data, 1, 7), cliente_id, COUNT(*)
+        FROM pedidos
+        WHERE cliente_id IS NOT NULL AND substr(data, 1, 7) >= ?
+        GROUP BY substr(data, 1, 7), cliente_id;
+    """, (corte,))
+    conn.execute("""
+        INSERT INTO resumo_mensal (mes, pedidos, receita, quantidade_itens, clientes_distintos)
+        SELECT substr(p.data, 1, 7),
+               COUNT(*),
+               COALESCE(SUM(p.total), 0),
+               COALESCE(SUM(q.quantidade), 0),
+               (SELECT COUNT(*) FROM resumo_mensal_clientes rc WHERE rc.mes = substr(p.data, 1, 7))
+        FROM pedidos p
+        LEFT JOIN (SELECT pedido_id, SUM(quantidade) AS quantidade
+                   FROM itens_pedido GROUP BY pedido_id) q ON q.pedido_id = p.id
+        WHERE substr(p.data, 1, 7) >= ?
+        GROUP BY substr(p.data, 1, 7);
+    """, (corte,))
+
+
+def reconstruir_resumo_mensal():
+    """
+    Recalcula o resumo mensal de vendas do zero, em uma única transação.
+    Use se o resumo for suspeito de divergir (ex.: edição manual do banco).
+    """
+    try:
+        with transacao() as conn:
+            _reconstruir_resumo_mensal(conn)
+    except sqlite3.Error as e:
+        print(f"Erro ao reconstruir o resumo mensal: {e}")
+        raise e
+
+
+def verificar_contadores_pedidos(corrigir: bool = False) -> list:
+    """
+    Confere total_itens e quantidade_total de cada pedido com itens_pedido.
+    Use se os contadores forem suspeitos de divergir (ex.: edição manual
+    do banco com os triggers desligados).
+
+    Returns:
+        [(pedido_id, total_itens, itens_contados, quantidade_total, quantidade_somada)]
+        dos pedidos divergentes. Com corrigir=True eles são recalculados na
+        mesma transação.
+    """
+    sql = """
+        SELECT p.id, p.total_itens, COALESCE(q.itens, 0), p.quantidade_total, COALESCE(q.quantidade, 0)
+        FROM pedidos p
+        LEFT JOIN (SELECT pedido_id, COUNT(*) AS itens, SUM(quantidade) AS quantidade
+                   FROM itens_pedido GROUP BY pedido_id) q ON q.pedido_id = p.id
+        WHERE p.total_itens IS NOT COALESCE(q.itens, 0)
+           OR p.quantidade_total IS NOT COALESCE(q.quantidade, 0)
+        ORDER BY p.id;
+    """
+    try:
+        if not corrigir:
+            return consultar_leitura(sql)
+        with transacao() as conn:
+            divergentes = conn.execute(sql).fetchall()
+            if divergentes:
+                recalcular_contadores_pedidos(conn)
+            return divergentes
+    except sqlite3.Error as e:
+        print(f"Erro ao verificar os contadores dos pedidos: {e}")
+        raise e
+
+
+def _criar_tabelas(conn: sqlite3.Connection):
+    """Executa os CREATE TABLE do esquema inicial na conexão informada."""
+    cursor = conn.cursor()
+
+    # SQL para criar a tabela de produtos
+    sql_criar_tabela_produtos = """
+    CREATE TABLE IF NOT EXISTS produtos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL UNIQUE,
+        preco REAL NOT NULL CHECK(preco >= 0)
+    );
+    """
+
+    # SQL para criar a tabela de clientes
+    sql_criar_tabela_clientes = """
+    CREATE TABLE IF NOT EXISTS clientes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        email TEXT,
+        telefone TEXT
+    );
+    """
+
+    # SQL para criar a tabela de pedidos
+    sql_criar_tabela_pedidos = """
+    CREATE TABLE IF NOT EXISTS pedidos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cliente_id INTEGER,
+        data TEXT NOT NULL,
+        total REAL,
+        FOREIGN KEY (cliente_id) REFERENCES clientes (id)
+    );
+    """
+
+    # SQL para criar a tabela de itens do pedido (MODIFICADA)
+    sql_criar_tabela_itens_pedido = """
+    CREATE TABLE IF NOT EXISTS itens_pedido (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pedido_id INTEGER,
+        produto_id INTEGER,
+        quantidade INTEGER NOT NULL,
+        preco_unit REAL NOT NULL,
+        FOREIGN KEY (pedido_id) REFERENCES pedidos (id),
+        FOREIGN KEY (produto_id) REFERENCES produtos (id)
+    );
+    """
+
+    # Executa a criação das tabelas
+    cursor.execute(sql_criar_tabela_produtos)
+    cursor.execute(sql_criar_tabela_clientes)
+    cursor.execute(sql_criar_tabela_pedidos)
+    cursor.execute(sql_criar_tabela_itens_pedido)
+
+
+def executar_comando(sql: str, parametros: tuple = (), fabrica=None):
+    """
+    Executa um comando SQL parametrizado (INSERT, UPDATE, DELETE, SELECT).
+    Em um SELECT, `fabrica` é usada como row_factory do cursor (ex.:
+    models.Cliente.from_row) e a lista já vem com os objetos montados.
+    """
+    if not sql.strip().upper().startswith("SELECT"):
+        # Escrita: transação própria (ou parte da transação em andamento)
+        try:
+            with transacao() as conn:
+                conn.execute(sql, parametros)
+        except sqlite3.Error as e:
+            print(f"Erro ao executar comando SQL: {e}")
+            # Lança a exceção para que a camada de controle possa tratá-la
+            raise e
+        return True
+
+    with conexao() as conn:
+        try:
+            cursor = conn.cursor()
+            if fabrica is not None:
+                cursor.row_factory = fabrica  # só deste cursor; a conexão do pool não muda
+            cursor.execute(sql, parametros)
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Erro ao executar comando SQL: {e}")
+            conn.rollback()
+            raise e
+
+
+# =================================================================
+# --- TRANSAÇÕES DE ESCRITA (BEGIN IMMEDIATE COM NOVAS TENTATIVAS) ---
+# =================================================================
+# Toda gravação passa por transacao(): o lock de escrita é pedido logo no
+# BEGIN IMMEDIATE, então dois terminais gravando ao mesmo tempo se
+# enfileiram no início da transação (esperando o busy_timeout do perfil)
+# em vez de falharem no meio dela. Se o lock não vier, o BEGIN é repetido
+# após uma pausa aleatória crescente; o corpo do bloco nunca é repetido.
+
+_metricas_transacoes = {}
+
+
+def _zerar_metricas_transacoes():
+    _metricas_transacoes.update({
+        "transacoes": 0,
+        "com_espera": 0,
+        "novas_tentativas": 0,
+        "desistencias": 0,
+        "espera_total": 0.0,
+        "espera_max": 0.0,
+    })
+
+
+_zerar_metricas_transacoes()
+
+# Esperas abaixo disso (s) não contam como disputa pelo lock
+_ESPERA_SIGNIFICATIVA = 0.005
+
+
+def banco_ocupado(erro: sqlite3.Error) -> bool:
+    """True se o erro é SQLITE_BUSY/SQLITE_LOCKED (outro processo com o lock)."""
+    codigo = getattr(erro, "sqlite_errorcode", None)
+    if codigo is not None:
+        return codigo & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    mensagem = str(erro).lower()
+    return "locked" in mensagem or "busy" in mensagem
+
+
+def _pausa_tentativa(tentativa: int) -> float:
+    return random.uniform(0, min(TRANSACAO_ESPERA_MAXIMA, TRANSACAO_ESPERA_BASE * 2 ** tentativa))
+
+
+def com_novas_tentativas(operacao, tentativas: int = None) -> float:
+    """
+    Executa operacao() repetindo-a enquanto o banco estiver ocupado.
+    Retorna o tempo total esperado (s); relança o erro na última tentativa.
+    """
+    tentativas = tentativas or TRANSACAO_TENTATIVAS
+    inicio = time.perf_counter()
+    for tentativa in range(tentativas):
+        try:
+            operacao()
+            return time.perf_counter() - inicio
+        except sqlite3.OperationalError as e:
+            if not banco_ocupado(e) or tentativa == tentativas - 1:
+                if banco_ocupado(e):
+                    with _estatisticas_lock:
+                        _metricas_transacoes["desistencias"] += 1
+                raise
+            with _estatisticas_lock:
+                _metricas_transacoes["novas_tentativas"] += 1
+            time.sleep(_pausa_tentativa(tentativa))
+
+
+def _registrar_transacao(espera: float):
+    with _estatisticas_lock:
+        m = _metricas_transacoes
+        m["transacoes"] += 1
+        m["espera_total"] += espera
+        m["espera_max"] = max(m["espera_max"], espera)
+        if espera >= _ESPERA_SIGNIFICATIVA:
+            m["com_espera"] += 1
+
+
+def iniciar_transacao(conn: sqlite3.Connection, tentativas: int = None) -> float:
+    """
+    Executa BEGIN IMMEDIATE na conexão, repetindo-o com pausas aleatórias
+    crescentes se o banco estiver ocupado. Retorna o tempo esperado (s).
+    """
+    return com_novas_tentativas(lambda: conn.execute("BEGIN IMMEDIATE;"),
+                                 tentativas or TRANSACAO_TENTATIVAS)
+
+
+def confirmar_transacao(conn: sqlite3.Connection, tentativas: int = None) -> float:
+    """
+    Executa o COMMIT, repetindo-o se o banco estiver ocupado (no journal
+    DELETE o commit espera os leitores). Retorna o tempo esperado (s).
+    """
+    return com_novas_tentativas(conn.commit, tentativas or TRANSACAO_TENTATIVAS)
+
+
+@contextmanager
+def transacao(tentativas: int = None):
+    """
+    Unidade de trabalho de escrita. Uso:
+
+        with db.transacao() as conn:
+            cur = conn.execute("INSERT INTO pedidos ...", (...))
+            conn.executemany("INSERT INTO itens_pedido ...", itens)
+
+    Abre a transação com BEGIN IMMEDIATE (com novas tentativas se outro
+    terminal estiver gravando), confirma ao fim do bloco e desfaz tudo se
+    o bloco lançar uma exceção. Se o lock não for obtido após `tentativas`
+    (padrão TRANSACAO_TENTATIVAS), lança sqlite3.OperationalError
+    ("database is locked") antes de executar o bloco.
+
+    Blocos aninhados na mesma thread fazem parte da transação externa.
+    As esperas pelo lock ficam em estatisticas_transacoes().
+    """
+    with conexao() as conn:
+        if conn.in_transaction:
+            yield conn
+            return
+        espera = iniciar_transacao(conn, tentativas)
+        try:
+            yield conn
+            espera += confirmar_transacao(conn, tentativas)
+        except BaseException:
+            conn.rollback()
+            raise
+        _registrar_transacao(espera)
+
+
+def estatisticas_transacoes() -> dict:
+    """
+    Retorna as métricas das transações de escrita: transacoes, com_espera
+    (quantas esperaram pelo lock), novas_tentativas, desistencias,
+    espera_total_ms e espera_max_ms.
+    """
+    with _estatisticas_lock:
+        m = dict(_metricas_transacoes)
+    return {
+        "transacoes": m["transacoes"],
+        "com_espera": m["com_espera"],
+        "novas_tentativas": m["novas_tentativas"],
+        "desistencias": m["desistencias"],
+        "espera_total_ms": m["espera_total"] * 1000,
+        "espera_max_ms": m["espera_max"] * 1000,
+    }
+
+
+# Quantidade padrão de linhas buscadas por fetchmany nas consultas em streaming
+STREAM_TAMANHO_PADRAO = 500
+
+
+def iterar_lotes(sql: str, parametros: tuple = (), tamanho_lote: int = STREAM_TAMANHO_PADRAO,
+                 somente_leitura: bool = False, cancelamento: Cancelamento = None):
+    """
+    Gerador que executa um SELECT e produz listas de até `tamanho_lote`
+    linhas (via fetchmany), mantendo a conexão aberta durante a iteração.
+    A memória usada fica limitada ao tamanho do lote, não ao da tabela.
+
+    Com somente_leitura=True a iteração inteira roda em um snapshot()
+    (conexão mode=ro): exportações longas veem um estado consistente e
+    não disputam locks com a gravação de pedidos.
+
+    Com `cancelamento` (ver Cancelamento), a iteração pode ser
+    interrompida e o tempo máximo vale para ela inteira.
+
+    A conexão só volta ao pool quando a iteração termina (ou o gerador é
+    fechado), então consuma o gerador até o fim ou use-o em um `for`.
+    """
+    with (snapshot() if somente_leitura else conexao()) as conn, consulta_cancelavel(conn, cancelamento):
+        try:
+            cursor = conn.cursor()
+            cursor.arraysize = tamanho_lote
+            cursor.execute(sql, parametros)
+            while True:
+                linhas = cursor.fetchmany()
+                if not linhas:
+                    break
+                yield linhas
+        except sqlite3.Error as e:
+            print(f"Erro ao executar consulta SQL: {e}")
+            raise e
+
+
+def iterar_consulta(sql: str, parametros: tuple = (), tamanho_lote: int = STREAM_TAMANHO_PADRAO,
+                    somente_leitura: bool = False, cancelamento: Cancelamento = None):
+    """
+    Gerador que produz as linhas de um SELECT uma a uma, buscando-as do
+    banco em lotes de `tamanho_lote`. Ver iterar_lotes.
+    """
+    for linhas in iterar_lotes(sql, parametros, tamanho_lote, somente_leitura, cancelamento):
+        yield from linhas
+
+
+# Quantidade padrão de linhas por transação em executar_lote
+LOTE_TAMANHO_PADRAO = 1000
+
+
+def executar_lote(sql: str, lista_parametros, tamanho_lote: int = LOTE_TAMANHO_PADRAO,
+                  ao_progresso=None) -> dict:
+    """
+    Executa um comando de escrita (INSERT/UPDATE/DELETE) para cada tupla de
+    parâmetros, em blocos de `tamanho_lote` linhas via executemany.
+
+    Cada bloco roda em uma transação própria (BEGIN IMMEDIATE com novas
+    tentativas, como em transacao()): se um bloco falhar,
+    ele é revertido e a exceção é relançada, mas os blocos anteriores já
+    estão gravados. O iterável é consumido sob demanda (pode ser um gerador
+    lendo um arquivo), sem carregar tudo em memória.
+
+    Args:
+        sql: Comando parametrizado, ex.: "INSERT INTO clientes (nome) VALUES (?)".
+        lista_parametros: Iterável de tuplas de parâmetros.
+        tamanho_lote: Linhas por transação.
+        ao_progresso: Callback opcional (recebe o total de linhas gravadas até o momento).
+
+    Returns:
+        dict com "linhas", "lotes", "segundos" e "linhas_por_segundo".
+    """
+    if tamanho_lote < 1:
+        raise ValueError("tamanho_lote deve ser maior que zero.")
+
+    iterador = iter(lista_parametros)
+    total_linhas = 0
+    total_lotes = 0
+    inicio = time.perf_counter()
+
+    with conexao() as conn:
+        while True:
+            bloco = list(islice(iterador, tamanho_lote))
+            if not bloco:
+                break
+            try:
+                espera = iniciar_transacao(conn)
+                conn.executemany(sql, bloco)
+                espera += confirmar_transacao(conn)
+                _registrar_transacao(espera)
+            except sqlite3.Error as e:
+                print(f"Erro ao executar lote SQL (bloco {total_lotes + 1}): {e}")
+                conn.rollback()
+                raise e
+            total_linhas += len(bloco)
+            total_lotes += 1
+            if ao_progresso:
+                ao_progresso(total_linhas)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "linhas": total_linhas,
+        "lotes": total_lotes,
+        "segundos": segundos,
+        "linhas_por_segundo": total_linhas / segundos if segundos > 0 else 0.0,
+    }
+
+
+# --- Bloco de Teste ---
+if __name__ == "__main__":
+    if os.path.exists(DB_FILE):
+        os.remove(DB_FILE)
+        print(f"Banco de dados antigo '{DB_FILE}' removido para teste.")
+    for sufixo in ("-wal", "-shm"):
+        if os.path.exists(DB_FILE + sufixo):
+            os.remove(DB_FILE + sufixo)
+
+    inicializar_banco()
+    print("\n--- Testando Funções ---")
+
+    try:
+        # Inserindo Produtos
+        print("Inserindo produtos...")
+        executar_comando("INSERT INTO produtos (nome, preco) VALUES (?, ?)", ("Teclado Mecânico RGB", 29990))
+        executar_comando("INSERT INTO produtos (nome, preco) VALUES (?, ?)", ("Mouse Gamer Sem Fio", 18050))
+
+        # Inserindo Clientes
+        print("Inserindo clientes...")
+        executar_comando("INSERT INTO clientes (nome, email) VALUES (?, ?)", ("Carlos Pereira", "carlos@email.com"))
+
+        # Inserindo Pedido
+        print("Inserindo pedido para cliente 1...")
+        executar_comando("INSERT INTO pedidos (cliente_id, data, total) VALUES (?, ?, ?)", (1, "2025-10-25", 78030))
+
+        # Inserindo Itens no Pedido (usando produto_id)
+        print("Inserindo itens para o pedido 1...")
+        sql_insert_item = "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unit) VALUES (?, ?, ?, ?)"
+        executar_comando(sql_insert_item, (1, 1, 2, 29990)) # 2 teclados (centavos)
+        executar_comando(sql_insert_item, (1, 2, 1, 18050)) # 1 mouse
+
+        # Teste de SELECT com JOIN triplo
+        print("\nBuscando detalhes do pedido...")
+        sql_join = """
+            SELECT c.nome, pr.nome, ip.quantidade, ip.preco_unit
+            FROM pedidos p
+            JOIN clientes c ON p.cliente_id = c.id
+            JOIN itens_pedido ip ON ip.pedido_id = p.id
+            JOIN produtos pr ON ip.produto_id = pr.id
+            WHERE p.id = 1
+        """
+        detalhes = executar_comando(sql_join)
+        for detalhe in detalhes:
+            print(detalhe)
+
+        # Teste de consulta em streaming
+        print("\nPercorrendo itens em streaming...")
+        for linha in iterar_consulta("SELECT id, pedido_id, quantidade FROM itens_pedido", tamanho_lote=1):
+            print(linha)
+
+        # Teste de escrita em lote
+        print("\nInserindo 10.000 clientes em lote...")
+        stats = executar_lote("INSERT INTO clientes (nome, email) VALUES (?, ?)",
+                              ((f"Cliente {i}", f"cliente{i}@email.com") for i in range(10000)))
+        print(f"{stats['linhas']} linhas em {stats['lotes']} lote(s): "
+              f"{stats['linhas_por_segundo']:.0f} linhas/s")
+
+    except Exception as e:
         print(f"\nOcorreu um erro durante o teste: {e}")
\ No newline at end of file
@@ -5,6 +5,7 @@ import os
 import sys
 import subprocess
 import csv
+import asyncio
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
@@ -18,6 +19,10 @@ import styles
 # IMPORTS DA PASTA 'CORE'
 from core import database
 from core import analysis
+from core import backup
+from core import manutencao
+from core.assincrono import BancoAssincrono, PonteTk
+from core.repositorio import Repositorio
 # IMPORTS DAS VIEWS
 from views.lista_cliente import ClientesView
 from views.form_cliente import FormCliente
@@ -27,6 +32,17 @@ from views.form_produto import FormProduto
 from views.dashboard_view import DashboardView
 from views.relatorios_view import RelatoriosView
 from views.historico_view import HistoricoView
+from views.diagnostico_view import DiagnosticoView
+
+# Intervalo (ms) da verificação de mudanças no banco para a aba visível
+# (pega gravações feitas por outro terminal no mesmo arquivo)
+INTERVALO_VERIFICACAO_MS = 3000
+
+# Intervalo (ms) entre as checagens do agendador de manutenção do banco
+INTERVALO_AGENDADOR_MS = 30000
+
+# Intervalo (ms) da atualização do andamento de uma consulta de relatório
+INTERVALO_PROGRESSO_MS = 250
 
 
 class AppController:
@@ -49,7 +65,9 @@ class AppController:
 
         try:
             utils.setup_logging()
-            db.inicializar_banco()
+            # Banco definido por DB_FILE (arquivo ou ":memory:")
+            self.repo = Repositorio()
+            self.repo.inicializar()
             utils.log_info("Aplicação iniciada. Banco de dados inicializado.")
         except Exception as e:
             utils.log_erro("Falha crítica ao inicializar a aplicação.", e)
@@ -58,6 +76,27 @@ class AppController:
             self.root.destroy()
             return
 
+        # --- Concorrência: banco em thread dedicada + ponte asyncio/Tk ---
+        self.banco_async = BancoAssincrono(self.repo.armazenamento)
+        self.ponte_async = PonteTk(self.root)
+
+        # --- Listagens paginadas por chave (carregam uma página por vez) ---
+        self.paginador_clientes = database.CarregadorPaginado(
+            self.repo.fetch_pagina_clientes, lambda c: (c.nome, c.id))
+        self.paginador_produtos = database.CarregadorPaginado(
+            self.repo.fetch_pagina_produtos, lambda p: (p[1], p[0]))
+        self.paginador_pedidos = database.CarregadorPaginado(
+            self.repo.fetch_pagina_pedidos, lambda p: (p[1], p[0]))
+        self._carregando_mais_pedidos = False
+
+        # --- Detecção de mudanças: o que cada aba exibiu por último ---
+        self._termo_clientes = None
+        self._termo_produtos = None
+        self._filtros_relatorio = None
+        self._assinatura_historico = None
+        # Consulta de relatório em andamento (db.Cancelamento) ou None
+        self._cancelamento_relatorio = None
+
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
@@ -74,7 +113,8 @@ class AppController:
             on_novo=self._on_novo_cliente,
             on_editar=self._on_editar_cliente,
             on_excluir=self._on_excluir_cliente,
-            on_buscar=self._on_buscar_cliente
+            on_buscar=self._on_buscar_cliente,
+            on_carregar_mais=self._on_carregar_mais_clientes
         )
         self.notebook.add(self.clientes_view, text="Clientes")
 
@@ -83,7 +123,8 @@ class AppController:
             on_novo=self._on_novo_produto,
             on_editar=self._on_editar_produto,
             on_excluir=self._on_excluir_produto,
-            on_buscar=self._on_buscar_produto
+            on_buscar=self._on_buscar_produto,
+            on_carregar_mais=self._on_carregar_mais_produtos
         )
         self.notebook.add(self.produtos_view, text="Produtos")
 
@@ -94,7 +135,8 @@ class AppController:
             self.notebook,
             on_filtrar_callback=self._on_filtrar_relatorio,
             on_exportar_csv_callback=self._on_exportar_csv,
-            on_exportar_pdf_callback=self._on_exportar_pdf
+            on_exportar_pdf_callback=self._on_exportar_pdf,
+            on_cancelar_callback=self._on_cancelar_relatorio
         )
         self.notebook.add(self.relatorios_view, text="Relatórios")
         
@@ -105,17 +147,56 @@ class AppController:
         )
         self.notebook.add(self.historico_view, text="Histórico")
 
+        # Aba de diagnóstico do banco: criada sob demanda pelo menu Opções
+        self.diagnostico_view = None
+
         # --- Criação do Menu e Protocolo de Fechamento ---
         self._create_menu_bar()
         self.root.protocol("WM_DELETE_WINDOW", self._on_close_app)
 
         # --- Carregamento Inicial ---
-        self.recarregar_dashboard()
-        self.recarregar_lista_clientes()
-        self.recarregar_lista_produtos()
-        self.recarregar_lista_pedidos()
-        self._carregar_dados_relatorios()
-        self.recarregar_historico() # <-- Consistente
+        # Só a aba visível é carregada; as demais, ao serem selecionadas
+        self.notebook.bind("<<NotebookTabChanged>>", lambda event: self._atualizar_aba_atual())
+        self._atualizar_aba_atual()
+        self.root.after(INTERVALO_VERIFICACAO_MS, self._verificar_mudancas)
+
+        # --- Manutenção do banco nos períodos ociosos ---
+        self.agendador_manutencao = manutencao.AgendadorManutencao()
+        for evento in ("<Any-KeyPress>", "<Any-ButtonPress>"):
+            self.root.bind_all(evento, lambda event: self.agendador_manutencao.registrar_atividade(), add="+")
+        self.root.after(INTERVALO_AGENDADOR_MS, self._verificar_manutencao)
+
+    # =================================================================
+    # --- Carga sob Demanda e Detecção de Mudanças ---
+    # =================================================================
+
+    def _atualizar_aba_atual(self):
+        """
+        Recarrega a aba selecionada. Cada recarregar_* consulta o
+        rastreador de mudanças (self.repo.mudou) e não faz nada se as
+        tabelas que exibe não mudaram desde a última carga.
+        """
+        aba = self.root.nametowidget(self.notebook.select())
+        if aba is self.dashboard_view:
+            self.recarregar_dashboard(silencioso=True)
+        elif aba is self.clientes_view:
+            self.recarregar_lista_clientes(self._termo_clientes)
+        elif aba is self.produtos_view:
+            self.recarregar_lista_produtos(self._termo_produtos)
+        elif aba is self.pedidos_frame:
+            self.recarregar_lista_pedidos()
+        elif aba is self.relatorios_view:
+            self._carregar_dados_relatorios()
+        elif aba is self.historico_view:
+            self.recarregar_historico()
+
+    def _verificar_mudancas(self):
+        """Verificação periódica da aba visível (barata quando nada mudou)."""
+        try:
+            self._atualizar_aba_atual()
+        except Exception as e:
+            utils.log_erro("Falha na verificação periódica de mudanças.", e)
+        self.root.after(INTERVALO_VERIFICACAO_MS, self._verificar_mudancas)
 
     # =================================================================
     # --- Menu, Tema e Fechamento ---
@@ -125,6 +206,9 @@ class AppController:
         menu_bar = tk.Menu(self.root)
 
         file_menu = tk.Menu(menu_bar, tearoff=0)
+        file_menu.add_command(label="Fazer Backup do Banco", command=self._on_fazer_backup)
+        file_menu.add_command(label="Otimizar Banco Agora", command=self._on_otimizar_banco)
+        file_menu.add_separator()
         file_menu.add_command(label="Sair", command=self._on_close_app)
         menu_bar.add_cascade(label="Arquivo", menu=file_menu)
 
@@ -160,6 +244,10 @@ class AppController:
             label="Alternar Tema (Claro/Escuro)", 
             command=self._toggle_theme
         )
+        options_menu.add_command(
+            label="Diagnóstico do Banco",
+            command=self._on_abrir_diagnostico
+        )
         menu_bar.add_cascade(label="Opções", menu=options_menu)
 
         self.root.config(menu=menu_bar)
@@ -181,16 +269,38 @@ class AppController:
     def _on_close_app(self):
         if messagebox.askyesno("Sair", "Tem certeza que deseja sair?", parent=self.root):
             utils.log_info("Aplicação encerrada pelo usuário.")
+            self.ponte_async.fechar()
+            if not self.agendador_manutencao.em_execucao:
+                try:
+                    self.repo.executar_manutencao(rapida=True)
+                except Exception as e:
+                    utils.log_erro("Falha na manutenção rápida ao fechar.", e)
+            self.banco_async.fechar()
+            self.repo.fechar()
             self.root.destroy()
             
+    def _recarregar_combobox_produtos_relatorio(self):
+        """Recarrega a lista de produtos do filtro da aba de relatórios."""
+        try:
+            if not self.repo.mudou("combobox_produtos_relatorio", "produtos"):
+                return
+            self.relatorios_view.set_produtos_combobox([tuple(p) for p in self.repo.listar_produtos()])
+        except Exception as e:
+            # Consulta falhou: a próxima visita tenta de novo
+            self.repo.esquecer("combobox_produtos_relatorio")
+            utils.log_erro("Falha ao recarregar combobox de produtos.", e)
+
     # --- Nova Função (Correção do Bug do Combobox) ---
     def _recarregar_combobox_clientes_relatorio(self):
         """Recarrega a lista de clientes no combobox da aba de relatórios."""
         try:
+            if not self.repo.mudou("combobox_relatorio", "clientes"):
+                return
             utils.log_info("Recarregando combobox de clientes (Relatórios).")
-            clientes_list = database.fetch_clientes_para_combobox()
+            clientes_list = [(c.id, c.nome) for c in self.repo.listar_clientes()]
             self.relatorios_view.set_clientes_combobox(clientes_list)
         except Exception as e:
+            self.repo.esquecer("combobox_relatorio")
             utils.log_erro("Falha ao recarregar combobox de clientes.", e)
 
     # =================================================================
@@ -205,34 +315,46 @@ class AppController:
         btn_novo.pack(side=tk.LEFT)
         tree_frame = ttk.Frame(frame, padding=(10, 0, 10, 10))
         tree_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-        colunas = ("id", "data", "cliente", "total")
+        colunas = ("id", "data", "cliente", "itens", "total")
         self.pedidos_tree = ttk.Treeview(tree_frame, columns=colunas, show="headings")
         self.pedidos_tree.heading("id", text="ID Pedido")
         self.pedidos_tree.heading("data", text="Data")
         self.pedidos_tree.heading("cliente", text="Cliente")
+        self.pedidos_tree.heading("itens", text="Nº Itens")
         self.pedidos_tree.heading("total", text="Total (R$)")
         self.pedidos_tree.column("id", width=80, stretch=False, anchor=tk.CENTER)
         self.pedidos_tree.column("data", width=120, stretch=False)
         self.pedidos_tree.column("cliente", width=300, stretch=True)
+        self.pedidos_tree.column("itens", width=80, stretch=False, anchor=tk.CENTER)
         self.pedidos_tree.column("total", width=120, stretch=False, anchor=tk.E)
-        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.pedidos_tree.yview)
-        self.pedidos_tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.pedidos_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.pedidos_tree.yview)
+        self.pedidos_tree.configure(yscrollcommand=self._on_rolagem_pedidos)
+        self.pedidos_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.pedidos_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.pedidos_status_var = tk.StringVar(value="0 pedidos carregados.")
+        ttk.Label(frame, textvariable=self.pedidos_status_var, anchor=tk.W,
+                  relief=tk.SUNKEN).pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 10))
         return frame
 
     # --- Lógica do Dashboard ---
-    def recarregar_dashboard(self):
-        utils.log_info("Recarregando dados do dashboard.")
+    def recarregar_dashboard(self, silencioso=False):
         try:
-            total_clientes, total_pedidos, ticket_medio = database.fetch_dados_dashboard()
-            self.dashboard_view.set_dados(total_clientes, total_pedidos, ticket_medio)
+            if not silencioso:
+                # Botão "Atualizar": consulta sempre, mesmo sem mudanças detectadas
+                self.repo.esquecer("dashboard")
+            if self.repo.mudou("dashboard", "clientes", "pedidos"):
+                utils.log_info("Recarregando dados do dashboard.")
+                total_clientes, total_pedidos, ticket_medio = self.repo.fetch_dados_dashboard()
+                self.dashboard_view.set_dados(total_clientes, total_pedidos, ticket_medio)
+            if silencioso:
+                return
             messagebox.showinfo(
                 "Atualização Concluída",
                 "Os dados do dashboard foram atualizados com sucesso!",
                 parent=self.root
             )
         except Exception as e:
+            self.repo.esquecer("dashboard")
             utils.log_erro("Falha ao recarregar o dashboard.", e)
             messagebox.showerror(
                 "Erro de Atualização",
@@ -247,50 +369,61 @@ class AppController:
             self.dashboard_view.set_analise_carregando(
                 "Analisando... Conectando ao servidor de IA e buscando dados.\nPor favor, aguarde..."
             )
-            analysis.analisar_pedidos_com_ia(
-                self._on_analise_sucesso_cb, 
-                self._on_analise_erro_cb
+            self.ponte_async.submeter(
+                analysis.analisar_pedidos_com_ia(self.banco_async),
+                self._update_ui_analise_sucesso,
+                self._update_ui_analise_erro
             )
         except Exception as e:
             utils.log_erro("Erro ao disparar análise de IA.", e)
             messagebox.showerror("Erro", f"Não foi possível iniciar a análise: {e}")
             self.dashboard_view.btn_analisar.config(state=tk.NORMAL)
 
-    def _on_analise_sucesso_cb(self, resultado_ia: str):
-        utils.log_info("Callback de sucesso da IA recebido.")
-        self.root.after(0, self._update_ui_analise_sucesso, resultado_ia)
-
     def _update_ui_analise_sucesso(self, resultado_ia: str):
+        utils.log_info("Resultado da análise de IA recebido.")
         self.dashboard_view.set_analise_resultado(resultado_ia)
         self.dashboard_view.btn_analisar.config(state=tk.NORMAL)
 
-    def _on_analise_erro_cb(self, erro_msg: str):
-        utils.log_erro(f"Callback de erro da IA recebido: {erro_msg}")
-        self.root.after(0, self._update_ui_analise_erro, erro_msg)
-
-    def _update_ui_analise_erro(self, erro_msg: str):
+    def _update_ui_analise_erro(self, erro: Exception):
+        erro_msg = str(erro)
+        utils.log_erro(f"Erro na análise de IA recebido: {erro_msg}")
         self.dashboard_view.set_analise_erro(erro_msg)
         self.dashboard_view.btn_analisar.config(state=tk.NORMAL)
         messagebox.showwarning("Erro na Análise", erro_msg, parent=self.root)
 
     # --- Lógica de Clientes ---
     def recarregar_lista_clientes(self, termo_busca=None):
+        termo_busca = termo_busca or None
+        mudou = self.repo.mudou("lista_clientes", "clientes")
+        if not mudou and termo_busca == self._termo_clientes:
+            return
+        self._termo_clientes = termo_busca
         utils.log_info(f"Recarregando lista de clientes. Termo: '{termo_busca}'")
         try:
             if termo_busca:
-                sql = "SELECT * FROM clientes WHERE nome LIKE ? OR email LIKE ? ORDER BY nome"
-                params = (f"%{termo_busca}%", f"%{termo_busca}%")
+                # Busca: resultados por relevância, sem paginação
+                clientes = self.repo.buscar_clientes(termo_busca)
+                tem_mais = False
             else:
-                sql = "SELECT * FROM clientes ORDER BY nome"
-                params = ()
-            tuplas_clientes = db.executar_comando(sql, params)
-            clientes_obj = [models.Cliente.from_tuple(t) for t in tuplas_clientes]
-            dados_para_view = [(c.id, c.nome, c.email, c.telefone) for c in clientes_obj]
-            self.clientes_view.set_lista_clientes(dados_para_view)
+                self.paginador_clientes.reiniciar()
+                clientes = self.paginador_clientes.proxima_pagina()
+                tem_mais = self.paginador_clientes.tem_mais
+            # Já vêm como models.Cliente (row_factory), sem conversão de ida e volta
+            self.clientes_view.set_lista_clientes(clientes, tem_mais)
         except Exception as e:
+            self.repo.esquecer("lista_clientes")
             utils.log_erro("Falha ao recarregar lista de clientes.", e)
             messagebox.showerror("Erro de Banco", f"Não foi possível carregar os clientes: {e}")
 
+    def _on_carregar_mais_clientes(self):
+        utils.log_info("Carregando próxima página de clientes.")
+        try:
+            clientes = self.paginador_clientes.proxima_pagina()
+            self.clientes_view.adicionar_clientes(clientes, self.paginador_clientes.tem_mais)
+        except Exception as e:
+            utils.log_erro("Falha ao carregar mais clientes.", e)
+            self.clientes_view.adicionar_clientes([], False)
+
     def _on_buscar_cliente(self, termo: str):
         self.recarregar_lista_clientes(termo)
 
@@ -299,11 +432,10 @@ class AppController:
 
     def _on_editar_cliente(self, cliente_id: int):
         try:
-            tupla = db.executar_comando("SELECT * FROM clientes WHERE id=?", (cliente_id,))
-            if not tupla:
+            cliente_obj = self.repo.obter_cliente(cliente_id)
+            if cliente_obj is None:
                 messagebox.showerror("Erro", "Cliente não encontrado.", parent=self.root)
                 return
-            cliente_obj = models.Cliente.from_tuple(tupla[0])
             dados_cliente_dict = {"id": cliente_obj.id, "nome": cliente_obj.nome, "email": cliente_obj.email,
                                   "telefone": cliente_obj.telefone}
             utils.log_acao(f"Ação: Iniciando edição do cliente ID {cliente_id} ({cliente_obj.nome}).")
@@ -315,16 +447,18 @@ class AppController:
 
     def _on_excluir_cliente(self, cliente_id: int):
         try:
-            nome_cliente_tupla = db.executar_comando("SELECT nome FROM clientes WHERE id=?", (cliente_id,))
-            if not nome_cliente_tupla:
+            cliente = self.repo.obter_cliente(cliente_id)
+            if cliente is None:
                 raise Exception("Cliente não encontrado para exclusão.")
-            nome_cliente = nome_cliente_tupla[0][0]
+            nome_cliente = cliente.nome
             if not messagebox.askyesno("Confirmar Exclusão", 
                                        f"Tem certeza que deseja excluir o cliente:\n\n{nome_cliente} (ID: {cliente_id})?", 
                                        parent=self.root):
                 utils.log_acao(f"Ação: Exclusão do cliente ID {cliente_id} CANCELADA pelo usuário.")
                 return
-            db.executar_comando("DELETE FROM clientes WHERE id=?", (cliente_id,))
+            with self.repo.unidade_de_trabalho() as uow:
+                uow.registrar_removido(cliente)
+            self.agendador_manutencao.solicitar()
             utils.log_acao(f"Cliente EXCLUÍDO: ID {cliente_id} - {nome_cliente}")
             messagebox.showinfo("Sucesso", "Cliente excluído com sucesso.", parent=self.root)
             self.recarregar_lista_clientes()
@@ -343,17 +477,24 @@ class AppController:
 
     def _salvar_cliente_cb(self, dados_cliente: dict):
         try:
-            if dados_cliente.get('id'):
-                sql = "UPDATE clientes SET nome=?, email=?, telefone=? WHERE id=?"
-                params = (dados_cliente['nome'], dados_cliente['email'], dados_cliente['telefone'], dados_cliente['id'])
-                msg_sucesso = "Cliente atualizado com sucesso!"
-                utils.log_acao(f"Cliente ATUALIZADO: ID {dados_cliente['id']} - {dados_cliente['nome']}")
-            else:
-                sql = "INSERT INTO clientes (nome, email, telefone) VALUES (?, ?, ?)"
-                params = (dados_cliente['nome'], dados_cliente['email'], dados_cliente['telefone'])
-                msg_sucesso = "Cliente salvo com sucesso!"
-                utils.log_acao(f"Cliente CRIADO: {dados_cliente['nome']}")
-            db.executar_comando(sql, params)
+            with self.repo.unidade_de_trabalho() as uow:
+                if dados_cliente.get('id'):
+                    cliente = self.repo.obter_cliente(dados_cliente['id'])
+                    if cliente is None:
+                        raise Exception("Cliente não encontrado (excluído em outro terminal?).")
+                    cliente.nome = dados_cliente['nome']
+                    cliente.email = dados_cliente['email']
+                    cliente.telefone = dados_cliente['telefone']
+                    uow.registrar_alterado(cliente)
+                    msg_sucesso = "Cliente atualizado com sucesso!"
+                    acao = f"Cliente ATUALIZADO: ID {dados_cliente['id']} - {dados_cliente['nome']}"
+                else:
+                    uow.registrar_novo(models.Cliente(None, dados_cliente['nome'], dados_cliente['email'],
+                                                      dados_cliente['telefone']))
+                    msg_sucesso = "Cliente salvo com sucesso!"
+                    acao = f"Cliente CRIADO: {dados_cliente['nome']}"
+            # Só registra no histórico depois do commit da unidade de trabalho
+            utils.log_acao(acao)
             messagebox.showinfo("Sucesso", msg_sucesso, parent=self.root)
             self.recarregar_lista_clientes()
             self.recarregar_historico()
@@ -361,26 +502,44 @@ class AppController:
         except sqlite3.Error as e:
             utils.log_erro(f"Falha ao salvar cliente: {dados_cliente['nome']}", e)
             messagebox.showerror("Erro no Banco", f"Não foi possível salvar o cliente: {e}", parent=self.root)
+        except Exception as e:
+            utils.log_erro(f"Falha ao salvar cliente: {dados_cliente['nome']}", e)
+            messagebox.showerror("Erro", f"Não foi possível salvar o cliente: {e}", parent=self.root)
 
     def _cancelar_form_cb(self):
         utils.log_info("Formulário de cliente fechado sem salvar.")
 
     # --- Lógica de Produtos ---
     def recarregar_lista_produtos(self, termo_busca=None):
+        termo_busca = termo_busca or None
+        mudou = self.repo.mudou("lista_produtos", "produtos")
+        if not mudou and termo_busca == self._termo_produtos:
+            return
+        self._termo_produtos = termo_busca
         utils.log_info(f"Recarregando lista de produtos. Termo: '{termo_busca}'")
         try:
             if termo_busca:
-                sql = "SELECT * FROM produtos WHERE nome LIKE ? ORDER BY nome"
-                params = (f"%{termo_busca}%",)
+                lista_produtos = self.repo.buscar_produtos(termo_busca)
+                tem_mais = False
             else:
-                sql = "SELECT * FROM produtos ORDER BY nome"
-                params = ()
-            lista_produtos = db.executar_comando(sql, params)
-            self.produtos_view.set_lista_produtos(lista_produtos)
+                self.paginador_produtos.reiniciar()
+                lista_produtos = self.paginador_produtos.proxima_pagina()
+                tem_mais = self.paginador_produtos.tem_mais
+            self.produtos_view.set_lista_produtos(lista_produtos, tem_mais)
         except Exception as e:
+            self.repo.esquecer("lista_produtos")
             utils.log_erro("Falha ao recarregar lista de produtos.", e)
             messagebox.showerror("Erro de Banco", f"Não foi possível carregar os produtos: {e}")
 
+    def _on_carregar_mais_produtos(self):
+        utils.log_info("Carregando próxima página de produtos.")
+        try:
+            lista_produtos = self.paginador_produtos.proxima_pagina()
+            self.produtos_view.adicionar_produtos(lista_produtos, self.paginador_produtos.tem_mais)
+        except Exception as e:
+            utils.log_erro("Falha ao carregar mais produtos.", e)
+            self.produtos_view.adicionar_produtos([], False)
+
     def _on_buscar_produto(self, termo: str):
         self.recarregar_lista_produtos(termo)
 
@@ -389,11 +548,11 @@ class AppController:
 
     def _on_editar_produto(self, produto_id: int):
         try:
-            tupla = db.executar_comando("SELECT * FROM produtos WHERE id=?", (produto_id,))
-            if not tupla:
+            produto = self.repo.obter_produto(produto_id)
+            if produto is None:
                 messagebox.showerror("Erro", "Produto não encontrado.", parent=self.root)
                 return
-            produto_data = {"id": tupla[0][0], "nome": tupla[0][1], "preco": tupla[0][2]}
+            produto_data = {"id": produto.id, "nome": produto.nome, "preco": produto.preco.centavos}
             utils.log_acao(f"Ação: Iniciando edição do produto ID {produto_id} ({produto_data['nome']}).")
             FormProduto(self.root, on_save_callback=self._salvar_produto_cb, produto_data=produto_data)
         except Exception as e:
@@ -401,12 +560,18 @@ class AppController:
 
     def _on_excluir_produto(self, produto_id: int):
         try:
-            nome_produto_tupla = db.executar_comando("SELECT nome FROM produtos WHERE id=?", (produto_id,))
-            nome_produto = nome_produto_tupla[0][0] if nome_produto_tupla else "Produto Desconhecido"
+            produto = self.repo.obter_produto(produto_id)
+            if produto is None:
+                utils.log_info(f"Exclusão do produto ID {produto_id}: produto não encontrado.")
+                messagebox.showerror("Erro", "Produto não encontrado.", parent=self.root)
+                return
+            nome_produto = produto.nome
             if not messagebox.askyesno("Confirmar Exclusão", f"Tem certeza que deseja excluir o produto:\n\n{nome_produto}?", parent=self.root):
                 utils.log_acao(f"Ação: Exclusão do produto ID {produto_id} CANCELADA.")
                 return
-            db.executar_comando("DELETE FROM produtos WHERE id=?", (produto_id,))
+            with self.repo.unidade_de_trabalho() as uow:
+                uow.registrar_removido(produto)
+            self.agendador_manutencao.solicitar()
             utils.log_acao(f"Produto EXCLUÍDO: ID {produto_id} - {nome_produto}")
             messagebox.showinfo("Sucesso", "Produto excluído com sucesso.", parent=self.root)
             self.recarregar_lista_produtos()
@@ -421,17 +586,22 @@ class AppController:
 
     def _salvar_produto_cb(self, dados_produto: dict):
         try:
-            if dados_produto.get('id'):
-                sql = "UPDATE produtos SET nome=?, preco=? WHERE id=?"
-                params = (dados_produto['nome'], dados_produto['preco'], dados_produto['id'])
-                msg_sucesso = "Produto atualizado com sucesso!"
-                utils.log_acao(f"Produto ATUALIZADO: ID {dados_produto['id']} - {dados_produto['nome']}")
-            else:
-                sql = "INSERT INTO produtos (nome, preco) VALUES (?, ?)"
-                params = (dados_produto['nome'], dados_produto['preco'])
-                msg_sucesso = "Produto salvo com sucesso!"
-                utils.log_acao(f"Produto CRIADO: {dados_produto['nome']}")
-            db.executar_comando(sql, params)
+            with self.repo.unidade_de_trabalho() as uow:
+                if dados_produto.get('id'):
+                    produto = self.repo.obter_produto(dados_produto['id'])
+                    if produto is None:
+                        raise Exception("Produto não encontrado (excluído em outro terminal?).")
+                    produto.nome = dados_produto['nome']
+                    produto.preco = dados_produto['preco']
+                    uow.registrar_alterado(produto)
+                    msg_sucesso = "Produto atualizado com sucesso!"
+                    acao = f"Produto ATUALIZADO: ID {dados_produto['id']} - {dados_produto['nome']}"
+                else:
+                    uow.registrar_novo(models.Produto(None, dados_produto['nome'], dados_produto['preco']))
+                    msg_sucesso = "Produto salvo com sucesso!"
+                    acao = f"Produto CRIADO: {dados_produto['nome']}"
+            # Só registra no histórico depois do commit da unidade de trabalho
+            utils.log_acao(acao)
             messagebox.showinfo("Sucesso", msg_sucesso, parent=self.root)
             self.recarregar_lista_produtos()
             self.recarregar_historico()
@@ -443,34 +613,59 @@ class AppController:
 
     # --- Lógica de Pedidos ---
     def recarregar_lista_pedidos(self):
+        if not self.repo.mudou("lista_pedidos", "pedidos", "clientes"):
+            return
         utils.log_info("Recarregando lista de pedidos.")
         try:
-            sql = """
-            SELECT p.id, p.data, c.nome, p.total
-            FROM pedidos p
-            JOIN clientes c ON p.cliente_id = c.id
-            ORDER BY p.data DESC, p.id DESC
-            """
-            lista_pedidos = db.executar_comando(sql)
             for i in self.pedidos_tree.get_children():
                 self.pedidos_tree.delete(i)
-            for item in lista_pedidos:
-                total_formatado = f"{item[3]:.2f}"
-                dados_view = (item[0], item[1], item[2], total_formatado)
-                self.pedidos_tree.insert("", tk.END, values=dados_view)
+            self.paginador_pedidos.reiniciar()
+            self._adicionar_pagina_pedidos()
         except Exception as e:
+            self.repo.esquecer("lista_pedidos")
             utils.log_erro("Falha ao recarregar lista de pedidos.", e)
             messagebox.showerror("Erro de Banco", f"Não foi possível carregar os pedidos: {e}")
 
+    def _adicionar_pagina_pedidos(self):
+        """Busca a próxima página de pedidos e a acrescenta à Treeview."""
+        for item in self.paginador_pedidos.proxima_pagina():
+            # (id, data, cliente, itens, total)
+            total_formatado = models.formatar_centavos(item[4])
+            dados_view = (item[0], item[1], item[2], item[3], total_formatado)
+            self.pedidos_tree.insert("", tk.END, values=dados_view)
+        count = self.paginador_pedidos.total_carregado
+        if self.paginador_pedidos.tem_mais:
+            self.pedidos_status_var.set(f"{count} pedido(s) carregado(s). Role para carregar mais.")
+        else:
+            self.pedidos_status_var.set(f"{count} pedido(s) encontrado(s).")
+
+    def _on_rolagem_pedidos(self, primeiro, ultimo):
+        """Atualiza a scrollbar e carrega a próxima página ao chegar no fim."""
+        self.pedidos_scrollbar.set(primeiro, ultimo)
+        if float(ultimo) >= 1.0 and self.paginador_pedidos.tem_mais and not self._carregando_mais_pedidos:
+            self._carregando_mais_pedidos = True
+            self.root.after_idle(self._on_carregar_mais_pedidos)
+
+    def _on_carregar_mais_pedidos(self):
+        utils.log_info("Carregando próxima página de pedidos.")
+        try:
+            self._adicionar_pagina_pedidos()
+        except Exception as e:
+            utils.log_erro("Falha ao carregar mais pedidos.", e)
+            self.paginador_pedidos.tem_mais = False
+        finally:
+            self._carregando_mais_pedidos = False
+
     def _on_novo_pedido(self):
         utils.log_info("Abrindo formulário de novo pedido.")
         try:
-            tuplas_clientes = database.fetch_clientes_para_combobox()
+            # Listas do mapa de identidade: sem consulta se as tabelas não mudaram
+            tuplas_clientes = [(c.id, c.nome) for c in self.repo.listar_clientes()]
             if not tuplas_clientes:
                 messagebox.showwarning("Atenção", "Cadastre um cliente antes de criar um pedido.", parent=self.root)
                 self.notebook.select(self.clientes_view)
                 return
-            tuplas_produtos = db.executar_comando("SELECT id, nome, preco FROM produtos ORDER BY nome")
+            tuplas_produtos = [tuple(p) for p in self.repo.listar_produtos()]
             if not tuplas_produtos:
                 messagebox.showwarning("Atenção", "Cadastre um produto antes de criar um pedido.", parent=self.root)
                 self.notebook.select(self.produtos_view)
@@ -479,7 +674,8 @@ class AppController:
                 self.root,
                 lista_clientes=tuplas_clientes,
                 lista_produtos=tuplas_produtos,
-                on_save_success_callback=self._on_pedido_salvo_cb
+                on_save_success_callback=self._on_pedido_salvo_cb,
+                repositorio=self.repo
             )
         except Exception as e:
             utils.log_erro("Falha ao preparar formulário de novo pedido.", e)
@@ -495,62 +691,137 @@ class AppController:
     def _carregar_dados_relatorios(self):
         try:
             self._recarregar_combobox_clientes_relatorio() # <-- Chamada corrigida
-            self._on_filtrar_relatorio()
+            self._recarregar_combobox_produtos_relatorio()
+            self._on_filtrar_relatorio(automatico=True)
         except Exception as e:
             utils.log_erro("Falha ao carregar dados iniciais dos relatórios.", e)
             messagebox.showerror("Erro", f"Não foi possível carregar a aba de relatórios: {e}", parent=self.root)
 
-    def _on_filtrar_relatorio(self):
+    def _on_filtrar_relatorio(self, automatico: bool = False):
+        """
+        Botão Filtrar (automatico=False) ou recarga da aba/verificação
+        periódica (automatico=True). Filtros inválidos só abrem a janela de
+        erro no clique; na recarga automática valem os últimos filtros válidos.
+        """
+        # Uma consulta por vez; a verificação periódica não empilha outra
+        if self._cancelamento_relatorio is not None:
+            return
         try:
-            utils.log_info("Filtrando relatório de pedidos.")
             filtros = self.relatorios_view.get_filtros()
-            pedidos = database.fetch_relatorio_pedidos(
-                filtros["data_inicio"],
-                filtros["data_fim"],
-                filtros["cliente_id"]
+        except ValueError as e:
+            if not automatico:
+                utils.log_info(f"Filtro de relatório inválido: {e}")
+                messagebox.showerror("Filtro Inválido", str(e), parent=self.root)
+                return
+            if self._filtros_relatorio is None:
+                return
+            filtros = self._filtros_relatorio
+        try:
+            utils.log_info("Filtrando relatório de pedidos.")
+            mudou = self.repo.mudou("relatorio", "pedidos", "itens_pedido", "clientes")
+            if not mudou and filtros == self._filtros_relatorio:
+                return
+            self._filtros_relatorio = filtros
+            cancelamento = db.Cancelamento()
+            self._cancelamento_relatorio = cancelamento
+            self.relatorios_view.set_consultando(True)
+            self.relatorios_view.set_status("Consultando...")
+            # A consulta roda na thread do banco; a janela continua responsiva
+            # e o botão Cancelar a interrompe (db.Cancelamento)
+            self.ponte_async.submeter(
+                self.banco_async.chamar(
+                    self.repo.fetch_relatorio_pedidos,
+                    cancelamento=cancelamento,
+                    **filtros
+                ),
+                self._on_relatorio_carregado,
+                self._on_relatorio_erro
             )
-            self.relatorios_view.set_lista_pedidos(pedidos)
+            self.root.after(INTERVALO_PROGRESSO_MS, self._atualizar_progresso_relatorio, cancelamento)
         except Exception as e:
-            utils.log_erro("Falha ao filtrar relatório.", e)
-            messagebox.showerror("Erro ao Filtrar", f"Ocorreu um erro ao buscar os dados:\n{e}", parent=self.root)
+            self._on_relatorio_erro(e)
+
+    def _atualizar_progresso_relatorio(self, cancelamento):
+        if cancelamento is not self._cancelamento_relatorio or cancelamento.cancelado:
+            return
+        self.relatorios_view.set_status(f"Consultando... {cancelamento.decorrido:.0f}s")
+        self.root.after(INTERVALO_PROGRESSO_MS, self._atualizar_progresso_relatorio, cancelamento)
+
+    def _on_cancelar_relatorio(self):
+        if self._cancelamento_relatorio is not None:
+            utils.log_info("Consulta do relatório cancelada pelo usuário.")
+            self.relatorios_view.set_status("Cancelando...")
+            self._cancelamento_relatorio.cancelar()
+
+    def _on_relatorio_carregado(self, pedidos: list):
+        self._cancelamento_relatorio = None
+        self.relatorios_view.set_lista_pedidos(pedidos)
+        self.relatorios_view.set_consultando(False)
+        self.relatorios_view.set_status(f"{len(pedidos)} pedido(s) encontrado(s).")
+
+    def _on_relatorio_erro(self, e: Exception):
+        cancelamento, self._cancelamento_relatorio = self._cancelamento_relatorio, None
+        # A próxima filtragem consulta de novo, mesmo com os mesmos filtros
+        self._filtros_relatorio = None
+        self.repo.esquecer("relatorio")
+        self.relatorios_view.set_consultando(False)
+        if isinstance(e, sqlite3.OperationalError) and db.consulta_interrompida(e) and cancelamento:
+            if cancelamento.motivo == db.Cancelamento.TEMPO_ESGOTADO:
+                utils.log_info(f"Consulta do relatório interrompida após {cancelamento.limite_segundos:.0f}s.")
+                self.relatorios_view.set_status("Consulta interrompida por tempo.")
+                messagebox.showwarning("Consulta Interrompida",
+                                       f"O relatório passou do tempo máximo de {cancelamento.limite_segundos:.0f}s "
+                                       "e foi interrompido.\nReduza o período ou escolha um cliente.",
+                                       parent=self.root)
+            else:
+                self.relatorios_view.set_status("Consulta cancelada.")
+            return
+        self.relatorios_view.set_status("")
+        utils.log_erro("Falha ao filtrar relatório.", e)
+        messagebox.showerror("Erro ao Filtrar", f"Ocorreu um erro ao buscar os dados:\n{e}", parent=self.root)
+
+    def _erro_exportacao(self, formato: str, filepath: str, e: Exception):
+        """Mostra o erro de uma exportação (tempo esgotado ou falha)."""
+        if isinstance(e, sqlite3.OperationalError) and db.consulta_interrompida(e):
+            utils.log_info(f"Exportação {formato} interrompida por tempo: {filepath}")
+            messagebox.showwarning("Exportação Interrompida",
+                                   f"A exportação passou do tempo máximo de {db.TEMPO_MAXIMO_CONSULTA:.0f}s "
+                                   "e foi interrompida.\nReduza o período ou escolha um cliente.",
+                                   parent=self.root)
+            return
+        utils.log_erro(f"Falha ao exportar {formato}: {filepath}", e)
+        messagebox.showerror("Erro ao Exportar", f"Não foi possível gerar o {formato}:\n{e}", parent=self.root)
 
     def _on_exportar_csv(self):
         filepath = "relatorio_pedidos.csv"
         utils.log_info(f"Exportando relatório para CSV: {filepath}")
         try:
             filtros = self.relatorios_view.get_filtros()
-            dados = database.fetch_relatorio_pedidos(
-                filtros["data_inicio"],
-                filtros["data_fim"],
-                filtros["cliente_id"]
-            )
+            # A exportação roda na thread do Tk; o tempo máximo evita travar a janela
+            dados = self.repo.iterar_relatorio_pedidos(cancelamento=db.Cancelamento(), **filtros)
             with open(filepath, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
                 writer.writerow(['ID Pedido', 'Data', 'Cliente', 'Nº Itens', 'Total (R$)'])
                 for row in dados:
-                    row_formatada = [row[0], row[1], row[2], row[3], f"{row[4]:.2f}"]
+                    row_formatada = [row[0], row[1], row[2], row[3], models.formatar_centavos(row[4])]
                     writer.writerow(row_formatada)
             messagebox.showinfo("Exportação Concluída", f"Relatório salvo com sucesso em:\n{os.path.abspath(filepath)}", parent=self.root)
             self._abrir_arquivo(filepath)
         except Exception as e:
-            utils.log_erro(f"Falha ao exportar CSV: {filepath}", e)
-            messagebox.showerror("Erro ao Exportar", f"Não foi possível gerar o CSV:\n{e}", parent=self.root)
+            self._erro_exportacao("CSV", filepath, e)
 
     def _on_exportar_pdf(self):
         filepath = "relatorio_pedidos.pdf"
         utils.log_info(f"Exportando relatório para PDF: {filepath}")
         try:
             filtros = self.relatorios_view.get_filtros()
-            dados = database.fetch_relatorio_pedidos(
-                filtros["data_inicio"],
-                filtros["data_fim"],
-                filtros["cliente_id"]
-            )
+            # A exportação roda na thread do Tk; o tempo máximo evita travar a janela
+            dados = self.repo.iterar_relatorio_pedidos(cancelamento=db.Cancelamento(), **filtros)
             doc = SimpleDocTemplate(filepath, pagesize=landscape(A4))
             elements = []
             dados_tabela = [['ID', 'Data', 'Cliente', 'Nº Itens', 'Total (R$)']]
             for row in dados:
-                dados_tabela.append([row[0], row[1], row[2], row[3], f"R$ {row[4]:.2f}"])
+                dados_tabela.append([row[0], row[1], row[2], row[3], models.formatar_centavos(row[4], simbolo=True)])
             t = Table(dados_tabela, colWidths=[0.8*inch, 1.2*inch, None, 0.8*inch, 1.2*inch])
             t.setStyle(TableStyle([
                 ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
@@ -571,8 +842,7 @@ class AppController:
             messagebox.showinfo("Exportação Concluída", f"Relatório salvo com sucesso em:\n{os.path.abspath(filepath)}", parent=self.root)
             self._abrir_arquivo(filepath)
         except Exception as e:
-            utils.log_erro(f"Falha ao exportar PDF: {filepath}", e)
-            messagebox.showerror("Erro ao Exportar", f"Não foi possível gerar o PDF:\n{e}", parent=self.root)
+            self._erro_exportacao("PDF", filepath, e)
 
     def _abrir_arquivo(self, filepath):
         try:
@@ -593,6 +863,14 @@ class AppController:
         """
         Lê o arquivo de log e atualiza a view de histórico.
         """
+        try:
+            estado = os.stat(utils.LOG_FILE)
+            assinatura = (estado.st_mtime_ns, estado.st_size)
+        except OSError:
+            assinatura = None
+        if assinatura is not None and assinatura == self._assinatura_historico:
+            return
+        self._assinatura_historico = assinatura
         utils.log_info("Recarregando view de histórico.")
         try:
             texto_log = utils.ler_log()
@@ -637,6 +915,86 @@ class AppController:
             messagebox.showwarning("Erro de Tema", 
                                 "Não foi possível aplicar o tema. Verifique se 'clam' está disponível.")
 
+    # --- Lógica de Diagnóstico do Banco ---
+    def _on_fazer_backup(self):
+        utils.log_info("Backup do banco solicitado pelo menu.")
+        # A cópia roda em uma thread de I/O; a janela continua responsiva
+        self.ponte_async.submeter(
+            asyncio.to_thread(backup.fazer_backup),
+            self._on_backup_concluido,
+            self._on_backup_erro
+        )
+
+    def _on_backup_concluido(self, resultado: dict):
+        utils.log_acao(f"Backup do banco gerado: {resultado['arquivo']}")
+        messagebox.showinfo("Backup Concluído",
+                            f"Backup verificado e salvo em:\n{os.path.abspath(resultado['arquivo'])}",
+                            parent=self.root)
+
+    def _on_backup_erro(self, e: Exception):
+        utils.log_erro("Falha ao gerar backup do banco.", e)
+        messagebox.showerror("Erro no Backup", f"Não foi possível gerar o backup:\n{e}", parent=self.root)
+
+    # --- Manutenção do Banco ---
+    def _verificar_manutencao(self):
+        """Inicia a manutenção em segundo plano se o agendador indicar."""
+        if self.agendador_manutencao.pronto():
+            self._executar_manutencao(self._on_manutencao_concluida)
+        self.root.after(INTERVALO_AGENDADOR_MS, self._verificar_manutencao)
+
+    def _executar_manutencao(self, ao_concluir, analisar=False):
+        self.agendador_manutencao.iniciar()
+        self.ponte_async.submeter(
+            asyncio.to_thread(self.repo.executar_manutencao, analisar=analisar),
+            ao_concluir,
+            self._on_manutencao_erro
+        )
+
+    def _on_otimizar_banco(self):
+        if self.agendador_manutencao.em_execucao:
+            messagebox.showinfo("Manutenção", "A manutenção do banco já está em andamento.", parent=self.root)
+            return
+        utils.log_info("Manutenção do banco solicitada pelo menu.")
+        self._executar_manutencao(self._on_otimizacao_concluida, analisar=True)
+
+    def _on_manutencao_concluida(self, resultado: dict):
+        self.agendador_manutencao.concluir()
+
+    def _on_otimizacao_concluida(self, resultado: dict):
+        self.agendador_manutencao.concluir()
+        antes, depois = resultado["antes"], resultado["depois"]
+        messagebox.showinfo("Manutenção Concluída",
+                            f"Estatísticas atualizadas e espaço livre devolvido.\n"
+                            f"Páginas: {antes['paginas']} -> {depois['paginas']} "
+                            f"({(antes['bytes'] - depois['bytes']) / 1024:.0f} KiB liberados).",
+                            parent=self.root)
+
+    def _on_manutencao_erro(self, e: Exception):
+        self.agendador_manutencao.concluir()
+        utils.log_erro("Falha na manutenção do banco.", e)
+
+    def _on_abrir_diagnostico(self):
+        """Cria a aba de diagnóstico (na primeira vez) e a seleciona."""
+        if self.diagnostico_view is None:
+            self.diagnostico_view = DiagnosticoView(
+                self.notebook,
+                on_atualizar_callback=self.recarregar_diagnostico,
+                on_zerar_callback=self._on_zerar_diagnostico
+            )
+            self.notebook.add(self.diagnostico_view, text="Diagnóstico")
+        self.recarregar_diagnostico()
+        self.notebook.select(self.diagnostico_view)
+
+    def recarregar_diagnostico(self):
+        utils.log_info("Recarregando estatísticas de consultas.")
+        self.diagnostico_view.set_estatisticas(db.estatisticas_consultas(), db.limite_consulta_lenta_ms(),
+                                               db.estatisticas_transacoes())
+
+    def _on_zerar_diagnostico(self):
+        db.zerar_estatisticas()
+        utils.log_info("Estatísticas de consultas zeradas.")
+        self.recarregar_diagnostico()
+
     # =================================================================
     # --- PONTO DE ENTRADA DA APLICAÇÃO ---
     # =================================================================
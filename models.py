@@ -1,133 +1,327 @@
-from dataclasses import dataclass, field
-from typing import Optional, List
-from datetime import date
-
-"""
-Este arquivo define os modelos de dados (estruturas de dados)
-usados em toda a aplicação.
-
-Usar dataclasses em vez de tuplas ou dicionários torna o código
-mais legível, mais fácil de manter e introduz verificação de tipo.
-"""
-
-
-@dataclass
-class Cliente:
-    """Representa um Cliente no banco de dados."""
-    id: Optional[int]
-    nome: str
-    email: Optional[str]
-    telefone: Optional[str]
-
-    @classmethod
-    def from_tuple(cls, data_tuple: tuple):
-        """Cria uma instância de Cliente a partir de uma tupla do banco de dados."""
-        # Espera a ordem: (id, nome, email, telefone)
-        if not data_tuple:
-            return None
-        return cls(id=data_tuple[0], nome=data_tuple[1], email=data_tuple[2], telefone=data_tuple[3])
-
-
-@dataclass
-class ItemPedido:
-    """Representa um item dentro de um Pedido."""
-    produto: str
-    quantidade: int
-    preco_unit: float
-    id: Optional[int] = None
-    pedido_id: Optional[int] = None
-
-    @property
-    def subtotal(self) -> float:
-        """Calcula o subtotal deste item."""
-        return self.quantidade * self.preco_unit
-
-    @classmethod
-    def from_tuple(cls, data_tuple: tuple):
-        """Cria uma instância de ItemPedido a partir de uma tupla do banco de dados."""
-        # Espera a ordem: (id, pedido_id, produto, quantidade, preco_unit)
-        if not data_tuple:
-            return None
-        return cls(
-            id=data_tuple[0],
-            pedido_id=data_tuple[1],
-            produto=data_tuple[2],
-            quantidade=data_tuple[3],
-            preco_unit=data_tuple[4]
-        )
-
-
-@dataclass
-class Pedido:
-    """
-    Representa um Pedido, que é composto por dados do cliente
-    e uma lista de itens.
-    """
-    id: Optional[int]
-    cliente_id: int
-    data: date | str  # Aceita str do DB, mas idealmente deve ser 'date'
-    total: float
-
-    # Esta lista é preenchida separadamente pelo controlador
-    itens: List[ItemPedido] = field(default_factory=list)
-
-    # Armazena o nome do cliente para exibição (carregado pelo controlador)
-    nome_cliente: Optional[str] = None
-
-    @classmethod
-    def from_tuple(cls, data_tuple: tuple):
-        """Cria uma instância de Pedido a partir de uma tupla do banco de dados."""
-        # Espera a ordem: (id, cliente_id, data, total)
-        if not data_tuple:
-            return None
-        return cls(
-            id=data_tuple[0],
-            cliente_id=data_tuple[1],
-            data=data_tuple[2],
-            total=data_tuple[3]
-        )
-
-# --- Bloco de Teste ---
-if __name__ == "__main__":
-    print("--- Testando Modelos de Dados ---")
-
-    # 1. Testando Cliente
-    print("\n[Cliente]")
-    tupla_cliente = (1, "Ana Beatriz", "ana.b@email.com", "11988776655")
-    cliente_obj = Cliente.from_tuple(tupla_cliente)
-    print(f"Objeto: {cliente_obj}")
-    print(f"Nome: {cliente_obj.nome}")
-    print(f"ID: {cliente_obj.id}")
-
-    # 2. Testando ItemPedido
-    print("\n[ItemPedido]")
-    item_obj = ItemPedido(produto="Teclado USB", quantidade=2, preco_unit=89.90)
-    print(f"Objeto: {item_obj}")
-    print(f"Produto: {item_obj.produto}")
-    print(f"Subtotal: R$ {item_obj.subtotal:.2f}")
-
-    tupla_item = (10, 5, "Mouse sem Fio", 1, 120.50)
-    item_obj_db = ItemPedido.from_tuple(tupla_item)
-    print(f"Objeto (do DB): {item_obj_db}")
-    print(f"Subtotal (do DB): R$ {item_obj_db.subtotal:.2f}")
-
-    # 3. Testando Pedido
-    print("\n[Pedido]")
-    tupla_pedido = (5, 1, "2024-10-25", 300.30)
-    pedido_obj = Pedido.from_tuple(tupla_pedido)
-
-    # O controlador seria responsável por adicionar os itens
-    pedido_obj.itens.append(item_obj)
-    pedido_obj.itens.append(item_obj_db)
-    pedido_obj.nome_cliente = cliente_obj.nome
-
-    print(f"Objeto: {pedido_obj}")
-    print(f"Nome do Cliente: {pedido_obj.nome_cliente}")
-    print(f"Data: {pedido_obj.data}")
-    print(f"Total (Armazenado): R$ {pedido_obj.total:.2f}")
-
-    # Podemos verificar o total calculado vs. armazenado
-    total_calculado = sum(item.subtotal for item in pedido_obj.itens)
-    print(f"Total (Calculado dos itens): R$ {total_calculado:.2f}")
-
+from dataclasses import dataclass, field
+from typing import Optional, List
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from itertools import starmap
+
+"""
+Este arquivo define os modelos de dados (estruturas de dados)
+usados em toda a aplicação.
+
+Usar dataclasses em vez de tuplas ou dicionários torna o código
+mais legível, mais fácil de manter e introduz verificação de tipo.
+
+As classes usam __slots__ (sem __dict__ por instância): cada objeto ocupa
+menos memória que a própria tupla da linha. Além de from_tuple, cada
+modelo tem from_row, com a assinatura de row_factory do sqlite3, para ser
+montado direto do cursor (db.executar_comando(..., fabrica=Cliente.from_row)),
+e from_tuples, que converte uma lista inteira de uma vez.
+"""
+
+
+@dataclass(frozen=True, order=True, slots=True)
+class Dinheiro:
+    """
+    Valor monetário em ponto fixo: um número inteiro de centavos.
+
+    É assim que preços, totais e receitas ficam no banco (colunas INTEGER,
+    migração 8): somas e multiplicações por quantidade são exatas, sem o
+    acúmulo de erros do float. Pode ser passado direto como parâmetro do
+    sqlite3 (grava os centavos).
+    """
+    centavos: int = 0
+
+    @classmethod
+    def de_reais(cls, valor) -> "Dinheiro":
+        """Converte reais (int, float, Decimal ou str com ponto) arredondando ao centavo."""
+        try:
+            reais = Decimal(str(valor))
+        except InvalidOperation:
+            raise ValueError(f"Valor monetário inválido: {valor!r}")
+        return cls(int((reais * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+
+    @classmethod
+    def de_texto(cls, texto: str) -> "Dinheiro":
+        """
+        Lê um valor digitado pelo usuário: "1234,56", "1.234,56", "1234.56"
+        ou "R$ 10". Lança ValueError se não for um valor com até 2 casas.
+        """
+        limpo = str(texto).replace("R$", "").replace(" ", "").strip()
+        if "," in limpo:
+            limpo = limpo.replace(".", "").replace(",", ".")
+        try:
+            reais = Decimal(limpo)
+        except InvalidOperation:
+            raise ValueError(f"Valor monetário inválido: '{texto}'")
+        if not reais.is_finite() or reais.as_tuple().exponent < -2:
+            raise ValueError(f"Valor monetário inválido (máximo de 2 casas decimais): '{texto}'")
+        return cls(int(reais * 100))
+
+    def em_reais(self) -> Decimal:
+        return Decimal(self.centavos) / 100
+
+    def formatar(self, simbolo: bool = False) -> str:
+        """Texto para telas e exportações: "299.90" (ou "R$ 299.90")."""
+        sinal = "-" if self.centavos < 0 else ""
+        reais, centavos = divmod(abs(self.centavos), 100)
+        texto = f"{sinal}{reais}.{centavos:02d}"
+        return f"R$ {texto}" if simbolo else texto
+
+    def __str__(self):
+        return self.formatar(simbolo=True)
+
+    def __add__(self, outro):
+        if isinstance(outro, Dinheiro):
+            return Dinheiro(self.centavos + outro.centavos)
+        if isinstance(outro, int) and outro == 0:
+            return self  # permite sum(valores)
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, outro):
+        if isinstance(outro, Dinheiro):
+            return Dinheiro(self.centavos - outro.centavos)
+        return NotImplemented
+
+    def __mul__(self, quantidade):
+        if isinstance(quantidade, int):
+            return Dinheiro(self.centavos * quantidade)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Dinheiro(-self.centavos)
+
+    def __bool__(self):
+        return self.centavos != 0
+
+    def __conform__(self, protocolo):
+        # Adaptação do sqlite3: o parâmetro vira o inteiro de centavos
+        return self.centavos
+
+
+def formatar_centavos(centavos, simbolo: bool = False) -> str:
+    """Formata um valor em centavos vindo do banco (None vira string vazia)."""
+    if centavos is None:
+        return ""
+    return Dinheiro(int(centavos)).formatar(simbolo)
+
+
+@dataclass(slots=True)
+class Cliente:
+    """Representa um Cliente no banco de dados."""
+    id: Optional[int]
+    nome: str
+    email: Optional[str]
+    telefone: Optional[str]
+
+    @classmethod
+    def from_tuple(cls, data_tuple: tuple):
+        """Cria uma instância de Cliente a partir de uma tupla do banco de dados."""
+        # Espera a ordem: (id, nome, email, telefone)
+        if not data_tuple:
+            return None
+        return cls(id=data_tuple[0], nome=data_tuple[1], email=data_tuple[2], telefone=data_tuple[3])
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory do sqlite3; a consulta deve trazer (id, nome, email, telefone)."""
+        return cls(*row)
+
+    @classmethod
+    def from_tuples(cls, tuplas) -> list:
+        """Converte uma lista de tuplas (id, nome, email, telefone) de uma vez."""
+        return list(starmap(cls, tuplas))
+
+    def __iter__(self):
+        # Desempacota na ordem das colunas, como a tupla do banco (Treeview, CSV)
+        return iter((self.id, self.nome, self.email, self.telefone))
+
+
+@dataclass(slots=True)
+class Produto:
+    """Representa um Produto do catálogo."""
+    id: Optional[int]
+    nome: str
+    preco: Dinheiro
+
+    @classmethod
+    def from_tuple(cls, data_tuple: tuple):
+        """Cria uma instância de Produto a partir de uma tupla do banco de dados."""
+        # Espera a ordem: (id, nome, preco em centavos)
+        if not data_tuple:
+            return None
+        return cls(id=data_tuple[0], nome=data_tuple[1], preco=Dinheiro(data_tuple[2] or 0))
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory do sqlite3; a consulta deve trazer (id, nome, preco)."""
+        return cls(row[0], row[1], Dinheiro(row[2] or 0))
+
+    @classmethod
+    def from_tuples(cls, tuplas) -> list:
+        """Converte uma lista de tuplas (id, nome, preco) de uma vez."""
+        return [cls(t[0], t[1], Dinheiro(t[2] or 0)) for t in tuplas]
+
+    def __iter__(self):
+        # Como a tupla do banco: (id, nome, preco em centavos)
+        return iter((self.id, self.nome, self.preco.centavos))
+
+
+@dataclass(slots=True)
+class ItemPedido:
+    """Representa um item dentro de um Pedido."""
+    produto: str
+    quantidade: int
+    preco_unit: Dinheiro
+    id: Optional[int] = None
+    pedido_id: Optional[int] = None
+
+    @property
+    def subtotal(self) -> Dinheiro:
+        """Calcula o subtotal deste item."""
+        return self.preco_unit * self.quantidade
+
+    @classmethod
+    def from_tuple(cls, data_tuple: tuple):
+        """Cria uma instância de ItemPedido a partir de uma tupla do banco de dados."""
+        # Espera a ordem: (id, pedido_id, produto, quantidade, preco_unit)
+        if not data_tuple:
+            return None
+        return cls(
+            id=data_tuple[0],
+            pedido_id=data_tuple[1],
+            produto=data_tuple[2],
+            quantidade=data_tuple[3],
+            preco_unit=Dinheiro(data_tuple[4])
+        )
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory do sqlite3; a consulta deve trazer (id, pedido_id, produto, quantidade, preco_unit)."""
+        return cls(row[2], row[3], Dinheiro(row[4]), row[0], row[1])
+
+    @classmethod
+    def from_tuples(cls, tuplas) -> list:
+        """Converte uma lista de tuplas (id, pedido_id, produto, quantidade, preco_unit)."""
+        return [cls(t[2], t[3], Dinheiro(t[4]), t[0], t[1]) for t in tuplas]
+
+
+@dataclass(slots=True)
+class Pedido:
+    """
+    Representa um Pedido, que é composto por dados do cliente
+    e uma lista de itens.
+    """
+    id: Optional[int]
+    cliente_id: int
+    data: date | str  # Aceita str do DB, mas idealmente deve ser 'date'
+    total: Dinheiro
+    # Mantidos pelos triggers de itens_pedido (migração 9)
+    total_itens: int = 0
+    quantidade_total: int = 0
+
+    # Esta lista é preenchida separadamente pelo controlador
+    itens: List[ItemPedido] = field(default_factory=list)
+
+    # Armazena o nome do cliente para exibição (carregado pelo controlador)
+    nome_cliente: Optional[str] = None
+
+    @classmethod
+    def from_tuple(cls, data_tuple: tuple):
+        """Cria uma instância de Pedido a partir de uma tupla do banco de dados."""
+        # Espera a ordem: (id, cliente_id, data, total[, total_itens, quantidade_total])
+        if not data_tuple:
+            return None
+        return cls(
+            id=data_tuple[0],
+            cliente_id=data_tuple[1],
+            data=data_tuple[2],
+            total=Dinheiro(data_tuple[3] or 0),
+            total_itens=data_tuple[4] if len(data_tuple) > 4 else 0,
+            quantidade_total=data_tuple[5] if len(data_tuple) > 5 else 0
+        )
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory do sqlite3; mesma ordem de colunas de from_tuple."""
+        return cls(row[0], row[1], row[2], Dinheiro(row[3] or 0), *row[4:6])
+
+    @classmethod
+    def from_tuples(cls, tuplas) -> list:
+        """Converte uma lista de tuplas de pedidos (mesma ordem de from_tuple)."""
+        return [cls(t[0], t[1], t[2], Dinheiro(t[3] or 0), *t[4:6]) for t in tuplas]
+
+# --- Bloco de Teste ---
+if __name__ == "__main__":
+    print("--- Testando Modelos de Dados ---")
+
+    # 1. Testando Cliente
+    print("\n[Cliente]")
+    tupla_cliente = (1, "Ana Beatriz", "ana.b@email.com", "11988776655")
+    cliente_obj = Cliente.from_tuple(tupla_cliente)
+    print(f"Objeto: {cliente_obj}")
+    print(f"Nome: {cliente_obj.nome}")
+    print(f"ID: {cliente_obj.id}")
+
+    # 2. Testando ItemPedido
+    print("\n[ItemPedido]")
+    item_obj = ItemPedido(produto="Teclado USB", quantidade=2, preco_unit=Dinheiro.de_texto("89,90"))
+    print(f"Objeto: {item_obj}")
+    print(f"Produto: {item_obj.produto}")
+    print(f"Subtotal: {item_obj.subtotal}")
+
+    tupla_item = (10, 5, "Mouse sem Fio", 1, 12050)  # preço em centavos, como no banco
+    item_obj_db = ItemPedido.from_tuple(tupla_item)
+    print(f"Objeto (do DB): {item_obj_db}")
+    print(f"Subtotal (do DB): {item_obj_db.subtotal}")
+
+    # 3. Testando Pedido
+    print("\n[Pedido]")
+    tupla_pedido = (5, 1, "2024-10-25", 30030)
+    pedido_obj = Pedido.from_tuple(tupla_pedido)
+
+    # O controlador seria responsável por adicionar os itens
+    pedido_obj.itens.append(item_obj)
+    pedido_obj.itens.append(item_obj_db)
+    pedido_obj.nome_cliente = cliente_obj.nome
+
+    print(f"Objeto: {pedido_obj}")
+    print(f"Nome do Cliente: {pedido_obj.nome_cliente}")
+    print(f"Data: {pedido_obj.data}")
+    print(f"Total (Armazenado): {pedido_obj.total}")
+
+    # Podemos verificar o total calculado vs. armazenado (soma exata em centavos)
+    total_calculado = sum(item.subtotal for item in pedido_obj.itens)
+    print(f"Total (Calculado dos itens): {total_calculado}")
+    assert total_calculado == pedido_obj.total
+
+    # 4. Testando Dinheiro (sem o erro de arredondamento do float)
+    print("\n[Dinheiro]")
+    dez_centavos = Dinheiro.de_texto("0,10")
+    print(f"0,10 somado 10 vezes: {sum([dez_centavos] * 10)} (float: {sum([0.10] * 10)!r})")
+    assert sum([dez_centavos] * 10) == Dinheiro.de_reais(1)
+    assert Dinheiro.de_texto("1.234,56").centavos == 123456
+    assert Dinheiro.de_texto("R$ 10").formatar() == "10.00"
+
+    # 5. Montagem direto do cursor (row_factory) e em lote
+    print("\n[row_factory]")
+    import sqlite3
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT, email TEXT, telefone TEXT)")
+    conn.execute("INSERT INTO clientes VALUES (?, ?, ?, ?)", tupla_cliente)
+    cursor = conn.cursor()
+    cursor.row_factory = Cliente.from_row
+    cliente_do_cursor = cursor.execute("SELECT id, nome, email, telefone FROM clientes").fetchone()
+    print(f"Objeto (do cursor): {cliente_do_cursor}")
+    assert cliente_do_cursor == cliente_obj
+    assert tuple(cliente_do_cursor) == tupla_cliente
+    assert Cliente.from_tuples([tupla_cliente]) == [cliente_obj]
+    assert ItemPedido.from_tuples([tupla_item]) == [item_obj_db]
+    assert Pedido.from_tuples([tupla_pedido])[0].total == Dinheiro(30030)
+    assert tuple(Produto.from_tuple((7, "Teclado USB", 8990))) == (7, "Teclado USB", 8990)
+    assert not hasattr(cliente_obj, "__dict__")  # __slots__: sem dicionário por instância
+
     print("\n--- Testes Concluídos ---")
\ No newline at end of file
@@ -6,10 +6,16 @@ import logging    # Módulo de logging do Python
 # --- Caminho do Arquivo de Log ---
 LOG_DIR = "logs"
 LOG_FILE = os.path.join(LOG_DIR, "app.log")
+LOG_CONSULTAS_LENTAS = os.path.join(LOG_DIR, "consultas_lentas.log")
 
 # Logger dedicado para ações do usuário
 action_logger = logging.getLogger('action_logger')
 
+# Logger dedicado para comandos SQL lentos (alimentado pelo db.py)
+slow_query_logger = logging.getLogger('slow_query_logger')
+slow_query_logger.propagate = False
+slow_query_logger.addHandler(logging.NullHandler())
+
 # =================================================================
 # --- DEFINIÇÃO DAS FUNÇÕES DE LOG (CONSOLE) ---
 # =================================================================
@@ -65,6 +71,15 @@ def setup_logging():
         
         log_info(f"Logger de ações configurado. Salvando em: {LOG_FILE}")
 
+        # 6. Mesmo processo para o log de consultas lentas
+        slow_query_logger.setLevel(logging.INFO)
+        slow_query_logger.propagate = False
+        if slow_query_logger.hasHandlers():
+            slow_query_logger.handlers.clear()
+        slow_handler = logging.FileHandler(LOG_CONSULTAS_LENTAS, mode='a', encoding='utf-8')
+        slow_handler.setFormatter(formatter)
+        slow_query_logger.addHandler(slow_handler)
+
     except Exception as e:
         log_erro("Falha CRÍTICA ao configurar o logger de arquivo!", e)
 
@@ -75,6 +90,13 @@ def log_acao(mensagem: str):
     """
     action_logger.info(mensagem)
 
+def log_consulta_lenta(mensagem: str):
+    """
+    Registra um comando SQL lento em logs/consultas_lentas.log.
+    Se o logging em arquivo não foi configurado, a mensagem é descartada.
+    """
+    slow_query_logger.warning(mensagem)
+
 def ler_log() -> str:
     """
     Lê o conteúdo completo do arquivo de log.
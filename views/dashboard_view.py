@@ -2,6 +2,8 @@ import tkinter as tk
 from tkinter import ttk
 from datetime import datetime
 
+from models import formatar_centavos
+
 class DashboardView(ttk.Frame):
     """
     Frame que exibe os principais indicadores (KPIs) da aplicação.
@@ -91,7 +93,8 @@ class DashboardView(ttk.Frame):
         # ... (mantenha esta função como estava) ...
         self.var_total_clientes.set(f"{total_clientes}")
         self.var_pedidos_mes.set(f"{total_pedidos}")
-        self.var_ticket_medio.set(f"R$ {ticket_medio:.2f}")
+        # ticket_medio em centavos (core.database.fetch_dados_dashboard)
+        self.var_ticket_medio.set(formatar_centavos(ticket_medio, simbolo=True))
 
     # --- 6. Novas Funções para controlar o Text ---
     
@@ -0,0 +1,79 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class DiagnosticoView(ttk.Frame):
+    """
+    Frame que exibe as estatísticas de execução dos comandos SQL
+    (chamadas, tempos e linhas) e as esperas por lock das transações de
+    escrita, coletadas pelo db.py.
+    """
+
+    def __init__(self, parent, on_atualizar_callback, on_zerar_callback):
+        super().__init__(parent, padding=10)
+
+        # --- 1. Frame de Botões ---
+        botoes_frame = ttk.Frame(self, padding=(0, 0, 0, 10))
+        botoes_frame.pack(side=tk.TOP, fill=tk.X)
+
+        ttk.Button(botoes_frame, text="Atualizar", command=on_atualizar_callback).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(botoes_frame, text="Zerar Estatísticas", command=on_zerar_callback).pack(side=tk.LEFT)
+
+        self.info_var = tk.StringVar()
+        ttk.Label(botoes_frame, textvariable=self.info_var).pack(side=tk.RIGHT)
+
+        self.transacoes_var = tk.StringVar()
+        ttk.Label(self, textvariable=self.transacoes_var, anchor=tk.W).pack(side=tk.BOTTOM, fill=tk.X, pady=(10, 0))
+
+        # --- 2. Treeview de Estatísticas ---
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+        colunas = ("sql", "chamadas", "total", "medio", "p95", "max", "linhas")
+        self.tree = ttk.Treeview(tree_frame, columns=colunas, show="headings")
+        self.tree.heading("sql", text="Comando SQL")
+        self.tree.heading("chamadas", text="Chamadas")
+        self.tree.heading("total", text="Total (ms)")
+        self.tree.heading("medio", text="Médio (ms)")
+        self.tree.heading("p95", text="p95 (ms)")
+        self.tree.heading("max", text="Máx. (ms)")
+        self.tree.heading("linhas", text="Linhas")
+
+        self.tree.column("sql", width=380, stretch=True)
+        for coluna in colunas[1:]:
+            self.tree.column(coluna, width=80, stretch=False, anchor=tk.E)
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    def set_estatisticas(self, estatisticas: list, limite_lenta_ms: float, transacoes: dict = None):
+        """
+        Recebe a lista de db.estatisticas_consultas() e preenche a Treeview.
+        Se informado, `transacoes` (db.estatisticas_transacoes()) vai para o rodapé.
+        """
+        for i in self.tree.get_children():
+            self.tree.delete(i)
+
+        for e in estatisticas:
+            self.tree.insert("", tk.END, values=(
+                e["sql"],
+                e["chamadas"],
+                f"{e['tempo_total_ms']:.1f}",
+                f"{e['tempo_medio_ms']:.2f}",
+                f"{e['p95_ms']:.2f}",
+                f"{e['tempo_max_ms']:.2f}",
+                e["linhas"],
+            ))
+
+        self.info_var.set(f"{len(estatisticas)} comando(s) distintos | "
+                          f"Log de lentas: >= {limite_lenta_ms:.0f} ms")
+
+        if transacoes is not None:
+            self.transacoes_var.set(
+                f"Transações de escrita: {transacoes['transacoes']} | "
+                f"Esperaram pelo lock: {transacoes['com_espera']} "
+                f"(total {transacoes['espera_total_ms']:.0f} ms, máx. {transacoes['espera_max_ms']:.0f} ms) | "
+                f"Novas tentativas: {transacoes['novas_tentativas']} | "
+                f"Desistências: {transacoes['desistencias']}")
@@ -1,11 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from datetime import date
+from datetime import date, datetime
 import sqlite3
 
 try:
     import db
     import utils
+    from models import Dinheiro
 except ImportError:
     # Fallback para execução de teste, se necessário
     pass
@@ -25,7 +26,7 @@ class _DialogAddItem(tk.Toplevel):
         self.resizable(False, False)
 
         # Mapeia o nome do produto para seus dados (id, preco)
-        # Formato da tupla em lista_produtos: (id, nome, preco)
+        # Formato da tupla em lista_produtos: (id, nome, preco em centavos)
         self.produtos_map = {p_nome: (p_id, p_preco) for p_id, p_nome, p_preco in lista_produtos}
 
         self.resultado = None
@@ -33,7 +34,7 @@ class _DialogAddItem(tk.Toplevel):
         # --- Variáveis ---
         self.produto_var = tk.StringVar()
         self.qtd_var = tk.IntVar(value=1)
-        self.preco_var = tk.DoubleVar()
+        self.preco_var = tk.StringVar()
 
         # --- Widgets ---
         frame = ttk.Frame(self, padding="15")
@@ -67,7 +68,7 @@ class _DialogAddItem(tk.Toplevel):
         nome_produto = self.produto_var.get()
         if nome_produto in self.produtos_map:
             _, preco = self.produtos_map[nome_produto]
-            self.preco_var.set(preco)
+            self.preco_var.set(Dinheiro(preco).formatar())
 
     def _on_ok(self):
         nome_produto = self.produto_var.get()
@@ -77,15 +78,16 @@ class _DialogAddItem(tk.Toplevel):
 
         try:
             qtd = self.qtd_var.get()
-            preco = self.preco_var.get()
-        except tk.TclError:
-            messagebox.showerror("Erro", "Quantidade e Preço devem ser números válidos.", parent=self)
+            preco = Dinheiro.de_texto(self.preco_var.get())
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Erro", "Quantidade e Preço devem ser números válidos "
+                                         "(preço com até 2 casas decimais).", parent=self)
             return
 
         if qtd <= 0:
             messagebox.showerror("Erro", "A Quantidade deve ser maior que zero.", parent=self)
             return
-        if preco < 0:
+        if preco.centavos < 0:
             messagebox.showerror("Erro", "O Preço não pode ser negativo.", parent=self)
             return
 
@@ -105,7 +107,8 @@ class FormPedido(tk.Toplevel):
     Janela Toplevel para criação de um novo pedido.
     """
 
-    def __init__(self, parent, lista_clientes: list, lista_produtos: list, on_save_success_callback):
+    def __init__(self, parent, lista_clientes: list, lista_produtos: list, on_save_success_callback,
+                 repositorio=None):
         super().__init__(parent)
         self.title("Criar Novo Pedido")
         self.geometry("700x500")
@@ -114,6 +117,8 @@ class FormPedido(tk.Toplevel):
         self.grab_set()
 
         self.on_save_success_callback = on_save_success_callback
+        # Repositório de destino (core/repositorio.py); None = armazenamento atual do db.py
+        self.repositorio = repositorio
         self.lista_produtos_completa = lista_produtos  # Guardamos para passar ao diálogo
 
         self.itens_pedido = []
@@ -186,15 +191,15 @@ class FormPedido(tk.Toplevel):
         for i in self.tree_itens.get_children():
             self.tree_itens.delete(i)
 
-        total_geral = 0.0
+        total_geral = Dinheiro()
         for item in self.itens_pedido:
-            subtotal = item["quantidade"] * item["preco_unit"]
+            subtotal = item["preco_unit"] * item["quantidade"]
             total_geral += subtotal
             self.tree_itens.insert("", tk.END,
-                                   values=(item["produto_nome"], item["quantidade"], f"{item['preco_unit']:.2f}",
-                                           f"{subtotal:.2f}"))
+                                   values=(item["produto_nome"], item["quantidade"], item["preco_unit"].formatar(),
+                                           subtotal.formatar()))
 
-        self.total_var.set(f"Total: R$ {total_geral:.2f}")
+        self.total_var.set(f"Total: {total_geral}")
 
     def _on_add_item(self):
         """Abre o diálogo para adicionar um novo item, passando a lista de produtos."""
@@ -223,34 +228,45 @@ class FormPedido(tk.Toplevel):
                                  parent=self)
             return
 
+        # Normaliza a data para YYYY-MM-DD (formato exigido pelo banco)
+        try:
+            data_pedido = datetime.strptime(data_pedido.strip(), '%Y-%m-%d').date().isoformat()
+        except ValueError:
+            messagebox.showerror("Erro de Validação", "A data deve estar no formato AAAA-MM-DD (ex.: 2025-10-25).",
+                                 parent=self)
+            return
+
         cliente_id = self.clientes_map[cliente_nome]
-        total_final = sum(item["quantidade"] * item["preco_unit"] for item in self.itens_pedido)
+        # Soma exata em centavos; Dinheiro é gravado como INTEGER (ver models.Dinheiro.__conform__)
+        total_final = sum(item["preco_unit"] * item["quantidade"] for item in self.itens_pedido)
 
-        conn = None
         try:
-            conn = sqlite3.connect(db.DB_FILE)
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA foreign_keys = ON;")
-            cursor.execute("BEGIN TRANSACTION;")
-
-            sql_pedido = "INSERT INTO pedidos (cliente_id, data, total) VALUES (?, ?, ?)"
-            cursor.execute(sql_pedido, (cliente_id, data_pedido, total_final))
-            pedido_id = cursor.lastrowid
-
-            # MODIFICADO: Salva os itens com produto_id
-            sql_item = "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unit) VALUES (?, ?, ?, ?)"
-            itens_para_db = [(pedido_id, item["produto_id"], item["quantidade"], item["preco_unit"]) for item in
-                             self.itens_pedido]
-            cursor.executemany(sql_item, itens_para_db)
-
-            conn.commit()
+            # BEGIN IMMEDIATE com novas tentativas: outro terminal gravando só atrasa o salvamento
+            with (self.repositorio.transacao() if self.repositorio else db.transacao()) as conn:
+                cursor = conn.cursor()
+
+                sql_pedido = "INSERT INTO pedidos (cliente_id, data, total) VALUES (?, ?, ?)"
+                cursor.execute(sql_pedido, (cliente_id, data_pedido, total_final))
+                pedido_id = cursor.lastrowid
+
+                # MODIFICADO: Salva os itens com produto_id
+                sql_item = "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unit) VALUES (?, ?, ?, ?)"
+                itens_para_db = [(pedido_id, item["produto_id"], item["quantidade"], item["preco_unit"]) for item in
+                                 self.itens_pedido]
+                cursor.executemany(sql_item, itens_para_db)
+
             messagebox.showinfo("Sucesso", f"Pedido Nº {pedido_id} salvo com sucesso!", parent=self)
             self.on_save_success_callback()
             self.destroy()
 
+        except sqlite3.OperationalError as e:
+            utils.log_erro("Falha ao salvar pedido (transação revertida).", e)
+            if db.banco_ocupado(e):
+                messagebox.showerror("Banco Ocupado",
+                                     "Outro terminal está gravando no banco há muito tempo.\n"
+                                     "O pedido não foi salvo; tente novamente em alguns instantes.", parent=self)
+            else:
+                messagebox.showerror("Erro no Banco de Dados", f"Falha ao salvar o pedido:\n{e}", parent=self)
         except sqlite3.Error as e:
-            if conn: conn.rollback()
             utils.log_erro("Falha ao salvar pedido (transação revertida).", e)
             messagebox.showerror("Erro no Banco de Dados", f"Falha ao salvar o pedido:\n{e}", parent=self)
-        finally:
-            if conn: conn.close()
\ No newline at end of file
@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+from models import Dinheiro
+
 
 class FormProduto(tk.Toplevel):
     """
@@ -12,7 +14,7 @@ class FormProduto(tk.Toplevel):
 
         self.on_save_callback = on_save_callback
         self.nome_var = tk.StringVar()
-        self.preco_var = tk.DoubleVar()
+        self.preco_var = tk.StringVar()
         self.produto_id = None
 
         self.transient(parent)
@@ -23,7 +25,8 @@ class FormProduto(tk.Toplevel):
             self.title("Editar Produto")
             self.produto_id = produto_data.get('id')
             self.nome_var.set(produto_data.get('nome', ''))
-            self.preco_var.set(produto_data.get('preco', 0.0))
+            # 'preco' vem do banco em centavos
+            self.preco_var.set(Dinheiro(produto_data.get('preco') or 0).formatar())
         else:
             self.title("Novo Produto")
 
@@ -59,12 +62,14 @@ class FormProduto(tk.Toplevel):
             return None
 
         try:
-            preco = self.preco_var.get()
-            if preco < 0:
-                messagebox.showerror("Erro de Validação", "O preço não pode ser negativo.", parent=self)
-                return None
-        except tk.TclError:
-            messagebox.showerror("Erro de Validação", "O preço deve ser um número válido.", parent=self)
+            preco = Dinheiro.de_texto(self.preco_var.get())
+        except ValueError:
+            messagebox.showerror("Erro de Validação",
+                                 "O preço deve ser um valor válido com até 2 casas decimais (ex.: 12,50).",
+                                 parent=self)
+            return None
+        if preco.centavos < 0:
+            messagebox.showerror("Erro de Validação", "O preço não pode ser negativo.", parent=self)
             return None
 
         return {
@@ -7,7 +7,10 @@ class ClientesView(ttk.Frame):
     Frame para exibir e gerenciar a lista de clientes.
     """
 
-    def __init__(self, parent, on_novo, on_editar, on_excluir, on_buscar):
+    # Pausa na digitação (ms) antes de disparar a busca automática
+    ATRASO_BUSCA_MS = 300
+
+    def __init__(self, parent, on_novo, on_editar, on_excluir, on_buscar, on_carregar_mais=None):
         """
         Inicializa o Frame da view de clientes.
 
@@ -17,6 +20,8 @@ class ClientesView(ttk.Frame):
             on_editar: Callback (recebe id) para "Editar".
             on_excluir: Callback (recebe id) para "Excluir".
             on_buscar: Callback (recebe termo) para "Buscar".
+            on_carregar_mais: Callback opcional chamado ao rolar até o fim
+                              da lista, quando há mais páginas a carregar.
         """
         super().__init__(parent)
 
@@ -25,9 +30,16 @@ class ClientesView(ttk.Frame):
         self.on_editar_callback = on_editar
         self.on_excluir_callback = on_excluir
         self.on_buscar_callback = on_buscar
+        self.on_carregar_mais_callback = on_carregar_mais
+
+        # Estado da paginação (carregamento ao rolar)
+        self.tem_mais = False
+        self._carregando_mais = False
 
         # Variável de controle para a busca
         self.busca_var = tk.StringVar()
+        # ID do agendamento da busca automática (enquanto o usuário digita)
+        self._busca_agendada = None
 
         # Variável para o status
         self.status_var = tk.StringVar()
@@ -48,6 +60,8 @@ class ClientesView(ttk.Frame):
 
         entry_busca = ttk.Entry(top_frame, textvariable=self.busca_var, width=30)
         entry_busca.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        entry_busca.bind("<KeyRelease>", self._agendar_busca)
+        entry_busca.bind("<Return>", lambda event: self._on_buscar())
 
         btn_buscar = ttk.Button(top_frame, text="Buscar", command=self._on_buscar)
         btn_buscar.pack(side=tk.LEFT, padx=5)
@@ -86,11 +100,11 @@ class ClientesView(ttk.Frame):
         self.tree.column("email", width=250, stretch=True)
         self.tree.column("telefone", width=150, stretch=False)
 
-        # Barra de Rolagem
-        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # Barra de Rolagem (também detecta quando a lista chega ao fim)
+        self.scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_rolagem)
 
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
         # --- Status Bar ---
@@ -115,8 +129,27 @@ class ClientesView(ttk.Frame):
         # Retorna o ID (índice 0) e o Nome (índice 1)
         return valores[0], valores[1]
 
+    def _on_rolagem(self, primeiro, ultimo):
+        """Atualiza a scrollbar e pede a próxima página ao chegar no fim."""
+        self.scrollbar.set(primeiro, ultimo)
+        if float(ultimo) >= 1.0 and self.tem_mais and not self._carregando_mais \
+                and self.on_carregar_mais_callback:
+            self._carregando_mais = True
+            self.after_idle(self.on_carregar_mais_callback)
+
+    def _agendar_busca(self, event=None):
+        """Busca automaticamente após uma pausa na digitação (debounce)."""
+        if event is not None and event.keysym == "Return":
+            return
+        if self._busca_agendada is not None:
+            self.after_cancel(self._busca_agendada)
+        self._busca_agendada = self.after(self.ATRASO_BUSCA_MS, self._on_buscar)
+
     def _on_buscar(self):
         """Chama o callback de busca com o termo digitado."""
+        if self._busca_agendada is not None:
+            self.after_cancel(self._busca_agendada)
+            self._busca_agendada = None
         termo = self.busca_var.get()
         self.on_buscar_callback(termo)
 
@@ -151,25 +184,42 @@ class ClientesView(ttk.Frame):
 
     # --- Métodos Públicos ---
 
-    def set_lista_clientes(self, dados: list):
+    def set_lista_clientes(self, dados: list, tem_mais: bool = False):
         """
         Limpa o Treeview e insere uma nova lista de dados.
 
         Args:
-            dados (list): Uma lista de tuplas/listas, onde cada item
-                          corresponde às colunas (id, nome, email, telefone).
+            dados (list): Uma lista de models.Cliente (ou tuplas), onde cada
+                          item corresponde às colunas (id, nome, email, telefone).
+            tem_mais (bool): Se há mais páginas a carregar ao rolar a lista.
         """
         # Limpa a árvore
         for i in self.tree.get_children():
             self.tree.delete(i)
 
+        self.adicionar_clientes(dados, tem_mais)
+
+    def adicionar_clientes(self, dados: list, tem_mais: bool = False):
+        """
+        Acrescenta uma página de clientes ao final do Treeview.
+
+        Args:
+            dados (list): models.Cliente ou tuplas (id, nome, email, telefone).
+            tem_mais (bool): Se ainda há páginas depois desta.
+        """
         # Insere os novos dados
         for item in dados:
-            self.tree.insert("", tk.END, values=item)
+            self.tree.insert("", tk.END, values=tuple(item))
+
+        self.tem_mais = tem_mais
+        self._carregando_mais = False
 
         # Atualiza o status
-        count = len(dados)
-        self.status_var.set(f"{count} cliente(s) encontrado(s).")
+        count = len(self.tree.get_children())
+        if tem_mais:
+            self.status_var.set(f"{count} cliente(s) carregado(s). Role para carregar mais.")
+        else:
+            self.status_var.set(f"{count} cliente(s) encontrado(s).")
 
 
 # --- Bloco de Teste ---
@@ -1,19 +1,30 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+from models import formatar_centavos
+
 class ProdutosView(ttk.Frame):
     """
     Frame para exibir e gerenciar a lista de produtos.
     """
-    def __init__(self, parent, on_novo, on_editar, on_excluir, on_buscar):
+    # Pausa na digitação (ms) antes de disparar a busca automática
+    ATRASO_BUSCA_MS = 300
+
+    def __init__(self, parent, on_novo, on_editar, on_excluir, on_buscar, on_carregar_mais=None):
         super().__init__(parent)
 
         self.on_novo_callback = on_novo
         self.on_editar_callback = on_editar
         self.on_excluir_callback = on_excluir
         self.on_buscar_callback = on_buscar
+        self.on_carregar_mais_callback = on_carregar_mais
+
+        # Estado da paginação (carregamento ao rolar)
+        self.tem_mais = False
+        self._carregando_mais = False
 
         self.busca_var = tk.StringVar()
+        self._busca_agendada = None
         self.status_var = tk.StringVar(value="0 produtos carregados.")
         self._criar_widgets()
 
@@ -24,6 +35,8 @@ class ProdutosView(ttk.Frame):
         ttk.Label(top_frame, text="Buscar:").pack(side=tk.LEFT, padx=(0, 5))
         entry_busca = ttk.Entry(top_frame, textvariable=self.busca_var, width=30)
         entry_busca.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        entry_busca.bind("<KeyRelease>", self._agendar_busca)
+        entry_busca.bind("<Return>", lambda event: self._on_buscar())
         ttk.Button(top_frame, text="Buscar", command=self._on_buscar).pack(side=tk.LEFT, padx=5)
 
         btn_frame = ttk.Frame(self)
@@ -45,9 +58,9 @@ class ProdutosView(ttk.Frame):
         self.tree.column("nome", width=350, stretch=True)
         self.tree.column("preco", width=120, stretch=False, anchor=tk.E)
 
-        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_rolagem)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
         ttk.Label(self, textvariable=self.status_var, anchor=tk.W, relief=tk.SUNKEN).pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(5, 10))
@@ -59,7 +72,26 @@ class ProdutosView(ttk.Frame):
         valores = self.tree.item(item_selecionado).get('values')
         return (valores[0], valores[1]) if valores else (None, None)
 
+    def _on_rolagem(self, primeiro, ultimo):
+        """Atualiza a scrollbar e pede a próxima página ao chegar no fim."""
+        self.scrollbar.set(primeiro, ultimo)
+        if float(ultimo) >= 1.0 and self.tem_mais and not self._carregando_mais \
+                and self.on_carregar_mais_callback:
+            self._carregando_mais = True
+            self.after_idle(self.on_carregar_mais_callback)
+
+    def _agendar_busca(self, event=None):
+        """Busca automaticamente após uma pausa na digitação (debounce)."""
+        if event is not None and event.keysym == "Return":
+            return
+        if self._busca_agendada is not None:
+            self.after_cancel(self._busca_agendada)
+        self._busca_agendada = self.after(self.ATRASO_BUSCA_MS, self._on_buscar)
+
     def _on_buscar(self):
+        if self._busca_agendada is not None:
+            self.after_cancel(self._busca_agendada)
+            self._busca_agendada = None
         self.on_buscar_callback(self.busca_var.get())
 
     def _on_editar(self):
@@ -77,10 +109,20 @@ class ProdutosView(ttk.Frame):
         if messagebox.askyesno("Confirmar Exclusão", f"Tem certeza que deseja excluir o produto: {produto_nome}?", icon='warning', parent=self):
             self.on_excluir_callback(produto_id)
 
-    def set_lista_produtos(self, dados: list):
+    def set_lista_produtos(self, dados: list, tem_mais: bool = False):
         for i in self.tree.get_children():
             self.tree.delete(i)
+        self.adicionar_produtos(dados, tem_mais)
+
+    def adicionar_produtos(self, dados: list, tem_mais: bool = False):
+        """Acrescenta uma página de produtos (id, nome, preco) ao final da lista."""
         for item in dados:
-            preco_formatado = f"{item[2]:.2f}"
+            preco_formatado = formatar_centavos(item[2])
             self.tree.insert("", tk.END, values=(item[0], item[1], preco_formatado))
-        self.status_var.set(f"{len(dados)} produto(s) encontrado(s).")
\ No newline at end of file
+        self.tem_mais = tem_mais
+        self._carregando_mais = False
+        count = len(self.tree.get_children())
+        if tem_mais:
+            self.status_var.set(f"{count} produto(s) carregado(s). Role para carregar mais.")
+        else:
+            self.status_var.set(f"{count} produto(s) encontrado(s).")
\ No newline at end of file
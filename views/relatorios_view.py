@@ -2,23 +2,37 @@ import tkinter as tk
 from tkinter import ttk
 from tkcalendar import DateEntry  # Importa o seletor de data
 from styles import get_calendar_light_style, get_calendar_dark_style
+from models import Dinheiro, formatar_centavos
 
 
 class RelatoriosView(ttk.Frame):
     """
     Frame que exibe a interface de filtros e listagem para relatórios.
     """
+    # Texto do combobox -> (ordenar_por, decrescente) de core.database.montar_consulta_relatorio
+    ORDENACOES = {
+        "Data (mais recentes)": ("data", True),
+        "Data (mais antigos)": ("data", False),
+        "Valor (maiores)": ("total", True),
+        "Valor (menores)": ("total", False),
+        "Nº de itens (maiores)": ("itens", True),
+    }
+    # Texto do combobox -> limite de linhas (None = todas)
+    LIMITES = {"Todos": None, "100 primeiros": 100, "500 primeiros": 500, "1000 primeiros": 1000}
 
-    def __init__(self, parent, on_filtrar_callback, on_exportar_csv_callback, on_exportar_pdf_callback):
+    def __init__(self, parent, on_filtrar_callback, on_exportar_csv_callback, on_exportar_pdf_callback,
+                 on_cancelar_callback=None):
         super().__init__(parent, padding=10)
 
         # Callbacks
         self.on_filtrar_callback = on_filtrar_callback
+        self.on_cancelar_callback = on_cancelar_callback
         self.on_exportar_csv_callback = on_exportar_csv_callback
         self.on_exportar_pdf_callback = on_exportar_pdf_callback
 
-        # Armazena a lista de clientes (id, nome)
+        # Armazena a lista de clientes (id, nome) e de produtos (id, nome, preco)
         self.clientes_list = []
+        self.produtos_list = []
 
         # --- 1. Frame de Filtros ---
         filtro_frame = ttk.LabelFrame(self, text="Filtros do Relatório", padding=10)
@@ -66,6 +80,52 @@ class RelatoriosView(ttk.Frame):
         self.btn_filtrar = ttk.Button(parent, text="Filtrar", command=self.on_filtrar_callback)
         self.btn_filtrar.grid(row=0, column=6, padx=(10, 0), sticky=tk.E)
 
+        # Botão Cancelar (habilitado só enquanto a consulta roda)
+        self.btn_cancelar = ttk.Button(parent, text="Cancelar", state=tk.DISABLED,
+                                       command=self.on_cancelar_callback)
+        if self.on_cancelar_callback:
+            self.btn_cancelar.grid(row=0, column=7, padx=(5, 0), sticky=tk.E)
+
+        # --- Segunda linha: valor, produto, itens, ordenação e limite ---
+        ttk.Label(parent, text="Valor de (R$):").grid(row=1, column=0, padx=(0, 5), pady=(5, 0), sticky=tk.W)
+        self.total_min_var = tk.StringVar()
+        ttk.Entry(parent, textvariable=self.total_min_var, width=12).grid(row=1, column=1, padx=5, pady=(5, 0),
+                                                                          sticky=tk.EW)
+
+        ttk.Label(parent, text="Até (R$):").grid(row=1, column=2, padx=(10, 5), pady=(5, 0), sticky=tk.W)
+        self.total_max_var = tk.StringVar()
+        ttk.Entry(parent, textvariable=self.total_max_var, width=12).grid(row=1, column=3, padx=5, pady=(5, 0),
+                                                                          sticky=tk.EW)
+
+        ttk.Label(parent, text="Produto:").grid(row=1, column=4, padx=(10, 5), pady=(5, 0), sticky=tk.W)
+        self.combo_produto = ttk.Combobox(parent, state="readonly", values=["Todos"])
+        self.combo_produto.current(0)
+        self.combo_produto.grid(row=1, column=5, padx=5, pady=(5, 0), sticky=tk.EW)
+
+        ttk.Label(parent, text="Mín. itens:").grid(row=2, column=0, padx=(0, 5), pady=(5, 0), sticky=tk.W)
+        itens_frame = ttk.Frame(parent)
+        itens_frame.grid(row=2, column=1, padx=5, pady=(5, 0), sticky=tk.W)
+        self.itens_min_var = tk.StringVar()
+        ttk.Entry(itens_frame, textvariable=self.itens_min_var, width=6).pack(side=tk.LEFT)
+        ttk.Label(itens_frame, text="Máx. itens:").pack(side=tk.LEFT, padx=(10, 5))
+        self.itens_max_var = tk.StringVar()
+        ttk.Entry(itens_frame, textvariable=self.itens_max_var, width=6).pack(side=tk.LEFT)
+
+        ttk.Label(parent, text="Ordenar por:").grid(row=2, column=2, padx=(10, 5), pady=(5, 0), sticky=tk.W)
+        self.combo_ordem = ttk.Combobox(parent, state="readonly", values=list(self.ORDENACOES))
+        self.combo_ordem.current(0)
+        self.combo_ordem.grid(row=2, column=3, padx=5, pady=(5, 0), sticky=tk.EW)
+
+        ttk.Label(parent, text="Mostrar:").grid(row=2, column=4, padx=(10, 5), pady=(5, 0), sticky=tk.W)
+        self.combo_limite = ttk.Combobox(parent, state="readonly", values=list(self.LIMITES))
+        self.combo_limite.current(0)
+        self.combo_limite.grid(row=2, column=5, padx=5, pady=(5, 0), sticky=tk.EW)
+
+        # Situação da consulta (andamento, cancelada, total de pedidos)
+        self.status_var = tk.StringVar()
+        ttk.Label(parent, textvariable=self.status_var).grid(row=3, column=0, columnspan=8, sticky=tk.W,
+                                                             pady=(5, 0))
+
     def _criar_treeview(self, parent):
         """Cria a Treeview para exibir os pedidos filtrados."""
         colunas = ("id", "data", "cliente", "itens", "total")
@@ -108,8 +168,18 @@ class RelatoriosView(ttk.Frame):
         self.combo_cliente["values"] = nomes
         self.combo_cliente.current(0)  # Define "Todos" como padrão
 
+    def set_produtos_combobox(self, produtos: list):
+        """Recebe a lista de produtos [ (id, nome, preco), ... ] e popula o combobox."""
+        self.produtos_list = produtos
+        self.combo_produto["values"] = ["Todos"] + [p[1] for p in produtos]
+        self.combo_produto.current(0)
+
     def get_filtros(self) -> dict:
-        """Retorna os valores dos filtros selecionados."""
+        """
+        Retorna os valores dos filtros selecionados, com as chaves aceitas
+        por core.database.fetch_relatorio_pedidos. Levanta ValueError se
+        um valor ou uma quantidade de itens for inválido.
+        """
 
         # Converte a data do DateEntry para o formato YYYY-MM-DD
         data_inicio = self.entry_data_inicio.get_date().strftime('%Y-%m-%d')
@@ -122,12 +192,55 @@ class RelatoriosView(ttk.Frame):
             # Pega o cliente da lista (índice - 1, pois "Todos" é o 0)
             cliente_id = self.clientes_list[idx_selecionado - 1][0]
 
+        produto_id = None
+        idx_produto = self.combo_produto.current()
+        if idx_produto > 0:
+            produto_id = self.produtos_list[idx_produto - 1][0]
+
+        # Valores em centavos; campo vazio = sem filtro
+        total_min = total_max = itens_min = itens_max = None
+        try:
+            if self.total_min_var.get().strip():
+                total_min = Dinheiro.de_texto(self.total_min_var.get()).centavos
+            if self.total_max_var.get().strip():
+                total_max = Dinheiro.de_texto(self.total_max_var.get()).centavos
+        except ValueError:
+            raise ValueError("Os valores mínimo e máximo devem ser números com até 2 casas decimais.")
+        if self.itens_min_var.get().strip():
+            try:
+                itens_min = int(self.itens_min_var.get())
+            except ValueError:
+                raise ValueError("O mínimo de itens deve ser um número inteiro.")
+        if self.itens_max_var.get().strip():
+            try:
+                itens_max = int(self.itens_max_var.get())
+            except ValueError:
+                raise ValueError("O máximo de itens deve ser um número inteiro.")
+
+        ordenar_por, decrescente = self.ORDENACOES[self.combo_ordem.get()]
+
         return {
             "data_inicio": data_inicio,
             "data_fim": data_fim,
-            "cliente_id": cliente_id
+            "cliente_id": cliente_id,
+            "total_min": total_min,
+            "total_max": total_max,
+            "produto_id": produto_id,
+            "itens_min": itens_min,
+            "itens_max": itens_max,
+            "ordenar_por": ordenar_por,
+            "decrescente": decrescente,
+            "limite": self.LIMITES[self.combo_limite.get()]
         }
 
+    def set_consultando(self, consultando: bool):
+        """Alterna os botões Filtrar/Cancelar enquanto a consulta roda."""
+        self.btn_filtrar.config(state=tk.DISABLED if consultando else tk.NORMAL)
+        self.btn_cancelar.config(state=tk.NORMAL if consultando else tk.DISABLED)
+
+    def set_status(self, texto: str):
+        self.status_var.set(texto)
+
     def set_lista_pedidos(self, pedidos: list):
         """Limpa a Treeview e insere a nova lista de pedidos."""
         # Limpa a lista antiga
@@ -137,7 +250,7 @@ class RelatoriosView(ttk.Frame):
         # Insere os novos dados
         for item in pedidos:
             # (id, data, cliente, itens, total)
-            total_formatado = f"{item[4]:.2f}"
+            total_formatado = formatar_centavos(item[4])
             dados_view = (item[0], item[1], item[2], item[3], total_formatado)
             self.pedidos_tree.insert("", tk.END, values=dados_view)
 